@@ -0,0 +1,45 @@
+"""add unique key on assessment_result answer tuple
+
+Revision ID: add_result_unique_key
+Revises: add_template_version
+Create Date: 2026-10-17 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_result_unique_key'
+down_revision = 'add_template_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Elimina eventuali duplicati storici. Nessuna colonna registra l'ordine di
+    # scrittura (id è un uuid4 casuale): si tiene un duplicato arbitrario ma
+    # deterministico, quello con l'id minore
+    op.execute("""
+        DELETE FROM assessment_result
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY session_id, process, activity, category, dimension
+                    ORDER BY id
+                ) AS rn
+                FROM assessment_result
+            ) ranked
+            WHERE rn > 1
+        )
+    """)
+
+    # Chiave univoca usata dall'upsert ON CONFLICT del submit
+    op.create_unique_constraint(
+        'uq_assessment_result_answer',
+        'assessment_result',
+        ['session_id', 'process', 'activity', 'category', 'dimension']
+    )
+
+
+def downgrade():
+    op.drop_constraint('uq_assessment_result_answer', 'assessment_result', type_='unique')
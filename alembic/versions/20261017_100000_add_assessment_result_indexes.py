@@ -0,0 +1,58 @@
+"""add composite and covering indexes on assessment_result
+
+Revision ID: add_result_indexes
+Revises: add_result_unique_key
+Create Date: 2026-10-17 10:00:00
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_result_indexes'
+down_revision = 'add_result_unique_key'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY non blocca le scritture, ma non può girare in transazione
+    with op.get_context().autocommit_block():
+        # radar, processes-radar, summary, pdf stats:
+        #   WHERE session_id = :s AND is_not_applicable IS false
+        #   GROUP BY process[, category] -> avg(score)
+        # score in INCLUDE permette un index-only scan
+        op.create_index(
+            'ix_assessment_result_session_na_process_category',
+            'assessment_result',
+            ['session_id', 'is_not_applicable', 'process', 'category'],
+            postgresql_include=['score'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+        # process-radar (filtro su process), detailed-stats (conteggi N/A per processo)
+        # e "media delle medie delle righe" del PDF (raggruppa anche per activity)
+        op.create_index(
+            'ix_assessment_result_session_process_category_activity',
+            'assessment_result',
+            ['session_id', 'process', 'category', 'activity'],
+            postgresql_include=['score', 'is_not_applicable'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_assessment_result_session_process_category_activity',
+            table_name='assessment_result',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'ix_assessment_result_session_na_process_category',
+            table_name='assessment_result',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,59 @@
+"""add session_score_aggregate table
+
+Revision ID: add_score_aggregates
+Revises: add_result_indexes
+Create Date: 2026-10-17 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_score_aggregates'
+down_revision = 'add_result_indexes'
+branch_labels = None
+depends_on = None
+
+SCORE_LEVELS = range(6)
+
+
+def upgrade():
+    op.create_table(
+        'session_score_aggregate',
+        sa.Column('session_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('process', sa.String(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('score_sum', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('answer_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('na_count', sa.Integer(), nullable=False, server_default='0'),
+        *[
+            sa.Column(f'score_{n}_count', sa.Integer(), nullable=False, server_default='0')
+            for n in SCORE_LEVELS
+        ],
+        sa.ForeignKeyConstraint(['session_id'], ['assessment_session.id']),
+        sa.PrimaryKeyConstraint('session_id', 'process', 'category'),
+    )
+
+    # Backfill delle sessioni esistenti (stessa logica di score_aggregate_service)
+    distribution = ",\n            ".join(
+        f"count(*) FILTER (WHERE is_not_applicable IS false AND score = {n})" for n in SCORE_LEVELS
+    )
+    op.execute(f"""
+        INSERT INTO session_score_aggregate (
+            session_id, process, category, score_sum, answer_count, na_count,
+            {", ".join(f"score_{n}_count" for n in SCORE_LEVELS)}
+        )
+        SELECT
+            session_id, process, category,
+            coalesce(sum(score) FILTER (WHERE is_not_applicable IS false), 0),
+            count(*) FILTER (WHERE is_not_applicable IS false),
+            count(*) FILTER (WHERE is_not_applicable IS true),
+            {distribution}
+        FROM assessment_result
+        GROUP BY session_id, process, category
+    """)
+
+
+def downgrade():
+    op.drop_table('session_score_aggregate')
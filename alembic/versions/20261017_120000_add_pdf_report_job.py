@@ -0,0 +1,43 @@
+"""add pdf_report_job table
+
+Revision ID: add_pdf_report_job
+Revises: add_score_aggregates
+Create Date: 2026-10-17 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_pdf_report_job'
+down_revision = 'add_score_aggregates'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'pdf_report_job',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('session_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('filename', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['assessment_session.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('session_id', 'fingerprint', name='uq_pdf_report_job_fingerprint'),
+    )
+    op.create_index(
+        'ix_pdf_report_job_status_created', 'pdf_report_job', ['status', 'created_at']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_pdf_report_job_status_created', table_name='pdf_report_job')
+    op.drop_table('pdf_report_job')
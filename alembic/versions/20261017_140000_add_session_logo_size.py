@@ -0,0 +1,27 @@
+"""add logo dimensions to assessment_session
+
+Revision ID: add_session_logo_size
+Revises: add_pdf_report_job
+Create Date: 2026-10-17 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_session_logo_size'
+down_revision = 'add_pdf_report_job'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Dimensioni in pixel del logo normalizzato all'upload (NULL per i logo
+    # caricati prima: il PDF le ricava ancora dal file)
+    op.add_column('assessment_session', sa.Column('logo_width', sa.Integer(), nullable=True))
+    op.add_column('assessment_session', sa.Column('logo_height', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('assessment_session', 'logo_height')
+    op.drop_column('assessment_session', 'logo_width')
@@ -0,0 +1,40 @@
+"""add llm_response_cache table
+
+Revision ID: add_llm_response_cache
+Revises: add_session_logo_size
+Create Date: 2026-10-17 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_llm_response_cache'
+down_revision = 'add_session_logo_size'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'llm_response_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('response', sa.Text(), nullable=False),
+        sa.Column('size_bytes', sa.Integer(), nullable=False),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completion_tokens', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('hit_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index('ix_llm_response_cache_last_used', 'llm_response_cache', ['last_used_at'])
+    op.create_index('ix_llm_response_cache_expires', 'llm_response_cache', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_llm_response_cache_expires', table_name='llm_response_cache')
+    op.drop_index('ix_llm_response_cache_last_used', table_name='llm_response_cache')
+    op.drop_table('llm_response_cache')
@@ -0,0 +1,37 @@
+"""add session_report_digest table
+
+Revision ID: add_session_report_digest
+Revises: add_llm_response_cache
+Create Date: 2026-10-17 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_session_report_digest'
+down_revision = 'add_llm_response_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'session_report_digest',
+        sa.Column('session_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(['session_id'], ['assessment_session.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('session_id', 'digest'),
+    )
+    # I PDF archiviati prima di questa revisione sono registrati solo sui job conclusi
+    op.execute("""
+        INSERT INTO session_report_digest (session_id, digest)
+        SELECT DISTINCT session_id, fingerprint FROM pdf_report_job WHERE status = 'done'
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade():
+    op.drop_table('session_report_digest')
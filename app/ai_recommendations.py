@@ -1,4 +1,5 @@
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 # app/ai_recommendations.py - Sistema di Raccomandazioni AI Avanzato
 """
 Sistema di raccomandazioni AI avanzato per Assessment Digitale 4.0
@@ -9,13 +10,18 @@ import json
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
-import openai
 from datetime import datetime
 from sqlalchemy.orm import Session
 from . import models
-import os
+from .services.scoring_engine import SessionScores
+from .services.llm_gateway import llm_configured, DEFAULT_MODEL
+from .services.llm_cache_service import cached_chat_completion
+import asyncio
 import traceback
 
+RECOMMENDATION_MAX_TOKENS = 6000
+RECOMMENDATION_TEMPERATURE = 0.6
+
 class PriorityLevel(Enum):
     CRITICAL = "critical"      # 0-1.5: Intervento immediato
     HIGH = "high"             # 1.5-2.5: Importante
@@ -52,28 +58,21 @@ class AIRecommendationEngine:
     """Engine principale per raccomandazioni AI"""
     
     def __init__(self):
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.model = os.getenv("OPENAI_MODEL", "gpt-4")
-        if self.openai_api_key:
-            openai.api_key = self.openai_api_key
+        self.openai_configured = llm_configured()
+        self.model = DEFAULT_MODEL
     
-    def generate_advanced_recommendations(self, session_id: str, results: List, session_data: Dict) -> Dict:
-        """Genera raccomandazioni avanzate complete - RICHIEDE OpenAI"""
+    async def generate_advanced_recommendations(self, session_id: str, results: List, session_data: Dict, regenerate: bool = False) -> Dict:
+        """Genera raccomandazioni avanzate complete - RICHIEDE OpenAI (regenerate: ignora la cache LLM)"""
         try:
             print(f"🤖 AI ENGINE: Iniziando analisi avanzata per sessione {session_id}")
             
-            # ✅ CONTROLLO OBBLIGATORIO OpenAI
-            if not self.openai_api_key:
-                raise HTTPException(
-                    status_code=503, 
-                    detail="❌ Sistema AI non configurato. OPENAI_API_KEY richiesta per raccomandazioni."
-                )
-            
-            company_context = self._extract_company_context(session_data)
-            analysis = self._perform_advanced_analysis(results, company_context)
+            # Analisi deterministica (CPU) nel threadpool: l'event loop attende solo l'AI
+            report, analysis, company_context = await run_in_threadpool(
+                self.prepare_advanced_recommendations, session_id, results, session_data
+            )
             
             # ✅ SEMPRE AI - nessun fallback automatico
-            ai_recommendations = self._generate_smart_recommendations(analysis, company_context)
+            ai_recommendations = await self._generate_smart_recommendations(analysis, company_context, regenerate)
             
             # Verifica che AI abbia funzionato
             if ai_recommendations.get("error", False):
@@ -82,19 +81,8 @@ class AIRecommendationEngine:
                     detail="❌ Errore generazione AI. Verificare configurazione OPENAI_API_KEY e crediti disponibili."
                 )
             
-            return {
-                "session_id": session_id,
-                "company": company_context,
-                "analysis_summary": analysis["summary"],
-                "priority_matrix": analysis["priority_matrix"],
-                "ai_recommendations": ai_recommendations,
-                "implementation_roadmap": analysis["roadmap"],
-                "roi_predictions": analysis["roi_predictions"],
-                "benchmark_comparison": analysis["benchmark"],
-                "sector_insights": self._generate_sector_insights(results, company_context),
-                "ai_powered": True,  # ✅ Sempre AI
-                "generated_at": datetime.now().isoformat()
-            }
+            report["ai_recommendations"] = ai_recommendations
+            return report
             
         except HTTPException:
             # Re-raise HTTP exceptions (API key missing, etc.)
@@ -107,6 +95,37 @@ class AIRecommendationEngine:
                 detail=f"❌ Errore sistema AI: {str(e)}"
             )
     
+    def prepare_advanced_recommendations(self, session_id: str, results: List, session_data: Dict) -> Tuple[Dict, Dict, Dict]:
+        """
+        Parte deterministica del report (analisi, matrice, roadmap, ROI, benchmark),
+        senza chiamate AI: usata anche dalla variante in streaming.
+
+        Returns:
+            (report senza "ai_recommendations", analysis, company_context)
+        """
+        # ✅ CONTROLLO OBBLIGATORIO OpenAI
+        if not self.openai_configured:
+            raise HTTPException(
+                status_code=503, 
+                detail="❌ Sistema AI non configurato. OPENAI_API_KEY richiesta per raccomandazioni."
+            )
+        
+        company_context = self._extract_company_context(session_data)
+        analysis = self._perform_advanced_analysis(results, company_context)
+        report = {
+            "session_id": session_id,
+            "company": company_context,
+            "analysis_summary": analysis["summary"],
+            "priority_matrix": analysis["priority_matrix"],
+            "implementation_roadmap": analysis["roadmap"],
+            "roi_predictions": analysis["roi_predictions"],
+            "benchmark_comparison": analysis["benchmark"],
+            "sector_insights": self._generate_sector_insights(results, company_context),
+            "ai_powered": True,  # ✅ Sempre AI
+            "generated_at": datetime.now().isoformat()
+        }
+        return report, analysis, company_context
+    
     def _extract_company_context(self, session_data: Dict) -> Dict:
         """Estrae contesto aziendale dalla sessione"""
         return {
@@ -148,9 +167,15 @@ class AIRecommendationEngine:
         """Esegue analisi multi-dimensionale avanzata"""
         print("🔍 Eseguendo analisi multi-dimensionale...")
         
+        # Medie per processo e generale dal motore vettoriale condiviso
+        scores = SessionScores.from_results(results)
+        process_averages = {
+            process: stats["average"] or 0 for process, stats in scores.by_process().items()
+        }
+        overall_avg = scores.totals()["average"] or 0
+        
         # Organizza dati per processo e categoria
         data_by_process = {}
-        all_scores = []
         critical_areas = []      # score <= 1.0
         weak_areas = []          # 1.0 < score < 2.0
         strong_areas = []        # score > 3.0
@@ -160,8 +185,7 @@ class AIRecommendationEngine:
             if process not in data_by_process:
                 data_by_process[process] = {
                     "categories": {},
-                    "scores": [],
-                    "avg_score": 0
+                    "avg_score": process_averages.get(process, 0)
                 }
             
             data_by_process[process]["categories"][result.category] = {
@@ -169,8 +193,6 @@ class AIRecommendationEngine:
                 "score": result.score,
                 "note": result.note
             }
-            data_by_process[process]["scores"].append(result.score)
-            all_scores.append(result.score)
             
             area_data = {
                 "process": process,
@@ -190,13 +212,6 @@ class AIRecommendationEngine:
             elif result.score > 3.0:
                 strong_areas.append(area_data)
         
-        # Calcola medie per processo
-        for process in data_by_process:
-            scores = data_by_process[process]["scores"]
-            data_by_process[process]["avg_score"] = sum(scores) / len(scores) if scores else 0
-        
-        overall_avg = sum(all_scores) / len(all_scores) if all_scores else 0
-        
         # Componenti analisi avanzata
         priority_matrix = self._create_priority_matrix(critical_areas, data_by_process)
         roadmap = self._create_implementation_roadmap(priority_matrix, company_context)
@@ -563,18 +578,17 @@ class AIRecommendationEngine:
         }
         return contexts.get(size_category, contexts["PICCOLA"])
 
-    def _generate_smart_recommendations(self, analysis, company_context):
-        """Genera raccomandazioni AI intelligenti"""
-        try:
-            high_priority = analysis["priority_matrix"]["high_priority"]
-            
-            # Estrai info dipendenti
-            employee_info = self._extract_employee_count(company_context["size"])
-            sector = company_context["sector"]
-            
-            # ✅ PROMPT SPECIFICO PER TURISMO
-            if any(keyword in sector.lower() for keyword in ["turismo", "hospitality", "hotel", "travel", "restaurant"]):
-                sector_context = f"""
+    def recommendation_messages(self, analysis, company_context) -> List[Dict[str, str]]:
+        """Messaggi (system + prompt) per le raccomandazioni AI"""
+        high_priority = analysis["priority_matrix"]["high_priority"]
+        
+        # Estrai info dipendenti
+        employee_info = self._extract_employee_count(company_context["size"])
+        sector = company_context["sector"]
+        
+        # ✅ PROMPT SPECIFICO PER TURISMO
+        if any(keyword in sector.lower() for keyword in ["turismo", "hospitality", "hotel", "travel", "restaurant"]):
+            sector_context = f"""
 SETTORE TURISMO - SPECIFICITÀ:
 - Focus su Customer Experience e Digital Transformation
 - Importanza Revenue Management e Dynamic Pricing  
@@ -583,10 +597,10 @@ SETTORE TURISMO - SPECIFICITÀ:
 - Obiettivo: Aumentare ADR, Occupancy, Guest Satisfaction
 - KPI: RevPAR, ADR, Booking Conversion, NPS, Review Score
 """
-            else:
-                sector_context = f"""\nSETTORE MANIFATTURIERO - SPECIFICITÀ:\n- Focus su Efficienza Produttiva, Qualità, Industry 4.0\n- Importanza IoT, Automazione, Digitalizzazione Processi\n- Centralità MES, ERP, Supply Chain Management\n- Necessità integrazione Macchine/Sistemi Gestionali\n- Obiettivo: Ridurre Costi, Aumentare Produttività, Qualità\n- KPI: OEE, Lead Time, Difettosità, Costi Produzione, On-Time Delivery\n"""
-            
-            prompt = f"""Sei un consulente senior di trasformazione digitale specializzato in {sector}.
+        else:
+            sector_context = f"""\nSETTORE MANIFATTURIERO - SPECIFICITÀ:\n- Focus su Efficienza Produttiva, Qualità, Industry 4.0\n- Importanza IoT, Automazione, Digitalizzazione Processi\n- Centralità MES, ERP, Supply Chain Management\n- Necessità integrazione Macchine/Sistemi Gestionali\n- Obiettivo: Ridurre Costi, Aumentare Produttività, Qualità\n- KPI: OEE, Lead Time, Difettosità, Costi Produzione, On-Time Delivery\n"""
+        
+        prompt = f"""Sei un consulente senior di trasformazione digitale specializzato in {sector}.
 
 {sector_context}
 
@@ -600,9 +614,9 @@ CONTESTO AZIENDA:
 
 TOP 3 AREE CRITICHE (solo applicabili):
 """
-            
-            for i, item in enumerate(high_priority, 1):
-                prompt += f"""
+        
+        for i, item in enumerate(high_priority, 1):
+            prompt += f"""
 {i}. CRITICO: {item["process"]} - {item["category"]}
    • Punteggio: {item["current_score"]}/5 → Target: {item["target_score"]}/5
    • Priorità: {item["priority_score"]} ({item["criticality"]["level"]})
@@ -611,8 +625,8 @@ TOP 3 AREE CRITICHE (solo applicabili):
    • Dettaglio: {item["dimension"]}
    {f"• Note: {item['note']}" if item["note"] else ""}
 """
-            
-            prompt += f"""
+        
+        prompt += f"""
 
 BUDGET: €{analysis["roi_predictions"]["investment_range"]["min"]:,} - €{analysis["roi_predictions"]["investment_range"]["max"]:,}
 BENCHMARK: {analysis["benchmark"]["position"]} nel settore {sector}
@@ -644,22 +658,41 @@ DOPO tutte le aree critiche:
 
 Tono: Consulente senior esperto. Risposte LUNGHE e DETTAGLIATE. Fornisci nomi specifici di prodotti/servizi disponibili in Italia. Usa dati concreti. REGOLE: NON inventare vendor/prezzi, usa TBD se incerto. NON citare benchmark inesistenti. Focus su AI/Blockchain/Digital."""
 
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": f"Sei un consulente senior di trasformazione digitale con 15+ anni esperienza nel settore {sector} italiano."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=6000,
-                temperature=0.6
+        return [
+            {"role": "system", "content": f"Sei un consulente senior di trasformazione digitale con 15+ anni esperienza nel settore {sector} italiano."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def completion_params(self) -> Dict:
+        """Modello e parametri della chiamata AI per le raccomandazioni"""
+        return {
+            "model": self.model,
+            "max_tokens": RECOMMENDATION_MAX_TOKENS,
+            "temperature": RECOMMENDATION_TEMPERATURE
+        }
+    
+    def recommendation_metadata(self, analysis) -> Dict:
+        """Campi di ai_recommendations oltre al testo generato"""
+        return {
+            "model_used": self.model,
+            "sector_specific": True,
+            "confidence": "HIGH" if len(analysis["priority_matrix"]["high_priority"]) >= 2 else "MEDIUM",
+            "customization_level": "SECTOR_EXPERT"
+        }
+    
+    async def _generate_smart_recommendations(self, analysis, company_context, regenerate: bool = False):
+        """Genera raccomandazioni AI intelligenti"""
+        try:
+            messages = self.recommendation_messages(analysis, company_context)
+            content = await cached_chat_completion(
+                messages,
+                regenerate=regenerate,
+                **self.completion_params()
             )
             
             return {
-                "content": response.choices[0].message.content,
-                "model_used": self.model,
-                "sector_specific": True,
-                "confidence": "HIGH" if len(high_priority) >= 2 else "MEDIUM",
-                "customization_level": "SECTOR_EXPERT"
+                "content": content,
+                **self.recommendation_metadata(analysis)
             }
             
         except Exception as e:
@@ -749,10 +782,10 @@ Tono: Consulente senior esperto. Risposte LUNGHE e DETTAGLIATE. Fornisci nomi sp
 # 🎯 FUNZIONI HELPER PER INTEGRAZIONE
 # ============================================================================
 
-def get_ai_recommendations_advanced(session_id: str, results: List, session_data: Dict) -> Dict:
+async def get_ai_recommendations_advanced(session_id: str, results: List, session_data: Dict, regenerate: bool = False) -> Dict:
     """Funzione helper per integrazione in radar.py"""
     engine = AIRecommendationEngine()
-    return engine.generate_advanced_recommendations(session_id, results, session_data)
+    return await engine.generate_advanced_recommendations(session_id, results, session_data, regenerate)
 
 def get_sector_insights(results: List, company_context: Dict) -> Dict:
     """Funzione helper per insights settoriali"""
@@ -792,7 +825,7 @@ def test_ai_engine():
     }
     
     engine = AIRecommendationEngine()
-    result = engine.generate_advanced_recommendations("test-123", fake_results, fake_session)
+    result = asyncio.run(engine.generate_advanced_recommendations("test-123", fake_results, fake_session))
     
     print("✅ Test completato!")
     print(f"📊 Analisi generata: {len(result)} sezioni")
@@ -8,6 +8,17 @@ from app.routers import pdf
 
 from app.database import get_db
 from app import schemas, models
+from app.services.results_service import (
+    upsert_assessment_results,
+    prepopulate_from_template_version,
+    prepopulate_from_dimensions,
+)
+from app.services.score_aggregate_service import delete_session_aggregates
+from app.services.pdf_job_service import delete_session_pdf_jobs, start_pdf_workers, stop_pdf_workers
+from app.services.report_store_service import invalidate_session_reports
+from app.services.report_charts import shutdown_render_pool
+from app.services.result_ordering_service import sort_session_results
+from app.services.model_loader_service import get_model
 from app.routers import radar, admin, auth_routes
 from app.routers import assessment_update
 from app.routers import excel_export
@@ -23,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Batch-Id", "X-Batch-Total"],  # Avanzamento dell'export PDF multiplo
 )
 
 # ✅ Router con prefisso /api
@@ -37,79 +49,40 @@ def prepopulate_assessment_responses(session_id: UUID, model_name: str = None, t
     - Vecchio: usa model_name per caricare JSON
     - Nuovo: usa template_version_id per caricare da DB
     """
-    import json
-    from pathlib import Path
-    
-    responses_to_create = []
-    
     # NUOVO SISTEMA: Template versionati dal DB
     if template_version_id:
         print(f"📊 Prepopolo da template_version: {template_version_id}")
         try:
-            # Carica questions dal DB per questa versione
-            questions = db.query(models.Question).filter(
-                models.Question.version_id == template_version_id
-            ).all()
-            
-            for q in questions:
-                response = models.AssessmentResult(
-                    session_id=session_id,
-                    process=q.process or '',
-                    activity=q.activity or '',
-                    category=q.category or '',
-                    dimension=q.text,
-                    score=0,
-                    note='',
-                    is_not_applicable=False
-                )
-                responses_to_create.append(response)
-            
-            print(f"✅ Pre-popolate {len(responses_to_create)} risposte da template DB")
+            # INSERT ... SELECT lato server: nessun oggetto per domanda
+            created = prepopulate_from_template_version(session_id, template_version_id, db)
+            db.commit()
+            print(f"✅ Pre-popolate {created} risposte da template DB")
         except Exception as e:
+            db.rollback()
             print(f"⚠️ Errore prepopolamento da template: {e}")
-            return
+        return
     
     # VECCHIO SISTEMA: JSON file
-    else:
-        model_name = model_name or "i40_assessment_fto"
-        print(f"📄 Prepopolo da JSON: {model_name}")
-        
-        model_path = Path(f"frontend/public/{model_name}.json")
-        if not model_path.exists():
-            print(f"⚠️ Modello {model_name} non trovato")
-            return
-        
-        try:
-            with open(model_path, 'r', encoding='utf-8') as f:
-                model_data = json.load(f)
-        except Exception as e:
-            print(f"⚠️ Errore caricamento modello: {e}")
-            return
-        
-        for process_data in model_data:
-            process_name = process_data.get('process', '')
-            for activity in process_data.get('activities', []):
-                activity_name = activity.get('name', '')
-                for category_name, dimensions in activity.get('categories', {}).items():
-                    for dimension_name in dimensions.keys():
-                        response = models.AssessmentResult(
-                            session_id=session_id,
-                            process=process_name,
-                            activity=activity_name,
-                            category=category_name,
-                            dimension=dimension_name,
-                            score=0,
-                            note='',
-                            is_not_applicable=False
-                        )
-                        responses_to_create.append(response)
-        
-        print(f"✅ Pre-popolate {len(responses_to_create)} risposte da JSON")
+    model_name = model_name or "i40_assessment_fto"
+    print(f"📄 Prepopolo da JSON: {model_name}")
+    
+    try:
+        model = get_model(model_name)
+    except Exception as e:
+        print(f"⚠️ Errore caricamento modello: {e}")
+        return
+    
+    if model is None:
+        print(f"⚠️ Modello {model_name} non trovato")
+        return
     
-    # Salva tutte le risposte
-    if responses_to_create:
-        db.bulk_save_objects(responses_to_create)
+    dimensions = model.dimensions
+    
+    # Salva tutte le risposte con un unico INSERT multi-riga
+    if dimensions:
+        created = prepopulate_from_dimensions(session_id, dimensions, db)
         db.commit()
+        print(f"✅ Pre-popolate {created} risposte da JSON")
 
 # 📥 Crea sessione di assessment
 @api_router.post("/assessment/session", response_model=schemas.AssessmentSessionOut)
@@ -155,29 +128,11 @@ def submit(session_id: UUID, results: List[schemas.AssessmentResultCreate], db:
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    updated = 0
-    created = 0
-    
-    for r in results:
-        # Cerca se esiste già un risultato per questa combinazione
-        existing = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.process == r.process,
-            models.AssessmentResult.activity == r.activity,
-            models.AssessmentResult.category == r.category,
-            models.AssessmentResult.dimension == r.dimension
-        ).first()
-        
-        if existing:
-            # UPDATE
-            existing.score = r.score
-            existing.note = r.note
-            existing.is_not_applicable = r.is_not_applicable
-            updated += 1
-        else:
-            # INSERT
-            db.add(models.AssessmentResult(session_id=session_id, **r.dict()))
-            created += 1
+    # I PDF archiviati per le risposte attuali non saranno più validi
+    invalidate_session_reports(session_id, db)
+
+    # UPSERT set-based: un solo statement per tutto il payload
+    created, updated = upsert_assessment_results(session_id, results, db)
     
     db.commit()
     return {"status": "submitted", "created": created, "updated": updated, "total": len(results)}
@@ -186,8 +141,6 @@ def submit(session_id: UUID, results: List[schemas.AssessmentResultCreate], db:
 @api_router.get("/assessment/{session_id}/results", response_model=List[schemas.AssessmentResultOut])
 def results(session_id: UUID, db: Session = Depends(get_db)):
     """Restituisce i risultati ordinati secondo il template (DB o JSON)"""
-    from app.services.template_data_service import get_session_data_source
-    
     # Ottieni risultati dal DB
     results = db.query(models.AssessmentResult).filter(
         models.AssessmentResult.session_id == session_id
@@ -200,78 +153,8 @@ def results(session_id: UUID, db: Session = Depends(get_db)):
     if not session or not results:
         return results
     
-    # Ottieni struttura dati (DB o JSON)
-    data_source = get_session_data_source(session, db)
-    
-    # ORDINAMENTO RISULTATI
-    if data_source['source'] == 'db':
-        # NUOVO: Ordina usando questions dal DB
-        questions = data_source['questions']
-        
-        # Crea mappa ordinamento da questions
-        order_map = {}
-        for idx, q in enumerate(questions):
-            key = (q.process, q.activity, q.category, q.text)
-            order_map[key] = idx
-        
-        def get_sort_key_db(result):
-            key = (result.process, result.activity, result.category, result.dimension)
-            return order_map.get(key, 9999)
-        
-        results.sort(key=get_sort_key_db)
-        
-    else:
-        # VECCHIO: Ordina usando JSON
-        import json
-        from pathlib import Path
-        
-        model_name = session.model_name or 'i40_assessment_fto'
-        model_path = Path(f"frontend/public/{model_name}.json")
-        
-        if model_path.exists():
-            try:
-                with open(model_path, 'r', encoding='utf-8') as f:
-                    model_data = json.load(f)
-                
-                order_map_json = {}
-                for proc in model_data:
-                    proc_name = proc.get('process')
-                    if proc_name not in order_map_json:
-                        order_map_json[proc_name] = {}
-                    
-                    for activity in proc.get('activities', []):
-                        act_name = activity.get('name')
-                        for category in activity.get('categories', {}).keys():
-                            if category not in order_map_json[proc_name]:
-                                order_map_json[proc_name][category] = []
-                            if act_name not in order_map_json[proc_name][category]:
-                                order_map_json[proc_name][category].append(act_name)
-                
-                def get_sort_key(result):
-                    proc = result.process
-                    cat = result.category
-                    act = result.activity
-                    
-                    try:
-                        proc_order = list(order_map_json.keys()).index(proc)
-                    except (ValueError, AttributeError):
-                        proc_order = 999
-                    
-                    try:
-                        cat_order = ['Governance', 'Monitoring & Control', 'Technology', 'Organization'].index(cat)
-                    except ValueError:
-                        cat_order = 999
-                    
-                    try:
-                        act_order = order_map_json.get(proc, {}).get(cat, []).index(act)
-                    except (ValueError, AttributeError):
-                        act_order = 999
-                    
-                    return (proc_order, cat_order, act_order)
-                
-                results.sort(key=get_sort_key)
-            except Exception as e:
-                print(f"⚠️ Warning: Could not order results from JSON: {e}")
+    # ORDINAMENTO RISULTATI (tabella di rango precalcolata per template)
+    sort_session_results(session, results, db)
     
     # Calcola processRating per ogni processo
     process_scores = {}
@@ -313,7 +196,10 @@ def delete_assessment(session_id: UUID, db: Session = Depends(get_db)):
             models.AssessmentResult.session_id == session_id
         ).count()
         
-        # Cancella prima tutti i risultati associati
+        # Cancella prima PDF archiviati, job PDF, aggregati e risultati associati
+        invalidate_session_reports(session_id, db)
+        delete_session_pdf_jobs(session_id, db)
+        delete_session_aggregates(session_id, db)
         deleted_results = db.query(models.AssessmentResult).filter(
             models.AssessmentResult.session_id == session_id
         ).delete()
@@ -335,6 +221,18 @@ def delete_assessment(session_id: UUID, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Errore cancellazione: {str(e)}")
 
+# ✅ Worker della coda PDF (solo con PDF_WORKERS > 0, altrimenti vanno eseguiti a parte)
+@app.on_event("startup")
+def start_background_workers():
+    started = start_pdf_workers()
+    if started:
+        print(f"🧾 Avviati {started} PDF worker")
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    stop_pdf_workers()
+    shutdown_render_pool()
+
 # ✅ Registra i router
 app.include_router(api_router)
 app.include_router(radar.router, prefix="/api")
@@ -355,7 +253,8 @@ async def save_ai_conclusions(session_id: str, conclusions: dict, db: Session =
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        # Salva nel campo raccomandazioni
+        # Salva nel campo raccomandazioni (i PDF archiviati non sono più validi)
+        invalidate_session_reports(session_id, db)
         session.raccomandazioni = conclusions.get('text', '')
         db.commit()
         
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Boolean, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Boolean, Float, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
@@ -38,6 +38,8 @@ class AssessmentSession(Base):
     creato_il = Column(DateTime, default=datetime.now, nullable=False)
     data_chiusura = Column(DateTime, nullable=True)  # Data di completamento assessment
     logo_path = Column(Text, nullable=True)  # Percorso file logo azienda
+    logo_width = Column(Integer, nullable=True)  # Dimensioni in pixel del logo normalizzato
+    logo_height = Column(Integer, nullable=True)
 
     results = relationship("AssessmentResult", backref="session")
 
@@ -55,6 +57,93 @@ class AssessmentResult(Base):
     note = Column(Text, nullable=True)
     is_not_applicable = Column(Boolean, default=False, nullable=False)
 
+    __table_args__ = (
+        # Una sola risposta per domanda: abilita l'upsert set-based del submit
+        UniqueConstraint("session_id", "process", "activity", "category", "dimension",
+                         name="uq_assessment_result_answer"),
+        # Radar/summary: WHERE session_id AND NOT is_not_applicable GROUP BY process, category
+        Index("ix_assessment_result_session_na_process_category",
+              "session_id", "is_not_applicable", "process", "category",
+              postgresql_include=["score"]),
+        # Radar per processo, detailed-stats e media delle righe del PDF
+        Index("ix_assessment_result_session_process_category_activity",
+              "session_id", "process", "category", "activity",
+              postgresql_include=["score", "is_not_applicable"]),
+    )
+
+
+class SessionScoreAggregate(Base):
+    """Aggregati per (sessione, processo, categoria) mantenuti ad ogni scrittura dei risultati"""
+    __tablename__ = "session_score_aggregate"
+
+    session_id = Column(UUID(as_uuid=True), ForeignKey("assessment_session.id"), primary_key=True)
+    process = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)
+    score_sum = Column(Integer, nullable=False, default=0)      # Somma score applicabili
+    answer_count = Column(Integer, nullable=False, default=0)   # Risposte applicabili
+    na_count = Column(Integer, nullable=False, default=0)       # Risposte non applicabili
+    # Distribuzione degli score applicabili (0-5)
+    score_0_count = Column(Integer, nullable=False, default=0)
+    score_1_count = Column(Integer, nullable=False, default=0)
+    score_2_count = Column(Integer, nullable=False, default=0)
+    score_3_count = Column(Integer, nullable=False, default=0)
+    score_4_count = Column(Integer, nullable=False, default=0)
+    score_5_count = Column(Integer, nullable=False, default=0)
+
+
+class PdfReportJob(Base):
+    """Job di generazione del report PDF (coda gestita da pdf_job_service)"""
+    __tablename__ = "pdf_report_job"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("assessment_session.id"), nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # Digest dei dati = chiave del PDF nel report store
+    status = Column(String, nullable=False, default="queued")  # queued | running | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    filename = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Richieste identiche (stessa sessione, stessi dati) condividono lo stesso job
+        UniqueConstraint("session_id", "fingerprint", name="uq_pdf_report_job_fingerprint"),
+        # Prelievo dei job: WHERE status = 'queued' ORDER BY created_at
+        Index("ix_pdf_report_job_status_created", "status", "created_at"),
+    )
+
+
+class SessionReportDigest(Base):
+    """Digest dei PDF archiviati per sessione: invalidate_session_reports elimina solo questi"""
+    __tablename__ = "session_report_digest"
+
+    session_id = Column(UUID(as_uuid=True), ForeignKey("assessment_session.id", ondelete="CASCADE"), primary_key=True)
+    digest = Column(String(64), primary_key=True)  # Chiave del PDF nel report store
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+
+
+class LlmResponseCache(Base):
+    """Risposte LLM riusabili (cache gestita da llm_cache_service)"""
+    __tablename__ = "llm_response_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 di modello, prompt normalizzato e parametri
+    model = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.now, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Eviction LRU e pulizia delle voci scadute
+        Index("ix_llm_response_cache_last_used", "last_used_at"),
+        Index("ix_llm_response_cache_expires", "expires_at"),
+    )
+
 
 # ===============================
 #  MODELLI PER I TEMPLATE
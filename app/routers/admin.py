@@ -5,6 +5,10 @@ from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app import database
 from app.services.excel_parser import ExcelAssessmentParser
+from app.services.model_loader_service import invalidate_model, model_cache_stats
+from app.services.template_cache_service import template_cache_stats
+from app.services.render_cache_service import render_cache_stats
+from app.services.llm_cache_service import llm_cache_stats, clear_llm_cache
 import shutil
 import json
 from pathlib import Path
@@ -134,6 +138,9 @@ async def upload_excel_model(
                 json.dump(frontend_data, dist_f, ensure_ascii=False, indent=2)
             print(f"✅ Copiato anche in: {dist_path}")
         
+        # Il modello in cache non è più valido
+        invalidate_model(model_name)
+        
         # Rimuovi file temporaneo
         Path(temp_path).unlink()
         
@@ -236,6 +243,9 @@ async def save_model(request: SaveModelRequest):
         except Exception:
             pass  # Continua anche se non riesce a cambiare owner
         
+        # Il modello in cache non è più valido
+        invalidate_model(target_file.stem)
+        
         return {
             "success": True,
             "message": f"Modello '{filename}' salvato con successo",
@@ -245,3 +255,33 @@ async def save_model(request: SaveModelRequest):
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Errore salvataggio: {str(e)}")
+
+
+@router.get("/model-cache-stats")
+async def get_model_cache_stats():
+    """Contatori hit/miss della cache dei modelli JSON"""
+    return model_cache_stats()
+
+
+@router.get("/template-cache-stats")
+async def get_template_cache_stats():
+    """Contatori hit/miss della cache delle versioni di template"""
+    return template_cache_stats()
+
+
+@router.get("/render-cache-stats")
+async def get_render_cache_stats():
+    """Contatori hit/miss/304 della cache dei grafici radar"""
+    return render_cache_stats()
+
+
+@router.get("/llm-cache-stats")
+async def get_llm_cache_stats(db: Session = Depends(database.get_db)):
+    """Hit ratio e token risparmiati dalla cache delle risposte LLM"""
+    return llm_cache_stats(db)
+
+
+@router.delete("/llm-cache")
+async def delete_llm_cache(db: Session = Depends(database.get_db)):
+    """Svuota la cache delle risposte LLM"""
+    return {"deleted": clear_llm_cache(db)}
@@ -2,16 +2,15 @@ from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models
-import openai
+from app.services.model_loader_service import get_model
+from app.services import llm_gateway
+from app.services.interview_analysis_service import iter_interview_analysis
+from app.services.ai_stream_service import sse_event, sse_response
 import os
 from typing import Optional
-import json
 
 router = APIRouter()
 
-# Configura OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
 @router.post("/ai-interview/transcribe")
 async def transcribe_audio(
     file: UploadFile = File(...),
@@ -24,27 +23,28 @@ async def transcribe_audio(
             f.write(await file.read())
         
         # Trascrivi con Whisper
-        with open(temp_path, "rb") as audio_file:
-            transcript = openai.Audio.transcribe("whisper-1", audio_file)
-        
-        os.remove(temp_path)
+        try:
+            with open(temp_path, "rb") as audio_file:
+                transcript = await llm_gateway.transcribe_audio(audio_file, model="whisper-1")
+        finally:
+            os.remove(temp_path)
         
         return {
-            "transcript": transcript["text"],
+            "transcript": transcript,
             "status": "success"
         }
+    except llm_gateway.LLMError as e:
+        raise HTTPException(status_code=503, detail=f"Servizio AI non disponibile: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/ai-interview/analyze/{session_id}")
-async def analyze_interview(
-    session_id: str,
-    transcript: dict,  # {"text": "trascrizione..."}
-    db: Session = Depends(get_db)
-):
-    """Analizza la trascrizione e genera risposte per l'assessment"""
-    
+def _load_interview_model(session_id: str, transcript: dict, db: Session):
+    """Modello di assessment della sessione e testo della trascrizione (HTTPException se mancano)"""
+    text = (transcript or {}).get("text")
+    if not text or not str(text).strip():
+        raise HTTPException(status_code=400, detail="Trascrizione mancante")
+
     # Carica il modello di assessment
     session = db.query(models.AssessmentSession).filter(
         models.AssessmentSession.id == session_id
@@ -55,69 +55,57 @@ async def analyze_interview(
     
     model_name = session.model_name or "Casoinfinal"
     
-    # Carica le domande dal JSON
-    import json
-    with open(f'frontend/public/{model_name}.json', 'r') as f:
-        model_data = json.load(f)
-    
-    # Crea il prompt per GPT-4
-    prompt = f"""Sei un esperto di Digital Transformation Industry 4.0.
+    # Carica le domande dal JSON (modello parsato in cache)
+    model = get_model(model_name)
+    if model is None:
+        raise HTTPException(status_code=404, detail=f"Modello {model_name} non trovato")
+    return model, str(text)
 
-Analizza questa trascrizione di un'intervista con un'azienda:
-{transcript['text']}
 
-Basandoti SOLO sulle informazioni presenti nell'intervista, rispondi alle seguenti domande dell'assessment digitale.
-Per ogni domanda, assegna un punteggio da 0 a 5:
-- 0: Non implementato / Non presente
-- 1: Livello iniziale
-- 2: Livello base
-- 3: Livello intermedio
-- 4: Livello avanzato
-- 5: Livello eccellente / Best in class
+@router.post("/ai-interview/analyze/{session_id}")
+async def analyze_interview(
+    session_id: str,
+    transcript: dict,  # {"text": "trascrizione..."}
+    regenerate: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Analizza la trascrizione e genera risposte per l'assessment, un blocco
+    di domande alla volta in parallelo (regenerate: ignora la cache LLM).
+    Le domande senza informazioni sufficienti non compaiono nei risultati.
+    """
+    model, text = _load_interview_model(session_id, transcript, db)
 
-Se nell'intervista NON ci sono informazioni sufficienti per rispondere, metti "N/A".
+    summary = None
+    async for event in iter_interview_analysis(model, text, regenerate=regenerate):
+        if event["type"] == "done":
+            summary = event
 
-Modello di assessment da compilare:
-{json.dumps(model_data, indent=2)}
+    if summary["failed_chunks"] and not summary["results"]:
+        errors = "; ".join(sorted({f["error"] for f in summary["failed_chunks"]}))
+        raise HTTPException(status_code=503, detail=f"Errore analisi AI: {errors}")
 
-Rispondi in formato JSON con questa struttura:
-{{
-  "results": [
-    {{
-      "process": "nome processo",
-      "activity": "nome attività",
-      "category": "Governance",
-      "dimension": "nome dimensione",
-      "score": 3,
-      "note": "Motivazione del punteggio basata sull'intervista",
-      "is_not_applicable": false,
-      "confidence": 0.8
-    }}
-  ]
-}}
-"""
-    
-    try:
-        # Chiamata a GPT-4
-        response = openai.ChatCompletion.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": "Sei un esperto di assessment Industry 4.0. Rispondi SOLO in formato JSON valido."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=4000
-        )
-        
-        # Estrai e parsifica la risposta
-        ai_response = response.choices[0].message.content
-        results = json.loads(ai_response)
-        
-        return {
-            "status": "success",
-            "results": results["results"],
-            "model_used": "gpt-4-turbo-preview"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Errore analisi AI: {str(e)}")
+    return {
+        "status": "success" if not summary["failed_chunks"] else "partial",
+        **{k: v for k, v in summary.items() if k != "type"},
+    }
+
+
+@router.post("/ai-interview/analyze/{session_id}/stream")
+async def analyze_interview_stream(
+    session_id: str,
+    transcript: dict,  # {"text": "trascrizione..."}
+    regenerate: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Variante SSE di analyze: un evento progress per ogni blocco completato
+    (con i risultati parziali), poi done con i risultati completi
+    """
+    model, text = _load_interview_model(session_id, transcript, db)
+
+    async def events():
+        async for event in iter_interview_analysis(model, text, regenerate=regenerate):
+            yield sse_event(event["type"], {k: v for k, v in event.items() if k != "type"})
+
+    return sse_response(events())
@@ -4,6 +4,7 @@ from uuid import UUID
 from pydantic import BaseModel
 from typing import Optional
 from app import database, models
+from app.services.report_store_service import invalidate_session_reports
 
 router = APIRouter()
 
@@ -30,6 +31,9 @@ def update_session(
     if not session:
         raise HTTPException(status_code=404, detail="Sessione non trovata")
     
+    # I PDF archiviati con i dati attuali non saranno più validi
+    invalidate_session_reports(session_id, db)
+    
     # Aggiorna solo i campi forniti
     if data.azienda_nome is not None:
         session.azienda_nome = data.azienda_nome
@@ -71,9 +75,23 @@ def update_session(
 
 
 from fastapi import UploadFile, File
-import os
-import uuid
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
+from app.services.report_store_service import resolve_logo_path
+from app.services.logo_service import (
+    ALLOWED_EXTENSIONS,
+    LOGO_DIR,
+    LogoValidationError,
+    prepare_logo,
+    save_upload,
+)
+
+
+def _remove_logo_file(logo_path: Optional[str]):
+    path = resolve_logo_path(logo_path)
+    if path and Path(path).exists():
+        Path(path).unlink()
+
 
 @router.post("/assessment/session/{session_id}/upload-logo")
 async def upload_logo(
@@ -81,7 +99,10 @@ async def upload_logo(
     file: UploadFile = File(...),
     db: Session = Depends(database.get_db)
 ):
-    """Upload logo aziendale per l'assessment"""
+    """
+    Upload logo aziendale per l'assessment: il file viene salvato a blocchi,
+    validato e convertito in una variante ottimizzata per il PDF
+    """
     
     # Verifica che la sessione esista
     session = db.query(models.AssessmentSession).filter(
@@ -92,46 +113,49 @@ async def upload_logo(
         raise HTTPException(status_code=404, detail="Sessione non trovata")
     
     # Verifica tipo file
-    allowed_extensions = ['.png', '.jpg', '.jpeg', '.gif', '.svg']
-    file_ext = Path(file.filename).suffix.lower()
+    file_ext = Path(file.filename or "").suffix.lower()
     
-    if file_ext not in allowed_extensions:
+    if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400, 
-            detail=f"Formato file non supportato. Usa: {', '.join(allowed_extensions)}"
+            detail=f"Formato file non supportato. Usa: {', '.join(ALLOWED_EXTENSIONS)}"
         )
     
-    # Crea directory se non esiste
-    upload_dir = Path("/var/www/assessment_ai/uploads/logos")
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Genera nome file unico
-    unique_filename = f"{session_id}_{uuid.uuid4().hex[:8]}{file_ext}"
-    file_path = upload_dir / unique_filename
+    upload_path = None
+    try:
+        upload_path = await save_upload(file, LOGO_DIR)
+        logo = await run_in_threadpool(prepare_logo, upload_path, file_ext, session_id)
+    except LogoValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Errore nel caricamento: {str(e)}")
+    finally:
+        if upload_path is not None and upload_path.exists():
+            upload_path.unlink()
     
-    # Salva file
     try:
-        contents = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        # PDF archiviati con il vecchio logo non più validi
+        invalidate_session_reports(session_id, db)
         
         # Cancella vecchio logo se esiste
-        if session.logo_path:
-            old_path = Path(session.logo_path)
-            if old_path.exists():
-                old_path.unlink()
+        _remove_logo_file(session.logo_path)
         
-        # Aggiorna database con path relativo
-        session.logo_path = f"/uploads/logos/{unique_filename}"
+        # Aggiorna database con path relativo e dimensioni
+        session.logo_path = logo.url_path
+        session.logo_width = logo.width
+        session.logo_height = logo.height
         db.commit()
         
         return {
             "success": True,
             "message": "Logo caricato con successo",
-            "logo_path": str(file_path)
+            "logo_path": str(logo.path),
+            "width": logo.width,
+            "height": logo.height
         }
         
     except Exception as e:
+        logo.path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Errore nel caricamento: {str(e)}")
 
 
@@ -150,11 +174,12 @@ async def delete_logo(
         raise HTTPException(status_code=404, detail="Sessione non trovata")
     
     if session.logo_path:
-        logo_path = Path(session.logo_path)
-        if logo_path.exists():
-            logo_path.unlink()
+        invalidate_session_reports(session_id, db)
+        _remove_logo_file(session.logo_path)
         
         session.logo_path = None
+        session.logo_width = None
+        session.logo_height = None
         db.commit()
     
     return {"success": True, "message": "Logo eliminato"}
@@ -4,9 +4,8 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 from openpyxl.chart import RadarChart, Reference
-import json
 import io
-from pathlib import Path
+from app.services.model_loader_service import get_model
 
 router = APIRouter()
 
@@ -20,13 +19,12 @@ async def export_model_to_excel(model_name: str):
     - Calcoli automatici che replicano la pagina online
     """
     
-    # Carica il modello JSON
-    model_path = Path(f"frontend/public/{model_name}.json")
-    if not model_path.exists():
+    # Carica il modello JSON (parsato in cache)
+    model = get_model(model_name)
+    if model is None:
         raise HTTPException(status_code=404, detail=f"Modello {model_name} non trovato")
     
-    with open(model_path, 'r', encoding='utf-8') as f:
-        model_data = json.load(f)
+    model_data = model.data
     
     # Crea il workbook
     wb = Workbook()
@@ -1,35 +1,72 @@
 # app/routers/radar.py - VERSIONE COMPLETA CON GESTIONE NON APPLICABILI
-from app.ai_recommendations import get_ai_recommendations_advanced, get_sector_insights
-from fastapi import APIRouter, Depends, HTTPException
+from app.ai_recommendations import AIRecommendationEngine, get_ai_recommendations_advanced, get_sector_insights
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from uuid import UUID
 from app.database import get_db
 from app import database, models
+from app.services.score_aggregate_service import get_session_aggregates, combine_aggregates
+from app.services.render_cache_service import cached_render
+from app.services.report_store_service import invalidate_session_reports
+from app.services.report_charts import new_figure
+from app.services.llm_gateway import (
+    chat_completion, check_connection, gateway_status, llm_configured, DEFAULT_MODEL, LLMError,
+)
+from app.services.ai_stream_service import sse_response, completion_events, text_events, save_session_text
+from app.services.llm_cache_service import cached_chat_completion
+from app.services.prompt_encoding_service import encode_critical_areas
 from dotenv import load_dotenv
 from urllib.parse import unquote
 from datetime import datetime
 from typing import List, Dict, Optional, Union
-import matplotlib.pyplot as plt
-import matplotlib
+from matplotlib.lines import Line2D
+from matplotlib.patches import Rectangle
 import io
 import numpy as np
-import openai
 import os
 import math
 import traceback
 
-# Configura matplotlib per headless server
-matplotlib.use('Agg')
-
 load_dotenv()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-model = os.getenv("OPENAI_MODEL", "gpt-4")
-
 router = APIRouter()
 
+# Mappatura categorie -> 4 dimensioni del radar di processo
+DIMENSION_MAPPING = {
+    "Governance": "Governance", "Process": "Governance",
+    "Monitoring": "Monitoring", "Control": "Monitoring",
+    "Technology": "Technology", "Tech": "Technology", "ICT": "Technology",
+    "Organization": "Organization", "Org": "Organization", "People": "Organization"
+}
+
+def get_applicable_process_averages(session_id: UUID, db: Session) -> Dict[str, float]:
+    """Media per processo dagli aggregati di sessione (solo risposte applicabili)"""
+    by_process = combine_aggregates(get_session_aggregates(session_id, db))
+    return {
+        process: item['average']
+        for process, item in by_process.items()
+        if item['average'] is not None
+    }
+
+def get_applicable_process_dimensions(session_id: UUID, process_name: str, db: Session) -> Optional[Dict[str, float]]:
+    """Medie delle 4 dimensioni di un processo (None se non ci sono risposte applicabili)"""
+    rows = [row for row in get_session_aggregates(session_id, db) if row.process == process_name]
+    by_category = combine_aggregates(rows, key=lambda row: row.category)
+    applicable = [(category, item['average']) for category, item in by_category.items() if item['average'] is not None]
+    if not applicable:
+        return None
+
+    dimensions = {"Governance": 0.0, "Monitoring": 0.0, "Technology": 0.0, "Organization": 0.0}
+    for category, avg_score in applicable:
+        for key, dimension in DIMENSION_MAPPING.items():
+            if key.lower() in category.lower():
+                dimensions[dimension] = float(avg_score)
+                break
+    return dimensions
+
 # ============================================================================
 # ENDPOINT PRINCIPALI AGGIORNATI
 # ============================================================================
@@ -40,18 +77,12 @@ def processes_radar_data(session_id: UUID, db: Session = Depends(database.get_db
     try:
         print(f"🎯 DEBUG: processes_radar_data per sessione {session_id}")
         
-        # ✅ QUERY AGGIORNATA - ESCLUDE is_not_applicable = True
-        results = (
-            db.query(
-                models.AssessmentResult.process,
-                models.AssessmentResult.category,
-                func.avg(models.AssessmentResult.score).label("avg_score")
-            )
-            .filter(models.AssessmentResult.session_id == session_id)
-            .filter(models.AssessmentResult.is_not_applicable.is_(False))  # ✅ FILTRO CHIAVE
-            .group_by(models.AssessmentResult.process, models.AssessmentResult.category)
-            .all()
-        )
+        # ✅ Letto dagli aggregati per (processo, categoria) - ESCLUDE NON APPLICABILI
+        results = [
+            (row.process, row.category, row.score_sum / row.answer_count)
+            for row in get_session_aggregates(session_id, db)
+            if row.answer_count > 0
+        ]
 
         print(f"🔍 DEBUG: Trovati {len(results) if results else 0} risultati applicabili")
 
@@ -141,17 +172,13 @@ def radar_data(session_id: UUID, db: Session = Depends(database.get_db)):
     try:
         print(f"🎯 DEBUG: radar_data per sessione {session_id}")
         
-        # ✅ QUERY AGGIORNATA - ESCLUDE is_not_applicable = True
-        results = (
-            db.query(
-                models.AssessmentResult.process,
-                func.avg(models.AssessmentResult.score).label("avg_score")
-            )
-            .filter(models.AssessmentResult.session_id == session_id)
-            .filter(models.AssessmentResult.is_not_applicable.is_(False))  # ✅ FILTRO CHIAVE
-            .group_by(models.AssessmentResult.process)
-            .all()
-        )
+        # ✅ Letto dagli aggregati - ESCLUDE NON APPLICABILI
+        by_process = combine_aggregates(get_session_aggregates(session_id, db))
+        results = [
+            (process, agg["average"])
+            for process, agg in by_process.items()
+            if agg["answer_count"] > 0
+        ]
 
         print(f"🔍 DEBUG: radar_data trovati {len(results) if results else 0} processi applicabili")
 
@@ -199,80 +226,56 @@ def radar_data(session_id: UUID, db: Session = Depends(database.get_db)):
         raise HTTPException(status_code=500, detail=f"Errore nel calcolo dei dati radar: {str(e)}")
 
 @router.get("/assessment/{session_id}/radar-image")
-def radar_image(session_id: UUID, db: Session = Depends(database.get_db)):
+def radar_image(session_id: UUID, request: Request, db: Session = Depends(database.get_db)):
     """Genera l'immagine del radar chart aggregato - SEMPRE RADAR CLASSICO - ESCLUDE NON APPLICABILI"""
     try:
         print(f"🎯 RADAR IMAGE: Inizio generazione radar classico per sessione {session_id}")
-        
-        # ✅ QUERY AGGIORNATA - ESCLUDE is_not_applicable = True
-        results = (
-            db.query(
-                models.AssessmentResult.process,
-                func.avg(models.AssessmentResult.score).label("avg_score")
-            )
-            .filter(models.AssessmentResult.session_id == session_id)
-            .filter(models.AssessmentResult.is_not_applicable.is_(False))  # ✅ FILTRO CHIAVE
-            .group_by(models.AssessmentResult.process)
-            .all()
-        )
 
-        print(f"🔍 RADAR IMAGE: Trovati {len(results) if results else 0} processi applicabili")
-        
-        if not results:
+        # ✅ Medie per processo dagli aggregati - ESCLUDE is_not_applicable = True
+        processes_scores = get_applicable_process_averages(session_id, db)
+        print(f"🔍 RADAR IMAGE: Trovati {len(processes_scores)} processi applicabili")
+
+        if not processes_scores:
             print(f"❌ RADAR IMAGE: Nessun dato applicabile, creando placeholder")
-            return create_placeholder_radar_image()
+            return cached_render(request, "radar-image-placeholder", {}, None,
+                                 render_placeholder_radar_png, "image/png")
+
+        # Estrai labels e values
+        raw_labels = list(processes_scores.keys())
+        values = list(processes_scores.values())
 
-        # Estrai e processa labels e values
-        raw_labels = [r[0] for r in results]
-        values = [float(r[1]) for r in results]
-        
-        print(f"📊 RADAR IMAGE: Processi applicabili da visualizzare:")
-        for i, (label, val) in enumerate(zip(raw_labels, values)):
-            print(f"  {i+1}. {label}: {val:.2f}")
-        
         # FORZA SEMPRE RADAR CLASSICO (anche per 8+ processi)
-        print("🎯 RADAR IMAGE: Forzando radar chart classico (solo applicabili)")
-        return create_radar_chart_optimized(raw_labels, values)
-        
+        return cached_render(
+            request, "radar-image", {}, [raw_labels, values],
+            lambda: render_radar_chart_png(raw_labels, values), "image/png"
+        )
+
     except Exception as e:
         print(f"💥 RADAR IMAGE: Errore {str(e)}")
         print(f"💥 RADAR IMAGE: Traceback {traceback.format_exc()}")
         return create_error_image(session_id, str(e))
 
 @router.get("/assessment/{session_id}/summary-radar-svg")
-def summary_radar_svg(session_id: UUID, db: Session = Depends(database.get_db)):
+def summary_radar_svg(session_id: UUID, request: Request, db: Session = Depends(database.get_db)):
     """Genera un radar chart SVG riassuntivo - ESCLUDE NON APPLICABILI"""
     try:
         print(f"🎯 SVG RADAR: Generando per sessione {session_id}")
-        
-        # ✅ QUERY AGGIORNATA - ESCLUDE is_not_applicable = True
-        results = (
-            db.query(
-                models.AssessmentResult.process,
-                func.avg(models.AssessmentResult.score).label("avg_score")
-            )
-            .filter(models.AssessmentResult.session_id == session_id)
-            .filter(models.AssessmentResult.is_not_applicable.is_(False))  # ✅ FILTRO CHIAVE
-            .group_by(models.AssessmentResult.process)
-            .all()
-        )
 
-        print(f"🔍 SVG RADAR: Trovati {len(results) if results else 0} processi applicabili")
+        # ✅ Medie per processo dagli aggregati - ESCLUDE is_not_applicable = True
+        processes_scores = get_applicable_process_averages(session_id, db)
+        print(f"🔍 SVG RADAR: Trovati {len(processes_scores)} processi applicabili")
 
-        if not results:
+        if not processes_scores:
             print("❌ SVG RADAR: Nessun dato applicabile, usando placeholder")
-            return Response(content=create_placeholder_summary_radar_svg(), media_type="image/svg+xml")
-
-        # Organizza i dati
-        processes_scores = {}
-        for process, avg_score in results:
-            processes_scores[process] = float(avg_score)
-            print(f"  📊 {process}: {avg_score}")
+            return cached_render(request, "summary-radar-svg-placeholder", {}, None,
+                                 create_placeholder_summary_radar_svg, "image/svg+xml")
 
         # Genera SVG radar classico
-        svg_content = create_summary_radar_svg_classic(processes_scores)
-        return Response(content=svg_content, media_type="image/svg+xml")
-        
+        return cached_render(
+            request, "summary-radar-svg", {}, processes_scores,
+            lambda: create_summary_radar_svg_classic(processes_scores), "image/svg+xml"
+        )
+
     except Exception as e:
         print(f"💥 SVG RADAR: Errore {e}")
         print(f"💥 SVG RADAR: Traceback {traceback.format_exc()}")
@@ -284,54 +287,26 @@ def summary_radar_svg(session_id: UUID, db: Session = Depends(database.get_db)):
 # ============================================================================
 
 @router.get("/assessment/{session_id}/process-radar-svg")
-def process_radar_svg_fixed(session_id: UUID, process_name: str, db: Session = Depends(database.get_db)):
+def process_radar_svg_fixed(session_id: UUID, process_name: str, request: Request, db: Session = Depends(database.get_db)):
     """Genera un radar chart SVG per un singolo processo - VERSIONE FISSA - ESCLUDE NON APPLICABILI"""
     try:
         print(f"🎯 [FIXED] Generando radar SVG per processo: {process_name}")
-        
-        # ✅ QUERY AGGIORNATA - ESCLUDE is_not_applicable = True
-        results = (
-            db.query(
-                models.AssessmentResult.category,
-                func.avg(models.AssessmentResult.score).label("avg_score")
-            )
-            .filter(models.AssessmentResult.session_id == session_id)
-            .filter(models.AssessmentResult.process == process_name)
-            .filter(models.AssessmentResult.is_not_applicable.is_(False))  # ✅ FILTRO CHIAVE
-            .group_by(models.AssessmentResult.category)
-            .all()
-        )
 
-        if not results:
-            print(f"❌ [FIXED] Nessun risultato applicabile per processo {process_name}")
-            svg_content = create_placeholder_radar_svg(process_name)
-            return Response(content=svg_content, media_type="image/svg+xml")
-
-        # Prepara dimensioni
-        dimensions = {
-            "Governance": 0.0,
-            "Monitoring": 0.0, 
-            "Technology": 0.0,
-            "Organization": 0.0
-        }
-        
-        dimension_mapping = {
-            "Governance": "Governance", "Process": "Governance",
-            "Monitoring": "Monitoring", "Control": "Monitoring", 
-            "Technology": "Technology", "Tech": "Technology", "ICT": "Technology",
-            "Organization": "Organization", "Org": "Organization", "People": "Organization"
-        }
+        dimensions = get_applicable_process_dimensions(session_id, process_name, db)
 
-        for category, avg_score in results:
-            for key, dimension in dimension_mapping.items():
-                if key.lower() in category.lower():
-                    dimensions[dimension] = float(avg_score)
-                    break
+        if dimensions is None:
+            print(f"❌ [FIXED] Nessun risultato applicabile per processo {process_name}")
+            return cached_render(
+                request, "process-radar-svg-placeholder", {"process": process_name}, None,
+                lambda: create_placeholder_radar_svg(process_name), "image/svg+xml"
+            )
 
         print(f"📊 [FIXED] Dimensioni applicabili per {process_name}: {dimensions}")
-        svg_content = create_radar_svg(dimensions, process_name)
-        return Response(content=svg_content, media_type="image/svg+xml")
-        
+        return cached_render(
+            request, "process-radar-svg", {"process": process_name}, dimensions,
+            lambda: create_radar_svg(dimensions, process_name), "image/svg+xml"
+        )
+
     except Exception as e:
         print(f"💥 [FIXED] Errore process radar svg: {e}")
         print(f"💥 [FIXED] Traceback: {traceback.format_exc()}")
@@ -339,89 +314,24 @@ def process_radar_svg_fixed(session_id: UUID, process_name: str, db: Session = D
         return Response(content=error_svg, media_type="image/svg+xml")
 
 @router.get("/assessment/{session_id}/process-radar-image")
-def process_radar_image_fixed(session_id: UUID, process_name: str, db: Session = Depends(database.get_db)):
+def process_radar_image_fixed(session_id: UUID, process_name: str, request: Request, db: Session = Depends(database.get_db)):
     """Genera l'immagine del radar chart per un singolo processo - VERSIONE FISSA - ESCLUDE NON APPLICABILI"""
     try:
         print(f"🎯 [FIXED] Generando radar matplotlib per processo: {process_name}")
-        
-        # ✅ QUERY AGGIORNATA - ESCLUDE is_not_applicable = True
-        results = (
-            db.query(
-                models.AssessmentResult.category,
-                func.avg(models.AssessmentResult.score).label("avg_score")
-            )
-            .filter(models.AssessmentResult.session_id == session_id)
-            .filter(models.AssessmentResult.process == process_name)
-            .filter(models.AssessmentResult.is_not_applicable.is_(False))  # ✅ FILTRO CHIAVE
-            .group_by(models.AssessmentResult.category)
-            .all()
-        )
-
-        if not results:
-            raise HTTPException(status_code=404, detail=f"No applicable results found for process {process_name}")
-
-        # Prepara i dati per le 4 dimensioni
-        dimensions = {
-            "Governance": 0,
-            "Monitoring": 0, 
-            "Technology": 0,
-            "Organization": 0
-        }
-        
-        dimension_mapping = {
-            "Governance": "Governance", "Process": "Governance",
-            "Monitoring": "Monitoring", "Control": "Monitoring", 
-            "Technology": "Technology", "Tech": "Technology", "ICT": "Technology",
-            "Organization": "Organization", "Org": "Organization", "People": "Organization"
-        }
-
-        for category, avg_score in results:
-            for key, dimension in dimension_mapping.items():
-                if key.lower() in category.lower():
-                    dimensions[dimension] = float(avg_score)
-                    break
 
-        # Dati per il radar chart
-        labels = list(dimensions.keys())
-        values = list(dimensions.values())
-        
-        # Calcola angoli per 4 dimensioni
-        angles = np.linspace(0, 2 * np.pi, 4, endpoint=False).tolist()
-        angles += angles[:1]  # Chiudi il cerchio
-        values += values[:1]   # Chiudi il cerchio
-        labels += labels[:1]   # Chiudi il cerchio
+        dimensions = get_applicable_process_dimensions(session_id, process_name, db)
 
-        # Crea il grafico radar
-        fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(polar=True))
-        
-        # Disegna il radar
-        ax.plot(angles, values, linewidth=3, linestyle='solid', color='#3B82F6', alpha=0.9)
-        ax.fill(angles, values, alpha=0.25, color='#3B82F6')
-        
-        # Configura gli assi
-        ax.set_yticks([1, 2, 3, 4, 5])
-        ax.set_yticklabels(['1', '2', '3', '4', '5'], fontsize=11)
-        ax.set_ylim(0, 5)
-        
-        # Configura le etichette
-        ax.set_xticks(angles[:-1])
-        ax.set_xticklabels(labels[:-1], fontsize=12, fontweight='bold')
-        
-        # Stile
-        ax.grid(True, alpha=0.3)
-        ax.set_facecolor('white')
-        ax.set_title(f"{process_name}\nDigital Assessment (Solo Applicabili)", 
-                    fontsize=14, fontweight='bold', pad=20, color='#1F2937')
+        if dimensions is None:
+            raise HTTPException(status_code=404, detail=f"No applicable results found for process {process_name}")
 
-        # Salva in buffer
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", dpi=150, bbox_inches='tight', 
-                   facecolor='white', edgecolor='none', transparent=False)
-        plt.close(fig)
-        buf.seek(0)
+        title = f"{process_name}\nDigital Assessment (Solo Applicabili)"
+        return cached_render(
+            request, "process-radar-image", {"title": title}, dimensions,
+            lambda: render_process_radar_png(dimensions, title), "image/png"
+        )
 
-        return StreamingResponse(buf, media_type="image/png")
-        
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"💥 [FIXED] Errore in process_radar_image: {e}")
         print(f"💥 [FIXED] Traceback: {traceback.format_exc()}")
@@ -432,59 +342,30 @@ def process_radar_image_fixed(session_id: UUID, process_name: str, db: Session =
 # ============================================================================
 
 @router.get("/assessment/{session_id}/process-radar-svg/{process_name}")
-def process_radar_svg_legacy(session_id: UUID, process_name: str, db: Session = Depends(database.get_db)):
+def process_radar_svg_legacy(session_id: UUID, process_name: str, request: Request, db: Session = Depends(database.get_db)):
     """Genera un radar chart SVG per un singolo processo - LEGACY - ESCLUDE NON APPLICABILI"""
     try:
         decoded_process_name = unquote(process_name)
         print(f"🔍 [LEGACY] Process originale URL: {process_name}")
         print(f"🔍 [LEGACY] Process decodificato: {decoded_process_name}")
         print(f"🎯 [LEGACY] Generando radar SVG per processo: {decoded_process_name}")
-        
-        # ✅ QUERY AGGIORNATA - ESCLUDE is_not_applicable = True
-        results = (
-            db.query(
-                models.AssessmentResult.category,
-                func.avg(models.AssessmentResult.score).label("avg_score")
-            )
-            .filter(models.AssessmentResult.session_id == session_id)
-            .filter(models.AssessmentResult.process == decoded_process_name)
-            .filter(models.AssessmentResult.is_not_applicable.is_(False))  # ✅ FILTRO CHIAVE
-            .group_by(models.AssessmentResult.category)
-            .all()
-        )
 
-        if not results:
+        dimensions = get_applicable_process_dimensions(session_id, decoded_process_name, db)
+
+        if dimensions is None:
             print(f"❌ [LEGACY] Nessun risultato applicabile per processo {decoded_process_name}")
             return Response(
                 content=f'<svg width="300" height="300" xmlns="http://www.w3.org/2000/svg"><rect width="300" height="300" fill="#fff3cd"/><text x="150" y="140" font-family="Arial" font-size="12" text-anchor="middle" fill="#856404">Endpoint deprecato - Solo Applicabili</text><text x="150" y="160" font-family="Arial" font-size="10" text-anchor="middle" fill="#856404">Usa: ?process_name={decoded_process_name}</text></svg>',
                 media_type="image/svg+xml"
             )
 
-        # Stesso codice della versione fissa per compatibilità
-        dimensions = {
-            "Governance": 0.0,
-            "Monitoring": 0.0, 
-            "Technology": 0.0,
-            "Organization": 0.0
-        }
-        
-        dimension_mapping = {
-            "Governance": "Governance", "Process": "Governance",
-            "Monitoring": "Monitoring", "Control": "Monitoring", 
-            "Technology": "Technology", "Tech": "Technology", "ICT": "Technology",
-            "Organization": "Organization", "Org": "Organization", "People": "Organization"
-        }
-
-        for category, avg_score in results:
-            for key, dimension in dimension_mapping.items():
-                if key.lower() in category.lower():
-                    dimensions[dimension] = float(avg_score)
-                    break
-
+        # Stesso render (e stessa voce di cache) della versione fissa
         print(f"📊 [LEGACY] Dimensioni applicabili per {decoded_process_name}: {dimensions}")
-        svg_content = create_radar_svg(dimensions, decoded_process_name)
-        return Response(content=svg_content, media_type="image/svg+xml")
-        
+        return cached_render(
+            request, "process-radar-svg", {"process": decoded_process_name}, dimensions,
+            lambda: create_radar_svg(dimensions, decoded_process_name), "image/svg+xml"
+        )
+
     except Exception as e:
         print(f"💥 [LEGACY] Errore process radar svg: {e}")
         print(f"💥 [LEGACY] Process name originale: {process_name}")
@@ -493,82 +374,27 @@ def process_radar_svg_legacy(session_id: UUID, process_name: str, db: Session =
         return Response(content=error_svg, media_type="image/svg+xml")
 
 @router.get("/assessment/{session_id}/process-radar-image/{process_name}")
-def process_radar_image_legacy(session_id: UUID, process_name: str, db: Session = Depends(database.get_db)):
+def process_radar_image_legacy(session_id: UUID, process_name: str, request: Request, db: Session = Depends(database.get_db)):
     """Genera l'immagine del radar chart per un singolo processo - LEGACY - ESCLUDE NON APPLICABILI"""
     try:
         decoded_process_name = unquote(process_name)
         print(f"🔍 [LEGACY] Process originale URL: {process_name}")
         print(f"🔍 [LEGACY] Process decodificato: {decoded_process_name}")
         print(f"🎯 [LEGACY] Generando radar matplotlib per processo: {decoded_process_name}")
-        
-        # ✅ QUERY AGGIORNATA - ESCLUDE is_not_applicable = True
-        results = (
-            db.query(
-                models.AssessmentResult.category,
-                func.avg(models.AssessmentResult.score).label("avg_score")
-            )
-            .filter(models.AssessmentResult.session_id == session_id)
-            .filter(models.AssessmentResult.process == decoded_process_name)
-            .filter(models.AssessmentResult.is_not_applicable.is_(False))  # ✅ FILTRO CHIAVE
-            .group_by(models.AssessmentResult.category)
-            .all()
-        )
 
-        if not results:
-            raise HTTPException(status_code=404, detail=f"No applicable results found for process {decoded_process_name}. Try using query parameter: ?process_name={decoded_process_name}")
-
-        # Stesso codice della versione fissa
-        dimensions = {
-            "Governance": 0,
-            "Monitoring": 0, 
-            "Technology": 0,
-            "Organization": 0
-        }
-        
-        dimension_mapping = {
-            "Governance": "Governance", "Process": "Governance",
-            "Monitoring": "Monitoring", "Control": "Monitoring", 
-            "Technology": "Technology", "Tech": "Technology", "ICT": "Technology",
-            "Organization": "Organization", "Org": "Organization", "People": "Organization"
-        }
-
-        for category, avg_score in results:
-            for key, dimension in dimension_mapping.items():
-                if key.lower() in category.lower():
-                    dimensions[dimension] = float(avg_score)
-                    break
-
-        # Crea il grafico
-        labels = list(dimensions.keys())
-        values = list(dimensions.values())
-        
-        angles = np.linspace(0, 2 * np.pi, 4, endpoint=False).tolist()
-        angles += angles[:1]
-        values += values[:1]
-        labels += labels[:1]
+        dimensions = get_applicable_process_dimensions(session_id, decoded_process_name, db)
 
-        fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(polar=True))
-        ax.plot(angles, values, linewidth=3, linestyle='solid', color='#3B82F6', alpha=0.9)
-        ax.fill(angles, values, alpha=0.25, color='#3B82F6')
-        
-        ax.set_yticks([1, 2, 3, 4, 5])
-        ax.set_yticklabels(['1', '2', '3', '4', '5'], fontsize=11)
-        ax.set_ylim(0, 5)
-        ax.set_xticks(angles[:-1])
-        ax.set_xticklabels(labels[:-1], fontsize=12, fontweight='bold')
-        ax.grid(True, alpha=0.3)
-        ax.set_facecolor('white')
-        ax.set_title(f"{decoded_process_name}\nDigital Assessment (Legacy - Solo Applicabili)", 
-                    fontsize=14, fontweight='bold', pad=20, color='#1F2937')
+        if dimensions is None:
+            raise HTTPException(status_code=404, detail=f"No applicable results found for process {decoded_process_name}. Try using query parameter: ?process_name={decoded_process_name}")
 
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", dpi=150, bbox_inches='tight', 
-                   facecolor='white', edgecolor='none', transparent=False)
-        plt.close(fig)
-        buf.seek(0)
+        title = f"{decoded_process_name}\nDigital Assessment (Legacy - Solo Applicabili)"
+        return cached_render(
+            request, "process-radar-image", {"title": title}, dimensions,
+            lambda: render_process_radar_png(dimensions, title), "image/png"
+        )
 
-        return StreamingResponse(buf, media_type="image/png")
-        
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"💥 [LEGACY] Errore in process_radar_image: {e}")
         raise HTTPException(status_code=500, detail=f"Errore nella generazione del radar chart: {str(e)}")
@@ -583,32 +409,20 @@ def detailed_stats(session_id: UUID, db: Session = Depends(database.get_db)):
     try:
         print(f"📊 DETAILED STATS: Iniziando per sessione {session_id}")
         
-        # Conta totali
-        total_results = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id
-        ).count()
+        # ✅ Tutto dagli aggregati della sessione (una sola query)
+        by_process = combine_aggregates(get_session_aggregates(session_id, db))
         
-        applicable_results = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(False)
-        ).count()
-        
-        not_applicable_results = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(True)
-        ).count()
+        applicable_results = sum(agg["answer_count"] for agg in by_process.values())
+        not_applicable_results = sum(agg["na_count"] for agg in by_process.values())
+        total_results = applicable_results + not_applicable_results
         
         print(f"📊 TOTALI: {total_results} totali, {applicable_results} applicabili, {not_applicable_results} non applicabili")
         
         # Distribuzione per processo
-        process_stats = db.query(
-            models.AssessmentResult.process,
-            func.count(func.case([(models.AssessmentResult.is_not_applicable.is_(False), 1)])).label("applicable_count"),
-            func.count(func.case([(models.AssessmentResult.is_not_applicable.is_(True), 1)])).label("not_applicable_count"),
-            func.avg(func.case([(models.AssessmentResult.is_not_applicable.is_(False), models.AssessmentResult.score)])).label("avg_score")
-        ).filter(
-            models.AssessmentResult.session_id == session_id
-        ).group_by(models.AssessmentResult.process).all()
+        process_stats = [
+            (process, agg["answer_count"], agg["na_count"], agg["average"])
+            for process, agg in by_process.items()
+        ]
         
         print(f"📊 PROCESSI: Analizzati {len(process_stats)} processi")
         
@@ -637,32 +451,70 @@ def detailed_stats(session_id: UUID, db: Session = Depends(database.get_db)):
         print(f"❌ Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Errore statistiche: {str(e)}")
 
+def _get_session(session_id: UUID, db: Session):
+    return db.query(models.AssessmentSession).filter(
+        models.AssessmentSession.id == session_id
+    ).first()
+
+def _session_and_applicable_results(session_id: UUID, db: Session):
+    """
+    (sessione, risposte applicabili) per gli endpoint AI async. Funzione
+    sincrona: va eseguita con run_in_threadpool, sull'event loop si attende solo l'AI
+    """
+    results = db.query(models.AssessmentResult).filter(
+        models.AssessmentResult.session_id == session_id,
+        models.AssessmentResult.is_not_applicable.is_(False)
+    ).all()
+    return _get_session(session_id, db), results
+
+def _critical_areas(results) -> List[Dict]:
+    """Risposte applicabili con punteggio < 3"""
+    return [
+        {
+            "process": r.process,
+            "category": r.category,
+            "dimension": r.dimension,
+            "score": r.score,
+            "note": r.note
+        }
+        for r in results if r.score < 3
+    ]
+
+def _suggestions_messages(critical_areas: List[Dict], applicable_count: int) -> List[Dict[str, str]]:
+    """Messaggi per i suggerimenti AI sulle aree critiche"""
+    # Prompt migliorato rispetto all'originale
+    prompt = f"""Sei un esperto di trasformazione digitale per aziende italiane.
+
+AREE CRITICHE IDENTIFICATE ({len(critical_areas)} su {applicable_count} domande applicabili, punteggi su 5):
+Processi e domande sono indicati dai codici definiti sopra la tabella.
+
+{encode_critical_areas(critical_areas)}
+"""
+
+    prompt += """
+Per ogni area critica, fornisci raccomandazioni specifiche e actionable.
+Nella risposta cita processi e domande per esteso, mai con i codici della tabella.
+Rispondi in italiano, tono professionale ma accessibile."""
+
+    return [
+        {"role": "system", "content": "Sei un correttore di bozze professionale. Il tuo compito è SOLO correggere errori di grammatica, punteggiatura, ortografia e sintassi. REGOLE FONDAMENTALI: 1) NON riassumere MAI il testo 2) NON eliminare frasi o paragrafi 3) NON cambiare il significato 4) Mantieni TUTTA la lunghezza originale 5) Mantieni la formattazione markdown (###, **, ecc). Correggi solo gli errori mantenendo tutto il resto identico."},
+        {"role": "user", "content": prompt}
+    ]
+
 @router.get("/assessment/{session_id}/ai-suggestions-enhanced")
-def ai_suggestions_enhanced(session_id: UUID, include_roadmap: bool = False, regenerate: bool = False, db: Session = Depends(database.get_db)):
+async def ai_suggestions_enhanced(session_id: UUID, include_roadmap: bool = False, regenerate: bool = False, db: Session = Depends(database.get_db)):
     """Versione migliorata dell'endpoint ai-suggestions originale"""
     try:
         print(f"🤖 AI SUGGESTIONS ENHANCED: Per sessione {session_id}")
         
-        # Carica risultati applicabili (come versione originale)
-        results = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(False)
-        ).all()
+        # Sessione e risultati applicabili (query nel threadpool)
+        session, results = await run_in_threadpool(_session_and_applicable_results, session_id, db)
 
         if not results:
             raise HTTPException(status_code=404, detail="No applicable assessment results found")
 
         # Mantieni compatibilità con versione originale
-        critical_areas = [
-            {
-                "process": r.process,
-                "category": r.category,
-                "dimension": r.dimension,
-                "score": r.score,
-                "note": r.note
-            }
-            for r in results if r.score < 3
-        ]
+        critical_areas = _critical_areas(results)
         
         if not critical_areas:
             return {
@@ -672,11 +524,6 @@ def ai_suggestions_enhanced(session_id: UUID, include_roadmap: bool = False, reg
                 "enhanced_available": True
             }
 
-        # Carica la sessione
-        session = db.query(models.AssessmentSession).filter(
-            models.AssessmentSession.id == session_id
-        ).first()
-        
         # Se esistono raccomandazioni salvate e non è richiesta la rigenerazione, restituiscile
         if session and session.raccomandazioni and not regenerate:
             print(f"✅ Restituisco raccomandazioni salvate per sessione {session_id}")
@@ -697,15 +544,13 @@ def ai_suggestions_enhanced(session_id: UUID, include_roadmap: bool = False, reg
                 }
                 
                 # Usa il modulo AI avanzato
-                advanced_recommendations = get_ai_recommendations_advanced(
-                    str(session_id), results, session_data
+                advanced_recommendations = await get_ai_recommendations_advanced(
+                    str(session_id), results, session_data, regenerate=regenerate
                 )
                 
                 # Salva le raccomandazioni nel database
                 ai_content = advanced_recommendations["ai_recommendations"]["content"]
-                session.raccomandazioni = ai_content
-                db.commit()
-                print(f"💾 Raccomandazioni AI salvate per sessione {session_id}")
+                await run_in_threadpool(save_session_text, session_id, "raccomandazioni", ai_content)
                 
                 return {
                     "critical_count": len(critical_areas),
@@ -720,50 +565,29 @@ def ai_suggestions_enhanced(session_id: UUID, include_roadmap: bool = False, reg
             print(f"⚠️ Fallback to basic AI: {e}")
         
         # Fallback alla versione originale migliorata
-        if not openai.api_key:
+        if not llm_configured():
             return {
                 "critical_count": len(critical_areas),
                 "suggestions": "⚠️ API OpenAI non configurata. Configurare OPENAI_API_KEY per suggerimenti personalizzati.",
                 "enhanced_available": False
             }
 
-        # Prompt migliorato rispetto all'originale
-        prompt = f"""Sei un esperto di trasformazione digitale per aziende italiane.
-
-AREE CRITICHE IDENTIFICATE ({len(critical_areas)} su {len(results)} domande applicabili):
-"""
-        
-        for item in critical_areas:
-            prompt += f"\n🔴 [{item['process']}] {item['category']} → {item['dimension']} (Punteggio: {item['score']}/5)\n"
-            if item['note']:
-                prompt += f"  💬 Nota: {item['note']}\n"
-
-        prompt += """
-Per ogni area critica, fornisci raccomandazioni specifiche e actionable.
-Rispondi in italiano, tono professionale ma accessibile."""
-
         try:
-            response = openai.chat.completions.create(
-                model=os.getenv("OPENAI_MODEL", "gpt-4o"),
-                messages=[
-                    {"role": "system", "content": "Sei un correttore di bozze professionale. Il tuo compito è SOLO correggere errori di grammatica, punteggiatura, ortografia e sintassi. REGOLE FONDAMENTALI: 1) NON riassumere MAI il testo 2) NON eliminare frasi o paragrafi 3) NON cambiare il significato 4) Mantieni TUTTA la lunghezza originale 5) Mantieni la formattazione markdown (###, **, ecc). Correggi solo gli errori mantenendo tutto il resto identico."},
-                    {"role": "user", "content": prompt}
-                ],
+            ai_content = await cached_chat_completion(
+                _suggestions_messages(critical_areas, len(results)),
+                regenerate=regenerate,
                 max_completion_tokens=4000,
             )
             
             # Salva le raccomandazioni nel database
-            ai_content = response.choices[0].message.content
             if session:
-                session.raccomandazioni = ai_content
-                db.commit()
-                print(f"💾 Raccomandazioni AI (fallback) salvate per sessione {session_id}")
+                await run_in_threadpool(save_session_text, session_id, "raccomandazioni", ai_content)
             
             return {
                 "critical_count": len(critical_areas),
                 "suggestions": ai_content,
                 "enhanced_mode": False,
-                "model_used": os.getenv("OPENAI_MODEL", "gpt-4")
+                "model_used": DEFAULT_MODEL
             }
             
         except Exception as e:
@@ -778,6 +602,71 @@ Rispondi in italiano, tono professionale ma accessibile."""
         print(f"❌ Errore ai_suggestions_enhanced: {e}")
         raise HTTPException(status_code=500, detail=f"Errore suggerimenti: {str(e)}")
 
+@router.get("/assessment/{session_id}/ai-suggestions-enhanced/stream")
+async def ai_suggestions_enhanced_stream(session_id: UUID, include_roadmap: bool = False, regenerate: bool = False, db: Session = Depends(database.get_db)):
+    """
+    Variante SSE di ai-suggestions-enhanced: il testo arriva man mano che viene
+    generato e a stream concluso viene salvato in raccomandazioni
+    """
+    print(f"🤖 AI SUGGESTIONS STREAM: Per sessione {session_id}")
+
+    session, results = await run_in_threadpool(_session_and_applicable_results, session_id, db)
+
+    if not results:
+        raise HTTPException(status_code=404, detail="No applicable assessment results found")
+
+    critical_areas = _critical_areas(results)
+    meta = {"critical_count": len(critical_areas)}
+
+    if not critical_areas:
+        return sse_response(text_events(
+            "🎉 Ottimo lavoro! Tutti i punteggi applicabili sono accettabili.",
+            meta={**meta, "message": "Nessuna area critica rilevata nelle domande applicabili"},
+        ))
+
+    if session and session.raccomandazioni and not regenerate:
+        return sse_response(text_events(session.raccomandazioni, meta={**meta, "enhanced_mode": True}))
+
+    if not llm_configured():
+        return sse_response(text_events(
+            "⚠️ API OpenAI non configurata. Configurare OPENAI_API_KEY per suggerimenti personalizzati.",
+            meta={**meta, "enhanced_available": False},
+        ))
+
+    target = session.id if session else None
+    if session and include_roadmap:
+        engine = AIRecommendationEngine()
+        report, analysis, company_context = await run_in_threadpool(
+            engine.prepare_advanced_recommendations, str(session_id), results, {
+                "azienda_nome": session.azienda_nome,
+                "settore": session.settore,
+                "dimensione": session.dimensione
+            }
+        )
+        return sse_response(completion_events(
+            engine.recommendation_messages(analysis, company_context),
+            meta={
+                **meta,
+                "enhanced_mode": True,
+                "roadmap_included": True,
+                "priority_matrix": report["priority_matrix"],
+                "roi_predictions": report["roi_predictions"]
+            },
+            session_id=target,
+            field="raccomandazioni",
+            regenerate=regenerate,
+            **engine.completion_params()
+        ))
+
+    return sse_response(completion_events(
+        _suggestions_messages(critical_areas, len(results)),
+        meta={**meta, "enhanced_mode": False},
+        session_id=target,
+        field="raccomandazioni",
+        regenerate=regenerate,
+        max_completion_tokens=4000,
+    ))
+
 print("✅ Modifiche radar.py con integrazione AI module completate!")
 print("🏨 Supporto settore TURISMO attivato!")
 print("🤖 Endpoints AI avanzati disponibili:")
@@ -792,18 +681,15 @@ def assessment_summary(session_id: UUID, db: Session = Depends(database.get_db))
     try:
         print(f"📋 SUMMARY: Iniziando per sessione {session_id}")
         
-        # Totale domande (include anche non applicabili per statistica)
-        total_questions = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id
-        ).count()
-        
-        # ✅ CONTA SOLO QUELLE APPLICABILI
-        applicable_questions = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(False)
-        ).count()
+        # ✅ Tutto dagli aggregati della sessione (una sola query)
+        aggregates = get_session_aggregates(session_id, db)
+        by_process = combine_aggregates(aggregates)
+        overall = combine_aggregates(aggregates, key=lambda row: None).get(None)
         
-        not_applicable_questions = total_questions - applicable_questions
+        # Totale domande (include anche non applicabili per statistica)
+        applicable_questions = overall["answer_count"] if overall else 0
+        not_applicable_questions = overall["na_count"] if overall else 0
+        total_questions = applicable_questions + not_applicable_questions
         
         print(f"📋 SUMMARY: {total_questions} totali, {applicable_questions} applicabili, {not_applicable_questions} non applicabili")
         
@@ -811,29 +697,19 @@ def assessment_summary(session_id: UUID, db: Session = Depends(database.get_db))
             raise HTTPException(status_code=404, detail="No applicable assessment data found")
         
         # ✅ MEDIA SOLO SU QUELLE APPLICABILI
-        avg_score = db.query(func.avg(models.AssessmentResult.score)).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(False)
-        ).scalar()
+        avg_score = overall["average"]
         
         # ✅ DISTRIBUZIONE SOLO SU QUELLE APPLICABILI
-        score_distribution = db.query(
-            models.AssessmentResult.score,
-            func.count(models.AssessmentResult.score).label('count')
-        ).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(False)
-        ).group_by(models.AssessmentResult.score).all()
+        score_distribution = [
+            (score, count) for score, count in enumerate(overall["distribution"]) if count > 0
+        ]
         
         # ✅ PUNTEGGI PER PROCESSO SOLO SU QUELLE APPLICABILI
-        process_scores = db.query(
-            models.AssessmentResult.process,
-            func.avg(models.AssessmentResult.score).label("avg_score"),
-            func.count(models.AssessmentResult.score).label("applicable_count")
-        ).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(False)
-        ).group_by(models.AssessmentResult.process).all()
+        process_scores = [
+            (process, agg["average"], agg["answer_count"])
+            for process, agg in by_process.items()
+            if agg["answer_count"] > 0
+        ]
         
         print(f"📋 SUMMARY: Media generale applicabili: {avg_score:.2f}")
         
@@ -961,21 +837,24 @@ def test_radar_debug(session_id: UUID, db: Session = Depends(database.get_db)):
     try:
         print(f"🔍 DEBUG TEST: Iniziando per sessione {session_id}")
         
-        # Test 1: Verifica connessione DB
-        total_results = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id
-        ).count()
-        
-        # ✅ CONTA APPLICABILI E NON APPLICABILI
-        applicable_results = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(False)
-        ).count()
+        # Test 1-2: un'unica query raggruppata per processo con aggregati condizionali
+        applicable = models.AssessmentResult.is_not_applicable.is_(False)
+        rows = (
+            db.query(
+                models.AssessmentResult.process,
+                func.count().label("total"),
+                func.count().filter(applicable).label("applicable"),
+                func.count().filter(models.AssessmentResult.is_not_applicable.is_(True)).label("not_applicable"),
+                func.avg(models.AssessmentResult.score).filter(applicable).label("avg_score")
+            )
+            .filter(models.AssessmentResult.session_id == session_id)
+            .group_by(models.AssessmentResult.process)
+            .all()
+        )
         
-        not_applicable_results = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(True)
-        ).count()
+        total_results = sum(row.total for row in rows)
+        applicable_results = sum(row.applicable for row in rows)
+        not_applicable_results = sum(row.not_applicable for row in rows)
         
         print(f"📊 DEBUG TEST: Totale risultati DB: {total_results} (applicabili: {applicable_results}, non applicabili: {not_applicable_results})")
         
@@ -989,17 +868,8 @@ def test_radar_debug(session_id: UUID, db: Session = Depends(database.get_db)):
                 "not_applicable_results": not_applicable_results
             }
         
-        # Test 2: Query processi applicabili
-        results = (
-            db.query(
-                models.AssessmentResult.process,
-                func.avg(models.AssessmentResult.score).label("avg_score")
-            )
-            .filter(models.AssessmentResult.session_id == session_id)
-            .filter(models.AssessmentResult.is_not_applicable.is_(False))  # ✅ SOLO APPLICABILI
-            .group_by(models.AssessmentResult.process)
-            .all()
-        )
+        # Processi con almeno una risposta applicabile
+        results = [(row.process, row.avg_score) for row in rows if row.applicable > 0]
         
         print(f"📈 DEBUG TEST: Processi applicabili trovati: {len(results)}")
         
@@ -1010,13 +880,12 @@ def test_radar_debug(session_id: UUID, db: Session = Depends(database.get_db)):
         
         # Test 3: Matplotlib
         try:
-            fig, ax = plt.subplots(figsize=(5, 5))
+            fig, ax = new_figure((5, 5))
             ax.plot([1, 2, 3], [1, 2, 3])
             ax.set_title("Matplotlib Test - Solo Applicabili")
             
             buf = io.BytesIO()
-            plt.savefig(buf, format="png", dpi=72)
-            plt.close(fig)
+            fig.savefig(buf, format="png", dpi=72)
             buf.seek(0)
             
             matplotlib_status = "OK"
@@ -1084,11 +953,15 @@ def force_working_radar(session_id: UUID, db: Session = Depends(database.get_db)
         return create_emergency_chart(str(e))
 
 # ============================================================================
-# FUNZIONI DI SUPPORTO PER MATPLOTLIB - RIMANGONO UGUALI
+# FUNZIONI DI SUPPORTO PER MATPLOTLIB (Figure per richiesta, niente pyplot: thread-safe)
 # ============================================================================
 
 def create_radar_chart_optimized(labels, values, title_override=None):
     """Crea radar chart classico ottimizzato per qualsiasi numero di processi"""
+    return StreamingResponse(io.BytesIO(render_radar_chart_png(labels, values, title_override)), media_type="image/png")
+
+def render_radar_chart_png(labels, values, title_override=None) -> bytes:
+    """PNG del radar chart classico (usato anche dalla cache dei grafici)"""
     try:
         print(f"🎯 Creando radar chart ottimizzato per {len(labels)} processi...")
         
@@ -1116,7 +989,7 @@ def create_radar_chart_optimized(labels, values, title_override=None):
 
         # Crea radar con dimensioni adattive
         fig_size = max(10, min(16, len(labels) * 1.2))  # Dimensioni intelligenti
-        fig, ax = plt.subplots(figsize=(fig_size, fig_size), subplot_kw=dict(polar=True))
+        fig, ax = new_figure((fig_size, fig_size), polar=True)
         
         # Disegna radar con stile migliorato
         ax.plot(angles, values_closed, linewidth=4, linestyle='solid', color='#2E86AB', alpha=0.9)
@@ -1156,7 +1029,7 @@ def create_radar_chart_optimized(labels, values, title_override=None):
         if len(labels) > 4:
             legend_elements = []
             for i, (label, color) in enumerate(zip(labels, colors[:len(labels)])):
-                legend_elements.append(plt.Line2D([0], [0], marker='o', color='w', 
+                legend_elements.append(Line2D([0], [0], marker='o', color='w', 
                                                 markerfacecolor=color, markersize=8, 
                                                 label=label[:20] + ('...' if len(label) > 20 else ''),
                                                 markeredgecolor='white', markeredgewidth=2))
@@ -1167,13 +1040,11 @@ def create_radar_chart_optimized(labels, values, title_override=None):
 
         # Salva con qualità alta
         buf = io.BytesIO()
-        plt.savefig(buf, format="png", dpi=150, bbox_inches='tight', 
+        fig.savefig(buf, format="png", dpi=150, bbox_inches='tight', 
                    facecolor='white', edgecolor='none', pad_inches=0.2)
-        plt.close(fig)
-        buf.seek(0)
 
         print("✅ Radar chart ottimizzato creato con successo")
-        return StreamingResponse(buf, media_type="image/png")
+        return buf.getvalue()
         
     except Exception as e:
         print(f"💥 Errore radar chart ottimizzato: {e}")
@@ -1182,8 +1053,12 @@ def create_radar_chart_optimized(labels, values, title_override=None):
 
 def create_placeholder_radar_image():
     """Placeholder quando non ci sono dati applicabili"""
+    return StreamingResponse(io.BytesIO(render_placeholder_radar_png()), media_type="image/png")
+
+def render_placeholder_radar_png() -> bytes:
+    """PNG del placeholder senza dati applicabili"""
     try:
-        fig, ax = plt.subplots(figsize=(10, 8))
+        fig, ax = new_figure((10, 8))
         ax.text(0.5, 0.5, 'Nessun dato applicabile\nper il Radar Chart', 
                 ha='center', va='center', fontsize=18, color='#6B7280',
                 bbox=dict(boxstyle="round,pad=1", facecolor="#F9FAFB", edgecolor="#E5E7EB"))
@@ -1193,19 +1068,45 @@ def create_placeholder_radar_image():
         ax.axis('off')
         
         buf = io.BytesIO()
-        plt.savefig(buf, format="png", dpi=150, bbox_inches='tight', facecolor='white')
-        plt.close(fig)
-        buf.seek(0)
+        fig.savefig(buf, format="png", dpi=150, bbox_inches='tight', facecolor='white')
         
-        return StreamingResponse(buf, media_type="image/png")
+        return buf.getvalue()
     except Exception as e:
         print(f"Errore placeholder: {e}")
         raise HTTPException(status_code=500, detail="Errore generazione placeholder")
 
+def render_process_radar_png(dimensions: Dict[str, float], title: str) -> bytes:
+    """PNG del radar a 4 dimensioni di un singolo processo"""
+    labels = list(dimensions.keys())
+    values = list(dimensions.values())
+
+    # Calcola angoli per 4 dimensioni e chiudi il cerchio
+    angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
+    angles += angles[:1]
+    values += values[:1]
+
+    fig, ax = new_figure((8, 8), polar=True)
+    ax.plot(angles, values, linewidth=3, linestyle='solid', color='#3B82F6', alpha=0.9)
+    ax.fill(angles, values, alpha=0.25, color='#3B82F6')
+
+    ax.set_yticks([1, 2, 3, 4, 5])
+    ax.set_yticklabels(['1', '2', '3', '4', '5'], fontsize=11)
+    ax.set_ylim(0, 5)
+    ax.set_xticks(angles[:-1])
+    ax.set_xticklabels(labels, fontsize=12, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.set_facecolor('white')
+    ax.set_title(title, fontsize=14, fontweight='bold', pad=20, color='#1F2937')
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=150, bbox_inches='tight',
+               facecolor='white', edgecolor='none', transparent=False)
+    return buf.getvalue()
+
 def create_error_image(session_id, error_msg):
     """Immagine di errore"""
     try:
-        fig, ax = plt.subplots(figsize=(10, 8))
+        fig, ax = new_figure((10, 8))
         ax.text(0.5, 0.6, '❌ Errore Generazione Radar', 
                ha='center', va='center', fontsize=18, color='#DC2626', fontweight='bold')
         ax.text(0.5, 0.4, f'Sessione: {session_id}', 
@@ -1219,12 +1120,11 @@ def create_error_image(session_id, error_msg):
         ax.axis('off')
         
         # Box rosso
-        ax.add_patch(plt.Rectangle((0.1, 0.1), 0.8, 0.8, fill=True, 
+        ax.add_patch(Rectangle((0.1, 0.1), 0.8, 0.8, fill=True, 
                                   facecolor='#FEF2F2', edgecolor='#FCA5A5', linewidth=3))
         
         buf = io.BytesIO()
-        plt.savefig(buf, format="png", dpi=150, bbox_inches='tight', facecolor='white')
-        plt.close(fig)
+        fig.savefig(buf, format="png", dpi=150, bbox_inches='tight', facecolor='white')
         buf.seek(0)
         
         return StreamingResponse(buf, media_type="image/png")
@@ -1236,7 +1136,7 @@ def create_error_image(session_id, error_msg):
 def create_emergency_chart(error_msg):
     """Chart di emergenza assoluta"""
     try:
-        fig, ax = plt.subplots(figsize=(8, 6))
+        fig, ax = new_figure((8, 6))
         ax.text(0.5, 0.5, f'EMERGENZA RADAR\n{error_msg[:50]}', 
                ha='center', va='center', fontsize=14, color='red')
         ax.set_xlim(0, 1)
@@ -1245,8 +1145,7 @@ def create_emergency_chart(error_msg):
         ax.axis('off')
         
         buf = io.BytesIO()
-        plt.savefig(buf, format="png", dpi=100, bbox_inches='tight', facecolor='yellow')
-        plt.close(fig)
+        fig.savefig(buf, format="png", dpi=100, bbox_inches='tight', facecolor='yellow')
         buf.seek(0)
         
         return StreamingResponse(buf, media_type="image/png")
@@ -1506,14 +1405,13 @@ def create_error_summary_radar_svg():
 # ============================================================================
 
 @router.get("/assessment/{session_id}/ai-recommendations-advanced")
-def ai_recommendations_advanced(session_id: UUID, db: Session = Depends(database.get_db)):
+async def ai_recommendations_advanced(session_id: UUID, regenerate: bool = False, db: Session = Depends(database.get_db)):
     """Sistema di raccomandazioni AI avanzato - RICHIEDE OpenAI configurato"""
     try:
         print(f"🤖 AI ADVANCED: Iniziando per sessione {session_id}")
         
         # ✅ CONTROLLO PRELIMINARE OpenAI
-        openai_key = os.getenv("OPENAI_API_KEY")
-        if not openai_key:
+        if not llm_configured():
             raise HTTPException(
                 status_code=503,
                 detail={
@@ -1528,20 +1426,12 @@ def ai_recommendations_advanced(session_id: UUID, db: Session = Depends(database
                 }
             )
         
-        # Carica dati sessione
-        session = db.query(models.AssessmentSession).filter(
-            models.AssessmentSession.id == session_id
-        ).first()
+        # Carica dati sessione e risultati applicabili (query nel threadpool)
+        session, results = await run_in_threadpool(_session_and_applicable_results, session_id, db)
         
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        # Carica risultati applicabili
-        results = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(False)
-        ).all()
-        
         if not results:
             raise HTTPException(
                 status_code=404, 
@@ -1560,10 +1450,11 @@ def ai_recommendations_advanced(session_id: UUID, db: Session = Depends(database
         }
         
         # ✅ USA IL MODULO AI (può lanciare HTTPException se problemi)
-        recommendations = get_ai_recommendations_advanced(
+        recommendations = await get_ai_recommendations_advanced(
             str(session_id), 
             results, 
-            session_data
+            session_data,
+            regenerate=regenerate
         )
         
         print(f"✅ AI Analysis completata: {recommendations['ai_recommendations']['model_used']}")
@@ -1585,6 +1476,48 @@ def ai_recommendations_advanced(session_id: UUID, db: Session = Depends(database
             }
         )
 
+@router.get("/assessment/{session_id}/ai-recommendations-advanced/stream")
+async def ai_recommendations_advanced_stream(session_id: UUID, regenerate: bool = False, db: Session = Depends(database.get_db)):
+    """
+    Variante SSE di ai-recommendations-advanced: l'evento meta contiene subito
+    analisi, priority matrix, roadmap e ROI; seguono i frammenti del testo AI,
+    salvato in raccomandazioni a stream concluso
+    """
+    print(f"🤖 AI ADVANCED STREAM: Iniziando per sessione {session_id}")
+
+    session, results = await run_in_threadpool(_session_and_applicable_results, session_id, db)
+
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    if not results:
+        raise HTTPException(
+            status_code=404,
+            detail="No applicable assessment results found. Complete assessment first."
+        )
+
+    engine = AIRecommendationEngine()
+    # HTTPException 503 se OpenAI non è configurato
+    report, analysis, company_context = await run_in_threadpool(
+        engine.prepare_advanced_recommendations, str(session_id), results, {
+            "azienda_nome": session.azienda_nome,
+            "settore": session.settore,
+            "dimensione": session.dimensione,
+            "referente": session.referente,
+            "email": session.email
+        }
+    )
+    report["ai_recommendations"] = engine.recommendation_metadata(analysis)
+
+    return sse_response(completion_events(
+        engine.recommendation_messages(analysis, company_context),
+        meta=report,
+        session_id=session.id,
+        field="raccomandazioni",
+        regenerate=regenerate,
+        **engine.completion_params()
+    ))
+
 @router.get("/assessment/{session_id}/sector-insights-advanced")
 def sector_insights_advanced(session_id: UUID, db: Session = Depends(database.get_db)):
     """Insights settoriali avanzati incluso turismo"""
@@ -1630,24 +1563,17 @@ def sector_insights_advanced(session_id: UUID, db: Session = Depends(database.ge
         raise HTTPException(status_code=500, detail=f"Errore insights settoriali: {str(e)}")
 
 @router.get("/assessment/{session_id}/smart-recommendations")
-def smart_recommendations_combined(session_id: UUID, include_insights: bool = True, db: Session = Depends(database.get_db)):
+async def smart_recommendations_combined(session_id: UUID, include_insights: bool = True, regenerate: bool = False, db: Session = Depends(database.get_db)):
     """Endpoint combinato: raccomandazioni AI + insights settoriali"""
     try:
         print(f"🎯 SMART RECOMMENDATIONS: Combinato per {session_id}")
         
-        # Carica sessione e risultati
-        session = db.query(models.AssessmentSession).filter(
-            models.AssessmentSession.id == session_id
-        ).first()
+        # Carica sessione e risultati (query nel threadpool)
+        session, results = await run_in_threadpool(_session_and_applicable_results, session_id, db)
         
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        results = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(False)
-        ).all()
-        
         if not results:
             raise HTTPException(status_code=404, detail="No applicable results found")
         
@@ -1667,7 +1593,7 @@ def smart_recommendations_combined(session_id: UUID, include_insights: bool = Tr
         }
         
         # ✅ COMBINA RACCOMANDAZIONI + INSIGHTS
-        recommendations = get_ai_recommendations_advanced(str(session_id), results, session_data)
+        recommendations = await get_ai_recommendations_advanced(str(session_id), results, session_data, regenerate=regenerate)
         
         response = {
             "session_id": str(session_id),
@@ -1691,17 +1617,17 @@ def smart_recommendations_combined(session_id: UUID, include_insights: bool = Tr
 # ============================================================================
 
 @router.get("/ai-status")
-def check_ai_status():
+async def check_ai_status():
     """Verifica stato configurazione AI"""
     try:
         openai_key = os.getenv("OPENAI_API_KEY")
-        openai_model = os.getenv("OPENAI_MODEL", "gpt-4")
         
-        if not openai_key:
+        if not llm_configured():
             return {
                 "status": "NOT_CONFIGURED",
                 "ai_available": False,
                 "message": "OpenAI API key non configurata",
+                "gateway": gateway_status(),
                 "instructions": [
                     "1. Aggiungere OPENAI_API_KEY al file .env",
                     "2. Opzionalmente impostare OPENAI_MODEL (default: gpt-4)", 
@@ -1716,17 +1642,15 @@ def check_ai_status():
         
         # Test connessione OpenAI
         try:
-            import openai as openai_test
-            openai_test.api_key = openai_key
-            
             # Test molto leggero - solo list models
-            models = openai_test.models.list()
+            await check_connection()
             
             return {
                 "status": "CONFIGURED",
                 "ai_available": True,
-                "model": openai_model,
+                "model": DEFAULT_MODEL,
                 "message": "✅ Sistema AI configurato e funzionante",
+                "gateway": gateway_status(),
                 "api_key_length": len(openai_key),
                 "api_key_prefix": openai_key[:7] + "..." if len(openai_key) > 10 else "***",
                 "supported_features": [
@@ -1742,6 +1666,7 @@ def check_ai_status():
                 "status": "CONFIGURED_BUT_ERROR",
                 "ai_available": False,
                 "message": f"Chiave configurata ma errore connessione: {str(e)}",
+                "gateway": gateway_status(),
                 "possible_causes": [
                     "Chiave API non valida",
                     "Crediti OpenAI esauriti",
@@ -1799,11 +1724,11 @@ def ai_requirements():
 
 
 @router.get("/test-ai-integration")
-def test_ai_integration():
+async def test_ai_integration():
     """Test integrazione modulo AI - VERSIONE AI-ONLY"""
     try:
         # Controllo base configurazione
-        ai_status = check_ai_status()
+        ai_status = await check_ai_status()
         
         if not ai_status["ai_available"]:
             return {
@@ -1824,7 +1749,7 @@ def test_ai_integration():
                 "ai_status": ai_status,
                 "module_info": {
                     "engine_initialized": True,
-                    "openai_configured": bool(engine.openai_api_key),
+                    "openai_configured": engine.openai_configured,
                     "model": engine.model,
                     "sectors_supported": [
                         "automotive", "food", "machinery", "electronics", 
@@ -2036,31 +1961,19 @@ def get_suggested_next_steps(overall_score: float, sector: str) -> List[str]:
 # Sostituisci l'endpoint ai-suggestions esistente con questa versione migliorata:
 
 @router.get("/assessment/{session_id}/ai-suggestions-enhanced")
-def ai_suggestions_enhanced(session_id: UUID, include_roadmap: bool = False, regenerate: bool = False, db: Session = Depends(database.get_db)):
+async def ai_suggestions_enhanced(session_id: UUID, include_roadmap: bool = False, regenerate: bool = False, db: Session = Depends(database.get_db)):
     """Versione migliorata dell'endpoint ai-suggestions originale"""
     try:
         print(f"🤖 AI SUGGESTIONS ENHANCED: Per sessione {session_id}")
         
-        # Carica risultati applicabili (come versione originale)
-        results = db.query(models.AssessmentResult).filter(
-            models.AssessmentResult.session_id == session_id,
-            models.AssessmentResult.is_not_applicable.is_(False)
-        ).all()
+        # Sessione e risultati applicabili (query nel threadpool)
+        session, results = await run_in_threadpool(_session_and_applicable_results, session_id, db)
 
         if not results:
             raise HTTPException(status_code=404, detail="No applicable assessment results found")
 
         # Mantieni compatibilità con versione originale
-        critical_areas = [
-            {
-                "process": r.process,
-                "category": r.category,
-                "dimension": r.dimension,
-                "score": r.score,
-                "note": r.note
-            }
-            for r in results if r.score < 3
-        ]
+        critical_areas = _critical_areas(results)
         
         if not critical_areas:
             return {
@@ -2070,11 +1983,6 @@ def ai_suggestions_enhanced(session_id: UUID, include_roadmap: bool = False, reg
                 "enhanced_available": True
             }
 
-        # Carica la sessione
-        session = db.query(models.AssessmentSession).filter(
-            models.AssessmentSession.id == session_id
-        ).first()
-        
         # Se esistono raccomandazioni salvate e non è richiesta la rigenerazione, restituiscile
         if session and session.raccomandazioni and not regenerate:
             print(f"✅ Restituisco raccomandazioni salvate per sessione {session_id}")
@@ -2095,15 +2003,13 @@ def ai_suggestions_enhanced(session_id: UUID, include_roadmap: bool = False, reg
                 }
                 
                 # Usa il modulo AI avanzato
-                advanced_recommendations = get_ai_recommendations_advanced(
-                    str(session_id), results, session_data
+                advanced_recommendations = await get_ai_recommendations_advanced(
+                    str(session_id), results, session_data, regenerate=regenerate
                 )
                 
                 # Salva le raccomandazioni nel database
                 ai_content = advanced_recommendations["ai_recommendations"]["content"]
-                session.raccomandazioni = ai_content
-                db.commit()
-                print(f"💾 Raccomandazioni AI salvate per sessione {session_id}")
+                await run_in_threadpool(save_session_text, session_id, "raccomandazioni", ai_content)
                 
                 return {
                     "critical_count": len(critical_areas),
@@ -2118,50 +2024,29 @@ def ai_suggestions_enhanced(session_id: UUID, include_roadmap: bool = False, reg
             print(f"⚠️ Fallback to basic AI: {e}")
         
         # Fallback alla versione originale migliorata
-        if not openai.api_key:
+        if not llm_configured():
             return {
                 "critical_count": len(critical_areas),
                 "suggestions": "⚠️ API OpenAI non configurata. Configurare OPENAI_API_KEY per suggerimenti personalizzati.",
                 "enhanced_available": False
             }
 
-        # Prompt migliorato rispetto all'originale
-        prompt = f"""Sei un esperto di trasformazione digitale per aziende italiane.
-
-AREE CRITICHE IDENTIFICATE ({len(critical_areas)} su {len(results)} domande applicabili):
-"""
-        
-        for item in critical_areas:
-            prompt += f"\n🔴 [{item['process']}] {item['category']} → {item['dimension']} (Punteggio: {item['score']}/5)\n"
-            if item['note']:
-                prompt += f"  💬 Nota: {item['note']}\n"
-
-        prompt += """
-                    {"role": "system", "content": "Sei un consulente di trasformazione digitale per PMI italiane. Fornisci raccomandazioni operative concrete per ogni area critica. Focus su AI, Blockchain, Innovazione Digitale. REGOLE: NON inventare vendor/costi, usa TBD se incerto. Basa tutto sui dati forniti."},
-Rispondi in italiano, tono professionale ma accessibile."""
-
         try:
-            response = openai.chat.completions.create(
-                model=os.getenv("OPENAI_MODEL", "gpt-4o"),
-                messages=[
-                    {"role": "system", "content": "Sei un correttore di bozze professionale. Il tuo compito è SOLO correggere errori di grammatica, punteggiatura, ortografia e sintassi. REGOLE FONDAMENTALI: 1) NON riassumere MAI il testo 2) NON eliminare frasi o paragrafi 3) NON cambiare il significato 4) Mantieni TUTTA la lunghezza originale 5) Mantieni la formattazione markdown (###, **, ecc). Correggi solo gli errori mantenendo tutto il resto identico."},
-                    {"role": "user", "content": prompt}
-                ],
+            ai_content = await cached_chat_completion(
+                _suggestions_messages(critical_areas, len(results)),
+                regenerate=regenerate,
                 max_completion_tokens=4000,
             )
             
             # Salva le raccomandazioni nel database
-            ai_content = response.choices[0].message.content
             if session:
-                session.raccomandazioni = ai_content
-                db.commit()
-                print(f"💾 Raccomandazioni AI (fallback) salvate per sessione {session_id}")
+                await run_in_threadpool(save_session_text, session_id, "raccomandazioni", ai_content)
             
             return {
                 "critical_count": len(critical_areas),
                 "suggestions": ai_content,
                 "enhanced_mode": False,
-                "model_used": os.getenv("OPENAI_MODEL", "gpt-4o")
+                "model_used": DEFAULT_MODEL
             }
             
         except Exception as e:
@@ -2188,22 +2073,19 @@ print("   - /enhanced-summary")
 # ==================== EDITOR CONCLUSIONI AI ====================
 
 @router.post("/assessment/{session_id}/reformat-conclusions")
-def reformat_conclusions(session_id: UUID, data: dict, db: Session = Depends(get_db)):
+async def reformat_conclusions(session_id: UUID, data: dict, db: Session = Depends(get_db)):
     """Riformatta il testo delle conclusioni usando GPT-4"""
-    import os
-    from openai import OpenAI
-    
     try:
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
+        formatted_text = await chat_completion(
+            [
                 {"role": "system", "content": "Sei un correttore di bozze professionale. Il tuo compito è SOLO correggere errori di grammatica, punteggiatura, ortografia e sintassi. REGOLE FONDAMENTALI: 1) NON riassumere MAI il testo 2) NON eliminare frasi o paragrafi 3) NON cambiare il significato 4) Mantieni TUTTA la lunghezza originale 5) Mantieni la formattazione markdown (###, **, ecc). Correggi solo gli errori mantenendo tutto il resto identico."},
                 {"role": "user", "content": f"Correggi SOLO gli errori grammaticali e sintattici in questo testo, mantenendo tutto il contenuto originale:\n\n{data['text']}"}
             ],
+            model="gpt-4o-mini",
         )
-        formatted_text = response.choices[0].message.content
         return {"formatted_text": formatted_text, "status": "success"}
+    except LLMError as e:
+        raise HTTPException(status_code=503, detail=f"Servizio AI non disponibile: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Errore: {str(e)}")
 
@@ -2216,6 +2098,7 @@ def save_conclusions(session_id: UUID, data: dict, db: Session = Depends(get_db)
     ).first()
     if not session:
         raise HTTPException(status_code=404, detail="Sessione non trovata")
+    invalidate_session_reports(session_id, db)
     session.raccomandazioni = data['text']
     db.commit()
     return {"status": "success", "message": "Conclusioni salvate"}
@@ -2231,23 +2114,38 @@ class ParetoRecommendationRequest(BaseModel):
     session_id: str
     prompt: str
 
+def _pareto_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": """Sei un consulente esperto di trasformazione digitale e Industry 4.0. 
+Analizza i dati dell'assessment e fornisci raccomandazioni strategiche precise e actionable.
+Parla sempre in terza persona (es. "L'azienda dovrebbe...", "Si raccomanda di...").
+Formatta la risposta in markdown con sezioni chiare."""
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
 @router.post("/assessment/generate-pareto-recommendations")
 async def generate_pareto_recommendations(
     request: ParetoRecommendationRequest,
+    regenerate: bool = False,
     db: Session = Depends(database.get_db)
 ):
     """
     Genera raccomandazioni AI basate sull'analisi di Pareto e le salva nel DB
+    (regenerate: ignora sia il testo salvato sia la cache LLM)
     """
     try:
         # Prima controlla se esistono già raccomandazioni salvate
         from uuid import UUID as PyUUID
         session_uuid = PyUUID(request.session_id)
-        session = db.query(models.AssessmentSession).filter(
-            models.AssessmentSession.id == session_uuid
-        ).first()
+        session = await run_in_threadpool(_get_session, session_uuid, db)
         
-        if session and session.pareto_recommendations:
+        if session and session.pareto_recommendations and not regenerate:
             print(f"✅ Restituisco raccomandazioni Pareto salvate per sessione {request.session_id}")
             return {
                 "success": True,
@@ -2256,8 +2154,7 @@ async def generate_pareto_recommendations(
                 "from_cache": True
             }
         
-        openai_key = os.getenv("OPENAI_API_KEY")
-        if not openai_key:
+        if not llm_configured():
             raise HTTPException(status_code=500, detail="OpenAI API key non configurata")
         
         # Usa GPT-5 come modello migliore attuale
@@ -2266,53 +2163,16 @@ async def generate_pareto_recommendations(
         print(f"🤖 Generazione raccomandazioni Pareto per sessione {request.session_id}")
         print(f"📊 Modello utilizzato: {openai_model}")
         
-        response = openai.chat.completions.create(
+        recommendations = await cached_chat_completion(
+            _pareto_messages(request.prompt),
+            regenerate=regenerate,
             model=openai_model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Sei un consulente esperto di trasformazione digitale e Industry 4.0. 
-Analizza i dati dell'assessment e fornisci raccomandazioni strategiche precise e actionable.
-Parla sempre in terza persona (es. "L'azienda dovrebbe...", "Si raccomanda di...").
-Formatta la risposta in markdown con sezioni chiare."""
-                },
-                {
-                    "role": "user",
-                    "content": request.prompt
-                }
-            ],
             max_completion_tokens=2000
         )
         
-        recommendations = response.choices[0].message.content
-        
-        # Salva le raccomandazioni nel database usando engine diretto
+        # Salva le raccomandazioni (invalidando i PDF archiviati) nel threadpool
         if session:
-            print(f"📝 Sessione trovata: {session.id}")
-            try:
-                from sqlalchemy import text
-                # Usa una connessione diretta al database e chiudi prima di verificare
-                with database.engine.connect() as conn:
-                    result = conn.execute(
-                        text("UPDATE assessment_session SET pareto_recommendations = :recs WHERE id = :id"),
-                        {"recs": recommendations, "id": str(session_uuid)}
-                    )
-                    conn.commit()
-                    print(f"💾 UPDATE eseguito: {result.rowcount} righe modificate")
-                
-                # Verifica con una NUOVA connessione dopo il commit
-                with database.engine.connect() as verify_conn:
-                    verify_result = verify_conn.execute(
-                        text("SELECT pareto_recommendations FROM assessment_session WHERE id = :id"),
-                        {"id": str(session_uuid)}
-                    )
-                    verify_row = verify_result.fetchone()
-                    if verify_row and verify_row[0]:
-                        print(f"✅ VERIFICA OK: Raccomandazioni salvate ({len(verify_row[0])} caratteri)")
-                    else:
-                        print(f"❌ VERIFICA FALLITA: Raccomandazioni NON salvate!")
-            except Exception as save_error:
-                print(f"❌ ERRORE SALVATAGGIO: {save_error}")
+            await run_in_threadpool(save_session_text, session_uuid, "pareto_recommendations", recommendations)
         else:
             print(f"⚠️ ATTENZIONE: Sessione non trovata per ID {request.session_id}")
         
@@ -2325,6 +2185,49 @@ Formatta la risposta in markdown con sezioni chiare."""
             "from_cache": False
         }
         
+    except HTTPException:
+        raise
+    except LLMError as e:
+        print(f"❌ Servizio AI non disponibile: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Servizio AI non disponibile: {str(e)}")
     except Exception as e:
         print(f"❌ Errore generazione raccomandazioni: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Errore generazione: {str(e)}")
+
+
+@router.post("/assessment/generate-pareto-recommendations/stream")
+async def generate_pareto_recommendations_stream(
+    request: ParetoRecommendationRequest,
+    regenerate: bool = False,
+    db: Session = Depends(database.get_db)
+):
+    """
+    Variante SSE di generate-pareto-recommendations: il testo arriva man mano
+    che viene generato e a stream concluso viene salvato in pareto_recommendations
+    """
+    try:
+        session_uuid = UUID(request.session_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="session_id non valido")
+
+    session = await run_in_threadpool(_get_session, session_uuid, db)
+
+    if session and session.pareto_recommendations and not regenerate:
+        print(f"✅ Restituisco raccomandazioni Pareto salvate per sessione {request.session_id}")
+        return sse_response(text_events(session.pareto_recommendations, model_used="cached"))
+
+    if not llm_configured():
+        raise HTTPException(status_code=500, detail="OpenAI API key non configurata")
+
+    if not session:
+        print(f"⚠️ ATTENZIONE: Sessione non trovata per ID {request.session_id}")
+
+    print(f"🤖 Generazione raccomandazioni Pareto (stream) per sessione {request.session_id}")
+    return sse_response(completion_events(
+        _pareto_messages(request.prompt),
+        model=os.getenv("OPENAI_MODEL", "gpt-5"),
+        session_id=session.id if session else None,
+        field="pareto_recommendations",
+        regenerate=regenerate,
+        max_completion_tokens=2000
+    ))
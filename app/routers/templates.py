@@ -1,11 +1,13 @@
 from typing import Optional, List
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app import models
 from app.services import template_service
+from app.services.template_cache_service import invalidate_template_version
 
 
 router = APIRouter(
@@ -115,10 +117,11 @@ def create_template_version(
 
 @router.get("/versions/{version_id}", summary="Dettaglio versione (con domini/domande)")
 def get_template_version(version_id: str, db: Session = Depends(get_db)):
-    version = template_service.get_template_version_full(db, version_id)
-    if not version:
+    # Payload già serializzato in cache per versione
+    version_json = template_service.get_template_version_full_json(db, version_id)
+    if not version_json:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Versione non trovata")
-    return version
+    return Response(content=version_json, media_type="application/json")
 
 
 # -----------------------------
@@ -269,6 +272,9 @@ def delete_template(template_id: str, db: Session = Depends(get_db)):
         db.delete(template)
         db.commit()
         
+        for version_id in version_ids:
+            invalidate_template_version(version_id)
+        
         return {
             "status": "ok",
             "message": f"Template '{template.name}' eliminato con successo",
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, validator
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
 
@@ -79,3 +79,13 @@ class CompanyOut(CompanyCreate):
 
     class Config:
         from_attributes = True
+
+# 📦 Export PDF multiplo (ZIP)
+class PdfBatchRequest(BaseModel):
+    session_ids: Optional[List[UUID]] = None   # Se indicati, gli altri filtri li restringono
+    company_id: Optional[int] = None
+    user_id: Optional[str] = None
+    date_from: Optional[datetime] = None       # Su creato_il, estremi inclusi
+    date_to: Optional[datetime] = None
+    template_id: Optional[UUID] = None
+    template_version_id: Optional[UUID] = None
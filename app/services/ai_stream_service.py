@@ -0,0 +1,125 @@
+"""
+Service per lo streaming SSE (server-sent events) dei testi generati dall'AI.
+
+I frammenti prodotti dal modello vengono inoltrati al browser appena
+arrivano, invece di attendere l'intera risposta. A stream concluso il testo
+completo viene salvato sulla sessione (raccomandazioni o
+pareto_recommendations) con una sessione DB propria: quella della richiesta
+non è più utilizzabile mentre la risposta viene consumata. Uno stream
+interrotto (client disconnesso o errore AI) non sovrascrive il testo salvato.
+Le risposte passano per la cache LLM (llm_cache_service): una voce già
+presente viene inviata subito in un unico evento token, salvo regenerate.
+
+Eventi inviati:
+    meta   dati disponibili prima della generazione (JSON)
+    token  {"text": "..."} frammento di testo
+    done   {"length": n, "saved": bool, "model_used": ..., "cached": bool}
+    error  {"detail": "..."}
+"""
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app import models
+from app.database import SessionLocal
+from app.services.llm_gateway import stream_chat_completion, DEFAULT_MODEL, LLMError
+from app.services.llm_cache_service import cached_lookup, cached_store
+from app.services.report_store_service import invalidate_session_reports
+from typing import AsyncIterator, Dict, List, Optional
+import json
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",      # nginx: niente buffering della risposta
+}
+
+# Campi di AssessmentSession aggiornabili a fine stream
+SESSION_TEXT_FIELDS = ('raccomandazioni', 'pareto_recommendations')
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def save_session_text(session_id, field: str, text: str) -> bool:
+    """Salva il testo generato sulla sessione; False se la sessione non esiste più"""
+    if field not in SESSION_TEXT_FIELDS:
+        raise ValueError(f"Campo non aggiornabile: {field}")
+    db = SessionLocal()
+    try:
+        session = db.query(models.AssessmentSession).filter(
+            models.AssessmentSession.id == session_id
+        ).first()
+        if not session:
+            return False
+        invalidate_session_reports(session_id, db)
+        setattr(session, field, text)
+        db.commit()
+        print(f"💾 {field} salvato per sessione {session_id} ({len(text)} caratteri)")
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Salvataggio {field} per sessione {session_id}: {e}")
+        return False
+    finally:
+        db.close()
+
+
+async def completion_events(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    meta: Optional[Dict] = None,
+    session_id=None,
+    field: Optional[str] = None,
+    regenerate: bool = False,
+    **params,
+) -> AsyncIterator[str]:
+    """
+    Eventi SSE di una chat completion in streaming; con session_id e field
+    il testo completo viene salvato sulla sessione prima dell'evento done
+    """
+    if meta is not None:
+        yield sse_event("meta", meta)
+
+    key, text = await cached_lookup(messages, model=model, regenerate=regenerate, **params)
+    cached = text is not None
+    if cached:
+        yield sse_event("token", {"text": text})
+    else:
+        parts = []
+        usage: Dict = {}
+        try:
+            async for chunk in stream_chat_completion(messages, model=model, usage=usage, **params):
+                parts.append(chunk)
+                yield sse_event("token", {"text": chunk})
+        except LLMError as e:
+            yield sse_event("error", {"detail": f"Servizio AI non disponibile: {e}"})
+            return
+        except Exception as e:
+            print(f"❌ Stream AI: {e}")
+            yield sse_event("error", {"detail": f"Errore generazione AI: {e}"})
+            return
+        text = "".join(parts)
+        await cached_store(key, model, text, usage)
+
+    saved = False
+    if session_id is not None and field and text:
+        saved = await run_in_threadpool(save_session_text, session_id, field, text)
+    yield sse_event("done", {
+        "length": len(text),
+        "saved": saved,
+        "model_used": model or DEFAULT_MODEL,
+        "cached": cached,
+    })
+
+
+async def text_events(text: str, meta: Optional[Dict] = None, **done) -> AsyncIterator[str]:
+    """Eventi SSE per un testo già disponibile (salvato o statico), con lo stesso formato"""
+    if meta is not None:
+        yield sse_event("meta", meta)
+    yield sse_event("token", {"text": text})
+    yield sse_event("done", {"length": len(text), "saved": False, "cached": True, **done})
+
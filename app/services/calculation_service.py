@@ -5,9 +5,9 @@ Funziona sia con sessioni basate su template DB che su JSON.
 from sqlalchemy.orm import Session
 from app import models
 from app.services.template_data_service import get_session_data_source
+from app.services.scoring_engine import SessionScores
 from typing import Dict, List
 from uuid import UUID
-from collections import defaultdict
 
 
 def calculate_session_stats(session_id: UUID, db: Session) -> Dict:
@@ -30,75 +30,41 @@ def calculate_session_stats(session_id: UUID, db: Session) -> Dict:
     if not session:
         return {}
     
-    # Ottieni risultati
-    results = db.query(models.AssessmentResult).filter_by(session_id=session_id).all()
+    # Matrici processo x dominio (dagli aggregati della sessione)
+    scores = SessionScores.load(session_id, db)
     
     # Ottieni struttura dati
     data_source = get_session_data_source(session, db)
     
     # Calcoli base
-    total_questions = len(results)
-    answered = sum(1 for r in results if r.score > 0 or not r.is_not_applicable)
-    na_count = sum(1 for r in results if r.is_not_applicable)
+    totals = scores.totals()
+    answered = totals['answer_count']
+    na_count = totals['na_count']
+    total_questions = answered + na_count
     
     completion_pct = (answered / total_questions * 100) if total_questions > 0 else 0
     
-    # Aggregazione per processo
-    by_process = defaultdict(lambda: {'total_score': 0, 'max_score': 0, 'count': 0, 'na_count': 0})
-    
-    for r in results:
-        if r.is_not_applicable:
-            by_process[r.process]['na_count'] += 1
-        else:
-            by_process[r.process]['total_score'] += r.score
-            by_process[r.process]['max_score'] += 5
-            by_process[r.process]['count'] += 1
-    
-    # Calcola media per processo
-    process_stats = {}
-    for proc, stats in by_process.items():
-        if stats['max_score'] > 0:
-            avg_score = (stats['total_score'] / stats['max_score']) * 100
-        else:
-            avg_score = 0
-        
-        process_stats[proc] = {
-            'average_score': round(avg_score, 2),
-            'total_score': stats['total_score'],
-            'max_score': stats['max_score'],
-            'count': stats['count'],
-            'na_count': stats['na_count']
-        }
-    
-    # Aggregazione per dominio
-    by_domain = defaultdict(lambda: {'total_score': 0, 'max_score': 0, 'count': 0, 'na_count': 0})
-    
-    for r in results:
-        if r.is_not_applicable:
-            by_domain[r.category]['na_count'] += 1
-        else:
-            by_domain[r.category]['total_score'] += r.score
-            by_domain[r.category]['max_score'] += 5
-            by_domain[r.category]['count'] += 1
-    
-    domain_stats = {}
-    for domain, stats in by_domain.items():
-        if stats['max_score'] > 0:
-            avg_score = (stats['total_score'] / stats['max_score']) * 100
-        else:
-            avg_score = 0
-        
-        domain_stats[domain] = {
-            'average_score': round(avg_score, 2),
-            'total_score': stats['total_score'],
-            'max_score': stats['max_score'],
-            'count': stats['count'],
-            'na_count': stats['na_count']
-        }
+    def _percentage_stats(combined: Dict) -> Dict:
+        stats = {}
+        for key, agg in combined.items():
+            max_score = agg['answer_count'] * 5
+            avg_score = (agg['score_sum'] / max_score) * 100 if max_score > 0 else 0
+            stats[key] = {
+                'average_score': round(avg_score, 2),
+                'total_score': agg['score_sum'],
+                'max_score': max_score,
+                'count': agg['answer_count'],
+                'na_count': agg['na_count']
+            }
+        return stats
+    
+    # Aggregazione per processo e per dominio
+    process_stats = _percentage_stats(scores.by_process())
+    domain_stats = _percentage_stats(scores.by_category())
     
     # Score generale
-    total_score = sum(r.score for r in results if not r.is_not_applicable)
-    total_max = sum(5 for r in results if not r.is_not_applicable)
+    total_score = totals['score_sum']
+    total_max = answered * 5
     overall_score = (total_score / total_max * 100) if total_max > 0 else 0
     
     return {
@@ -130,43 +96,31 @@ def calculate_radar_data(session_id: UUID, db: Session) -> Dict:
     if not session:
         return {}
     
-    results = db.query(models.AssessmentResult).filter_by(session_id=session_id).all()
+    scores = SessionScores.load(session_id, db)
     data_source = get_session_data_source(session, db)
     
-    # Matrice processo x dominio
-    matrix = defaultdict(lambda: defaultdict(lambda: {'total': 0, 'max': 0, 'count': 0}))
-    
-    for r in results:
-        if not r.is_not_applicable:
-            matrix[r.process][r.category]['total'] += r.score
-            matrix[r.process][r.category]['max'] += 5
-            matrix[r.process][r.category]['count'] += 1
-    
-    # Calcola medie
-    processes_vs_domains = []
-    for process in data_source['processes']:
-        process_data = {'process': process, 'domains': {}}
-        for domain in data_source['domains']:
-            stats = matrix[process][domain]
-            if stats['max'] > 0:
-                avg = (stats['total'] / stats['max']) * 100
-            else:
-                avg = 0
-            process_data['domains'][domain] = round(avg, 2)
-        processes_vs_domains.append(process_data)
+    # Matrice processo x dominio in percentuale (0 dove non ci sono risposte)
+    matrix = [
+        [round(float(pct), 2) for pct in row]
+        for row in scores.percentage_matrix(data_source['processes'], data_source['domains'])
+    ]
+    
+    processes_vs_domains = [
+        {
+            'process': process,
+            'domains': {domain: matrix[i][j] for j, domain in enumerate(data_source['domains'])}
+        }
+        for i, process in enumerate(data_source['processes'])
+    ]
     
     # Inverti per domini vs processi
-    domains_vs_processes = []
-    for domain in data_source['domains']:
-        domain_data = {'domain': domain, 'processes': {}}
-        for process in data_source['processes']:
-            stats = matrix[process][domain]
-            if stats['max'] > 0:
-                avg = (stats['total'] / stats['max']) * 100
-            else:
-                avg = 0
-            domain_data['processes'][process] = round(avg, 2)
-        domains_vs_processes.append(domain_data)
+    domains_vs_processes = [
+        {
+            'domain': domain,
+            'processes': {process: matrix[i][j] for i, process in enumerate(data_source['processes'])}
+        }
+        for j, domain in enumerate(data_source['domains'])
+    ]
     
     return {
         'processes_vs_domains': processes_vs_domains,
@@ -196,38 +150,17 @@ def calculate_pareto_analysis(session_id: UUID, db: Session) -> Dict:
     if not session:
         return {}
     
-    results = db.query(models.AssessmentResult).filter_by(session_id=session_id).all()
+    scores = SessionScores.load(session_id, db)
     data_source = get_session_data_source(session, db)
     
-    num_processes = len(data_source['processes'])
-    num_domains = len(data_source['domains'])
-    
     # === PARETO BY PROCESS ===
     
-    # STEP 1-2: Calcola gap normalizzato per ogni dominio di ogni processo
-    process_domain_gaps = defaultdict(lambda: defaultdict(lambda: {'total_score': 0, 'count': 0}))
-    
-    for r in results:
-        if not r.is_not_applicable:
-            process_domain_gaps[r.process][r.category]['total_score'] += r.score
-            process_domain_gaps[r.process][r.category]['count'] += 1
-    
-    # Calcola gap totale per processo
-    process_gaps = {}
-    
-    for process in data_source['processes']:
-        gap_totale_processo = 0
-        
-        for domain in data_source['domains']:
-            stats = process_domain_gaps[process][domain]
-            
-            if stats['count'] > 0:
-                media_score_dominio = stats['total_score'] / stats['count']
-                gap_dominio = 5.0 - media_score_dominio
-                gap_normalizzato = gap_dominio / num_processes
-                gap_totale_processo += gap_normalizzato
-        
-        process_gaps[process] = gap_totale_processo
+    # STEP 1-2: gap normalizzati per dominio e totale per processo (vettoriale)
+    pareto = scores.pareto(data_source['processes'], data_source['domains'])
+    
+    process_gaps = {
+        process: float(gap) for process, gap in zip(data_source['processes'], pareto['process_gap'])
+    }
     
     # STEP 3: Calcola percentuali
     totale_gap_sistema = sum(process_gaps.values())
@@ -252,29 +185,9 @@ def calculate_pareto_analysis(session_id: UUID, db: Session) -> Dict:
     
     # === PARETO BY DOMAIN ===
     
-    # Inverti l'aggregazione
-    domain_process_gaps = defaultdict(lambda: defaultdict(lambda: {'total_score': 0, 'count': 0}))
-    
-    for r in results:
-        if not r.is_not_applicable:
-            domain_process_gaps[r.category][r.process]['total_score'] += r.score
-            domain_process_gaps[r.category][r.process]['count'] += 1
-    
-    domain_gaps = {}
-    
-    for domain in data_source['domains']:
-        gap_totale_dominio = 0
-        
-        for process in data_source['processes']:
-            stats = domain_process_gaps[domain][process]
-            
-            if stats['count'] > 0:
-                media_score_processo = stats['total_score'] / stats['count']
-                gap_processo = 5.0 - media_score_processo
-                gap_normalizzato = gap_processo / num_domains
-                gap_totale_dominio += gap_normalizzato
-        
-        domain_gaps[domain] = gap_totale_dominio
+    domain_gaps = {
+        domain: float(gap) for domain, gap in zip(data_source['domains'], pareto['category_gap'])
+    }
     
     totale_gap_domini = sum(domain_gaps.values())
     
@@ -0,0 +1,281 @@
+"""
+Service per l'analisi AI delle interviste in parallelo, blocco per blocco (map-reduce).
+
+Invece di un unico prompt con l'intero modello JSON, il modello viene diviso
+in blocchi: un processo, oppure gruppi di attività consecutive se il processo
+supera MAX_DIMENSIONS_PER_CHUNK domande. Ogni blocco è descritto in forma
+compatta (prompt_encoding_service): il dizionario delle domande del modello
+(codici Q1, Q2, ...) è nel messaggio di sistema, uguale per tutti i blocchi,
+e ogni blocco elenca solo righe id|attività|domanda. Il modello AI risponde
+solo con id, punteggio, nota e confidenza: l'output resta piccolo e non
+viene troncato.
+
+I blocchi vengono analizzati in parallelo, al massimo
+INTERVIEW_CHUNK_CONCURRENCY per analisi, entro il limite globale del gateway
+LLM. Ogni risposta passa dalla cache LLM. Le risposte vengono validate sul
+modello: id sconosciuti o duplicati e punteggi fuori scala vengono scartati.
+Le domande senza risposta valida restano da compilare a mano. Un blocco
+fallito non blocca gli altri.
+
+iter_interview_analysis() produce un evento per ogni blocco completato,
+per mostrare l'avanzamento, e infine i risultati riuniti nell'ordine del
+modello.
+"""
+from app.services.model_loader_service import LoadedModel
+from app.services.llm_cache_service import cached_chat_completion
+from app.services.llm_gateway import LLMError
+from app.services.prompt_encoding_service import question_dictionary, format_dictionary, encode_questions
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Tuple
+import asyncio
+import json
+import math
+import os
+
+
+INTERVIEW_MODEL = os.getenv("INTERVIEW_MODEL", "gpt-4-turbo-preview")
+INTERVIEW_CHUNK_CONCURRENCY = int(os.getenv("INTERVIEW_CHUNK_CONCURRENCY", "4"))
+MAX_DIMENSIONS_PER_CHUNK = 40
+CHUNK_MAX_TOKENS = 4000
+MAX_NOTE_LENGTH = 1000
+
+NOT_APPLICABLE_VALUES = ("N/A", "NA", "NON APPLICABILE")
+
+SYSTEM_PROMPT = """Sei un esperto di assessment Industry 4.0. Rispondi SOLO in formato JSON valido.
+Assegna a ogni domanda un punteggio da 0 a 5 basandoti SOLO sulle informazioni presenti nell'intervista:
+- 0: Non implementato / Non presente
+- 1: Livello iniziale
+- 2: Livello base
+- 3: Livello intermedio
+- 4: Livello avanzato
+- 5: Livello eccellente / Best in class
+Usa "N/A" se la domanda non è applicabile all'azienda e null se l'intervista
+non contiene informazioni sufficienti."""
+
+
+@dataclass(frozen=True)
+class InterviewChunk:
+    index: int
+    process: str
+    items: Tuple[Tuple[int, Dict], ...]     # (id, dimensione del modello)
+    questions: str                          # dizionario delle domande del modello (condiviso)
+    table: str                              # righe id|attività|domanda del blocco
+
+
+# ===============================
+#  DIVISIONE IN BLOCCHI (MAP)
+# ===============================
+
+def _build_chunks(model: LoadedModel) -> Tuple[InterviewChunk, ...]:
+    dictionary = question_dictionary(model.dimensions)
+    questions = format_dictionary("domande del modello", dictionary)
+    chunks: List[InterviewChunk] = []
+    current: List[Tuple[int, Dict]] = []
+
+    def close():
+        if current:
+            items = tuple(current)
+            chunks.append(InterviewChunk(
+                len(chunks), items[0][1]["process"], items, questions, encode_questions(items, dictionary),
+            ))
+            current.clear()
+
+    previous = None
+    # Gli id sono le posizioni (da 1) in model.dimensions: stabili per versione del modello
+    for dimension_id, dimension in enumerate(model.dimensions, start=1):
+        activity = (dimension["process"], dimension["activity"])
+        if activity != previous:
+            # Nuovo processo, oppure nuova attività che non entra nel blocco corrente
+            if previous is None or activity[0] != previous[0] or len(current) >= MAX_DIMENSIONS_PER_CHUNK:
+                close()
+            previous = activity
+        current.append((dimension_id, dimension))
+    close()
+    return tuple(chunks)
+
+
+def interview_chunks(model: LoadedModel) -> Tuple[InterviewChunk, ...]:
+    """Blocchi del modello, calcolati una volta per versione del modello"""
+    return model.derived("interview_chunks", _build_chunks)
+
+
+def chunk_messages(chunk: InterviewChunk, transcript: str) -> List[Dict[str, str]]:
+    """
+    Prompt di un blocco. Sistema, dizionario delle domande e trascrizione sono
+    uguali per tutti i blocchi dell'analisi e precedono le righe del blocco.
+    """
+    prompt = f"""TRASCRIZIONE DELL'INTERVISTA:
+{transcript}
+
+PROCESSO: {chunk.process}
+Le domande sono indicate con i codici del dizionario, le attività con i codici definiti sopra la tabella.
+
+{chunk.table}
+
+Rispondi con questo JSON, un elemento per ogni domanda:
+{{"results": [{{"id": 12, "score": 3, "note": "motivazione basata sull'intervista", "confidence": 0.8}}]}}"""
+
+    return [
+        {"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{chunk.questions}"},
+        {"role": "user", "content": prompt},
+    ]
+
+
+# ===============================
+#  VALIDAZIONE E UNIONE (REDUCE)
+# ===============================
+
+def _load_json(text: str):
+    text = (text or "").strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1:] if "\n" in text else text
+    return json.loads(text)
+
+
+def parse_chunk_response(chunk: InterviewChunk, text: str) -> Tuple[Dict[int, Dict], List[str]]:
+    """
+    Risposte valide del blocco indicizzate per id, più gli avvisi sulle voci scartate.
+
+    Raises:
+        ValueError: se la risposta non è JSON
+    """
+    data = _load_json(text)
+    items = data.get("results", []) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("Campo 'results' mancante nella risposta AI")
+
+    dimensions = dict(chunk.items)
+    results: Dict[int, Dict] = {}
+    warnings: List[str] = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            dimension_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            warnings.append(f"id non valido: {item.get('id')!r}")
+            continue
+        dimension = dimensions.get(dimension_id)
+        if dimension is None or dimension_id in results:
+            warnings.append(f"id {dimension_id} non previsto o duplicato")
+            continue
+
+        raw_score = item.get("score")
+        if raw_score is None:
+            continue    # Informazioni insufficienti: domanda da compilare a mano
+        not_applicable = isinstance(raw_score, str) and raw_score.strip().upper() in NOT_APPLICABLE_VALUES
+        if not_applicable:
+            score = 0
+        else:
+            try:
+                value = float(raw_score)
+            except (TypeError, ValueError, OverflowError):
+                value = math.nan
+            if not math.isfinite(value):
+                warnings.append(f"id {dimension_id}: punteggio non valido {raw_score!r}")
+                continue
+            score = int(round(value))
+            if not 0 <= score <= 5:
+                warnings.append(f"id {dimension_id}: punteggio fuori scala {score}")
+                continue
+
+        try:
+            confidence = float(item.get("confidence"))
+        except (TypeError, ValueError, OverflowError):
+            confidence = None
+        if confidence is not None:
+            # NaN supererebbe min/max; Infinity non è una confidenza
+            confidence = min(max(confidence, 0.0), 1.0) if math.isfinite(confidence) else None
+
+        note = item.get("note")
+        results[dimension_id] = {
+            "process": dimension["process"],
+            "activity": dimension["activity"],
+            "category": dimension["category"],
+            "dimension": dimension["dimension"],
+            "score": score,
+            "note": str(note)[:MAX_NOTE_LENGTH] if note else None,
+            "is_not_applicable": not_applicable,
+            "confidence": confidence,
+        }
+    return results, warnings
+
+
+async def _analyze_chunk(chunk: InterviewChunk, transcript: str, regenerate: bool, limit: asyncio.Semaphore):
+    """(blocco, risultati per id, avvisi, errore)"""
+    try:
+        async with limit:
+            text = await cached_chat_completion(
+                chunk_messages(chunk, transcript),
+                model=INTERVIEW_MODEL,
+                regenerate=regenerate,
+                temperature=0.3,
+                max_tokens=CHUNK_MAX_TOKENS,
+                response_format={"type": "json_object"},
+            )
+        results, warnings = parse_chunk_response(chunk, text)
+        return chunk, results, warnings, None
+    except LLMError as e:
+        return chunk, {}, [], f"Servizio AI non disponibile: {e}"
+    except ValueError as e:
+        return chunk, {}, [], f"Risposta AI non valida: {e}"
+    except Exception as e:
+        # Errori non ritentabili dell'API (es. openai.BadRequestError): fallisce solo il blocco
+        return chunk, {}, [], f"Errore AI ({type(e).__name__}): {e}"
+
+
+async def iter_interview_analysis(
+    model: LoadedModel,
+    transcript: str,
+    regenerate: bool = False,
+    concurrency: int = INTERVIEW_CHUNK_CONCURRENCY,
+) -> AsyncIterator[Dict]:
+    """
+    Eventi dell'analisi: {"type": "progress", ...} per ogni blocco completato
+    (con i suoi risultati parziali) e infine {"type": "done", ...} con i
+    risultati riuniti nell'ordine del modello e il riepilogo.
+    Se il consumatore si interrompe, i blocchi ancora in corso vengono annullati.
+    """
+    chunks = interview_chunks(model)
+    limit = asyncio.Semaphore(max(concurrency, 1))
+    tasks = [asyncio.ensure_future(_analyze_chunk(c, transcript, regenerate, limit)) for c in chunks]
+
+    merged: Dict[int, Dict] = {}
+    failed: List[Dict] = []
+    warnings_count = 0
+    try:
+        for completed, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+            chunk, results, warnings, error = await next_done
+            merged.update(results)
+            warnings_count += len(warnings)
+            if error:
+                print(f"❌ Analisi intervista, blocco {chunk.index} ({chunk.process}): {error}")
+                failed.append({"chunk": chunk.index, "process": chunk.process, "error": error})
+            yield {
+                "type": "progress",
+                "chunk": chunk.index,
+                "process": chunk.process,
+                "completed": completed,
+                "total": len(chunks),
+                "answered": len(results),
+                "questions": len(chunk.items),
+                "warnings": warnings,
+                "error": error,
+                "results": [results[i] for i in sorted(results)],
+            }
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    yield {
+        "type": "done",
+        "model_used": INTERVIEW_MODEL,
+        "chunks": len(chunks),
+        "failed_chunks": failed,
+        "questions": len(model.dimensions),
+        "answered": len(merged),
+        "missing": len(model.dimensions) - len(merged),
+        "discarded": warnings_count,
+        "results": [merged[i] for i in sorted(merged)],
+    }
@@ -0,0 +1,250 @@
+"""
+Service di cache persistente (PostgreSQL) per le risposte LLM.
+
+La chiave è l'hash di (modello, prompt normalizzato, temperature,
+max_tokens e altri parametri della chiamata): riaprire un report con le
+stesse risposte o ripetere la stessa richiesta riusa il testo già generato
+senza reinviare il prompt a OpenAI. Le voci scadono dopo LLM_CACHE_TTL_HOURS
+e la tabella resta entro LLM_CACHE_MAX_ENTRIES voci e LLM_CACHE_MAX_BYTES
+(eviction delle meno usate di recente).
+
+regenerate=True salta la lettura della cache e ne aggiorna la voce con la
+nuova risposta. Un errore del database non blocca mai la chiamata AI: la
+cache viene semplicemente ignorata.
+
+Metriche (hit ratio e token risparmiati): llm_cache_stats().
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from fastapi.concurrency import run_in_threadpool
+from app import models
+from app.services.llm_gateway import chat_completion, DEFAULT_MODEL
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+
+
+# Da incrementare se cambia la normalizzazione: le voci esistenti non corrispondono più
+CACHE_VERSION = 1
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False")
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", str(24 * 30)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_stats_lock = Lock()
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "bypassed": 0,
+    "stores": 0,
+    "evictions": 0,
+    "errors": 0,
+    "saved_prompt_tokens": 0,
+    "saved_completion_tokens": 0,
+}
+
+
+def _count(**increments) -> None:
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+
+# ===============================
+#  CHIAVE
+# ===============================
+
+def normalize_prompt(text: str) -> str:
+    """Spazi, tabulazioni e a capo consecutivi ridotti a uno spazio"""
+    return " ".join(str(text).split())
+
+
+def cache_key(model: str, messages: List[Dict[str, str]], params: Dict) -> str:
+    """Hash di modello, messaggi normalizzati e parametri (temperature, max_tokens, ...)"""
+    payload = json.dumps(
+        [
+            CACHE_VERSION,
+            model,
+            [[m.get("role"), normalize_prompt(m.get("content", ""))] for m in messages],
+            params,
+        ],
+        sort_keys=True, separators=(',', ':'), default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# ===============================
+#  LETTURA E SCRITTURA
+# ===============================
+
+def lookup_response(key: str, db: Session) -> Optional[str]:
+    """Testo in cache per la chiave (None se assente o scaduto); aggiorna l'uso della voce"""
+    table = models.LlmResponseCache.__table__
+    row = db.execute(
+        update(table)
+        .where(table.c.key == key, table.c.expires_at > datetime.now())
+        .values(hit_count=table.c.hit_count + 1, last_used_at=datetime.now())
+        .returning(table.c.response, table.c.prompt_tokens, table.c.completion_tokens)
+    ).first()
+    db.commit()
+    if row is None:
+        _count(misses=1)
+        return None
+    _count(hits=1, saved_prompt_tokens=row.prompt_tokens, saved_completion_tokens=row.completion_tokens)
+    return row.response
+
+
+def store_response(key: str, model: str, response: str, usage: Optional[Dict], db: Session) -> None:
+    """Salva (o sostituisce) la risposta e applica scadenza e limiti di dimensione"""
+    table = models.LlmResponseCache.__table__
+    now = datetime.now()
+    usage = usage or {}
+    values = {
+        "model": model,
+        "response": response,
+        "size_bytes": len(response.encode('utf-8')),
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "hit_count": 0,
+        "created_at": now,
+        "last_used_at": now,
+        "expires_at": now + timedelta(hours=LLM_CACHE_TTL_HOURS),
+    }
+    stmt = pg_insert(table).values(key=key, **values)
+    db.execute(stmt.on_conflict_do_update(index_elements=[table.c.key], set_=values))
+    evicted = _evict(db, now)
+    db.commit()
+    _count(stores=1, evictions=evicted)
+
+
+def _evict(db: Session, now: datetime) -> int:
+    """Elimina le voci scadute e quelle meno usate oltre i limiti di numero e byte"""
+    table = models.LlmResponseCache.__table__
+    order = (table.c.last_used_at.desc(), table.c.key)
+    ranked = select(
+        table.c.key,
+        func.row_number().over(order_by=order).label("position"),
+        func.sum(table.c.size_bytes).over(order_by=order).label("running_bytes"),
+    ).subquery()
+    over_limit = select(ranked.c.key).where(or_(
+        ranked.c.position > LLM_CACHE_MAX_ENTRIES,
+        ranked.c.running_bytes > LLM_CACHE_MAX_BYTES,
+    ))
+    return db.execute(
+        delete(table).where(or_(table.c.expires_at <= now, table.c.key.in_(over_limit)))
+    ).rowcount
+
+
+def _with_db(operation, *args):
+    """Esegue operation(*args, db) con una sessione propria; errori DB -> None"""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return operation(*args, db)
+    except Exception as e:
+        db.rollback()
+        _count(errors=1)
+        print(f"⚠️ Cache LLM non disponibile: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def _params_key(model: Optional[str], messages: List[Dict[str, str]], params: Dict) -> Tuple[str, str]:
+    model = model or DEFAULT_MODEL
+    return model, cache_key(model, messages, params)
+
+
+async def cached_lookup(messages: List[Dict[str, str]], model: Optional[str] = None,
+                        regenerate: bool = False, **params) -> Tuple[str, Optional[str]]:
+    """
+    (chiave, testo in cache o None). Con regenerate=True o cache disattivata
+    il testo è sempre None; la chiave serve a cached_store a fine generazione.
+    """
+    model, key = _params_key(model, messages, params)
+    if not LLM_CACHE_ENABLED:
+        return key, None
+    if regenerate:
+        _count(bypassed=1)
+        return key, None
+    return key, await run_in_threadpool(_with_db, lookup_response, key)
+
+
+async def cached_store(key: str, model: Optional[str], response: str, usage: Optional[Dict] = None) -> None:
+    if LLM_CACHE_ENABLED and response:
+        await run_in_threadpool(_with_db, store_response, key, model or DEFAULT_MODEL, response, usage)
+
+
+async def cached_chat_completion(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    regenerate: bool = False,
+    **params,
+) -> str:
+    """
+    chat_completion con cache persistente: stessi argomenti, più regenerate
+    per ignorare la voce esistente e sostituirla con una nuova risposta
+    """
+    key, cached = await cached_lookup(messages, model=model, regenerate=regenerate, **params)
+    if cached is not None:
+        return cached
+
+    usage: Dict = {}
+    response = await chat_completion(messages, model=model, usage=usage, **params)
+    await cached_store(key, model, response, usage)
+    return response
+
+
+# ===============================
+#  METRICHE E MANUTENZIONE
+# ===============================
+
+def llm_cache_stats(db: Session) -> Dict:
+    """
+    Contatori del processo (hit ratio, token risparmiati da questo avvio)
+    e totali persistenti della tabella (voci, byte, token risparmiati)
+    """
+    table = models.LlmResponseCache.__table__
+    totals = db.execute(select(
+        func.count(),
+        func.coalesce(func.sum(table.c.size_bytes), 0),
+        func.coalesce(func.sum(table.c.hit_count), 0),
+        func.coalesce(func.sum(table.c.hit_count * table.c.prompt_tokens), 0),
+        func.coalesce(func.sum(table.c.hit_count * table.c.completion_tokens), 0),
+    )).first()
+
+    with _stats_lock:
+        process = dict(_stats)
+    lookups = process["hits"] + process["misses"]
+    return {
+        "enabled": LLM_CACHE_ENABLED,
+        "ttl_hours": LLM_CACHE_TTL_HOURS,
+        "max_entries": LLM_CACHE_MAX_ENTRIES,
+        "max_bytes": LLM_CACHE_MAX_BYTES,
+        "process": {
+            **process,
+            "hit_rate": round(process["hits"] / lookups, 4) if lookups else 0.0,
+            "saved_tokens": process["saved_prompt_tokens"] + process["saved_completion_tokens"],
+        },
+        "stored": {
+            "entries": totals[0],
+            "bytes": int(totals[1]),
+            "hits": int(totals[2]),
+            "saved_prompt_tokens": int(totals[3]),
+            "saved_completion_tokens": int(totals[4]),
+            "saved_tokens": int(totals[3]) + int(totals[4]),
+        },
+    }
+
+
+def clear_llm_cache(db: Session) -> int:
+    """Svuota la cache; restituisce il numero di voci eliminate"""
+    deleted = db.execute(delete(models.LlmResponseCache.__table__)).rowcount
+    db.commit()
+    return deleted
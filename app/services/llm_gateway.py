@@ -0,0 +1,349 @@
+"""
+Service gateway asincrono verso OpenAI: unico punto di accesso ai modelli LLM.
+
+- client AsyncOpenAI condiviso (uno per event loop), senza retry interni
+- semaforo che limita le chiamate contemporanee (LLM_MAX_CONCURRENCY)
+- timeout per chiamata (LLM_TIMEOUT, sovrascrivibile dal chiamante)
+- retry con backoff esponenziale e jitter su timeout, errori di rete,
+  rate limit (rispettando Retry-After) ed errori 5xx
+- circuit breaker: dopo LLM_BREAKER_THRESHOLD chiamate fallite di seguito
+  le richieste falliscono subito per LLM_BREAKER_COOLDOWN secondi, poi
+  passa una sola chiamata di prova alla volta finché il circuito non si richiude
+- streaming (stream_chat_completion): i tentativi valgono solo fino
+  all'apertura dello stream, il testo già inoltrato non viene ripetuto
+
+OPENAI_BASE_URL permette di puntare a un server compatibile (i test usano
+un server finto locale, vedi la fixture fake_llm in tests/conftest.py).
+"""
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, RateLimitError
+from dotenv import load_dotenv
+from threading import Lock
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Optional
+import asyncio
+import os
+import random
+import time
+import weakref
+
+load_dotenv()
+
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "90"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = 1.0
+LLM_RETRY_MAX_DELAY = 20.0
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "60"))
+
+
+class LLMError(Exception):
+    """Errore del gateway LLM"""
+
+
+class LLMNotConfigured(LLMError):
+    """OPENAI_API_KEY non impostata"""
+
+
+class LLMUnavailable(LLMError):
+    """Servizio non disponibile: circuito aperto o tentativi esauriti"""
+
+
+# ===============================
+#  CIRCUIT BREAKER
+# ===============================
+
+class CircuitBreaker:
+    """
+    closed -> open dopo `threshold` fallimenti consecutivi; dopo `cooldown`
+    secondi half-open: passa una sola chiamata di prova alla volta, che se
+    riesce richiude il circuito e se fallisce lo riapre. Condiviso tra
+    thread ed event loop.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = Lock()
+
+    def _cooling_down(self) -> bool:
+        return time.monotonic() - self._opened_at < self.cooldown
+
+    def allow(self) -> bool:
+        """True se una chiamata potrebbe partire ora (non riserva la chiamata di prova)"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            return not self._cooling_down() and not self._probing
+
+    def acquire(self) -> Optional[str]:
+        """
+        Permesso per una chiamata: 'closed', 'probe' (la chiamata di prova in
+        half-open, da liberare con release_probe a chiamata conclusa) oppure
+        None se il circuito è aperto o una prova è già in corso.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._cooling_down() or self._probing:
+                return None
+            self._probing = True
+            return "probe"
+
+    def release_probe(self) -> None:
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    def state(self) -> Dict:
+        with self._lock:
+            if self._opened_at is None:
+                state = "closed"
+            elif not self._cooling_down():
+                state = "half_open"
+            else:
+                state = "open"
+            return {"state": state, "consecutive_failures": self._failures, "probe_in_flight": self._probing}
+
+
+_breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+
+
+# ===============================
+#  CLIENT CONDIVISO
+# ===============================
+
+# Client e semaforo sono legati all'event loop su cui vengono usati
+_loop_state: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _client_and_semaphore():
+    loop = asyncio.get_running_loop()
+    state = _loop_state.get(loop)
+    if state is None:
+        client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_BASE_URL,
+            timeout=LLM_TIMEOUT,
+            max_retries=0,
+        )
+        state = (client, asyncio.Semaphore(LLM_MAX_CONCURRENCY))
+        _loop_state[loop] = state
+    return state
+
+
+def llm_configured() -> bool:
+    return bool(OPENAI_API_KEY)
+
+
+def _is_retryable(error: Exception) -> bool:
+    # APITimeoutError è una sottoclasse di APIConnectionError
+    if isinstance(error, (APIConnectionError, RateLimitError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    """Backoff esponenziale con jitter completo; Retry-After se il server lo indica"""
+    if isinstance(error, APIStatusError):
+        retry_after = error.response.headers.get("retry-after")
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), LLM_RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+BREAKER_OPEN_MESSAGE = "Servizio AI temporaneamente non disponibile (troppi errori consecutivi)"
+
+
+def _ensure_available() -> None:
+    if not llm_configured():
+        raise LLMNotConfigured("OPENAI_API_KEY non configurata")
+    if not _breaker.allow():
+        raise LLMUnavailable(BREAKER_OPEN_MESSAGE)
+
+
+class _NoLimit:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+async def _call(label: str, operation: Callable[[AsyncOpenAI], Awaitable[Any]], limited: bool = True) -> Any:
+    """
+    Esegue operation con retry e circuit breaker.
+    limited=False: il chiamante detiene già uno slot del semaforo (streaming)
+    """
+    if not llm_configured():
+        raise LLMNotConfigured("OPENAI_API_KEY non configurata")
+    permit = _breaker.acquire()
+    if permit is None:
+        raise LLMUnavailable(BREAKER_OPEN_MESSAGE)
+
+    client, semaphore = _client_and_semaphore()
+    limit = semaphore if limited else _NoLimit()
+    try:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                # Il semaforo copre solo la chiamata, non l'attesa tra i tentativi
+                async with limit:
+                    result = await operation(client)
+                _breaker.record_success()
+                return result
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                if attempt == LLM_MAX_RETRIES:
+                    _breaker.record_failure()
+                    raise LLMUnavailable(f"Servizio AI non disponibile dopo {attempt + 1} tentativi: {e}") from e
+                delay = _retry_delay(attempt, e)
+                print(f"⚠️ LLM {label}: tentativo {attempt + 1} fallito ({type(e).__name__}), nuovo tentativo tra {delay:.1f}s")
+                await asyncio.sleep(delay)
+    finally:
+        # Anche con errori non ritentabili o annullamento: la prova successiva può partire
+        if permit == "probe":
+            _breaker.release_probe()
+
+
+# ===============================
+#  API
+# ===============================
+
+def _record_usage(target: Optional[Dict], usage) -> None:
+    if target is not None and usage is not None:
+        target["prompt_tokens"] = usage.prompt_tokens or 0
+        target["completion_tokens"] = usage.completion_tokens or 0
+
+
+async def chat_completion(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    timeout: Optional[float] = None,
+    usage: Optional[Dict] = None,
+    **params,
+) -> str:
+    """
+    Testo della risposta di una chat completion.
+    params vengono passati all'API (max_completion_tokens, temperature, ...);
+    se indicato, usage riceve prompt_tokens e completion_tokens.
+
+    Raises:
+        LLMNotConfigured, LLMUnavailable, oppure l'errore non ritentabile dell'API
+    """
+    model = model or DEFAULT_MODEL
+
+    async def operation(client: AsyncOpenAI):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            timeout=timeout or LLM_TIMEOUT,
+            **params,
+        )
+        _record_usage(usage, response.usage)
+        return response.choices[0].message.content
+
+    return await _call(f"chat {model}", operation)
+
+
+async def stream_chat_completion(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    timeout: Optional[float] = None,
+    usage: Optional[Dict] = None,
+    **params,
+) -> AsyncIterator[str]:
+    """
+    Frammenti di testo della risposta man mano che il modello li produce.
+    Lo slot del semaforo resta occupato per tutta la durata dello stream;
+    un errore dopo il primo frammento non viene ritentato (LLMUnavailable).
+    usage, se indicato, viene compilato a fine stream.
+    """
+    model = model or DEFAULT_MODEL
+    _ensure_available()
+    _, semaphore = _client_and_semaphore()
+    if usage is not None:
+        params.setdefault("stream_options", {"include_usage": True})
+
+    async def operation(client: AsyncOpenAI):
+        return await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            timeout=timeout or LLM_TIMEOUT,
+            **params,
+        )
+
+    async with semaphore:
+        stream = await _call(f"stream {model}", operation, limited=False)
+        try:
+            async for chunk in stream:
+                # Con include_usage l'ultimo chunk ha solo l'utilizzo, senza choices
+                _record_usage(usage, getattr(chunk, "usage", None))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            if not _is_retryable(e):
+                raise
+            _breaker.record_failure()
+            raise LLMUnavailable(f"Stream AI interrotto: {e}") from e
+        finally:
+            await stream.close()
+
+
+async def transcribe_audio(audio_file: BinaryIO, model: str = "whisper-1", timeout: Optional[float] = None) -> str:
+    """Trascrizione di un file audio aperto in lettura binaria"""
+
+    async def operation(client: AsyncOpenAI):
+        audio_file.seek(0)
+        response = await client.audio.transcriptions.create(
+            model=model,
+            file=audio_file,
+            timeout=timeout or LLM_TIMEOUT,
+        )
+        return response.text
+
+    return await _call(f"transcribe {model}", operation)
+
+
+async def check_connection(timeout: float = 10.0) -> None:
+    """Chiamata leggera (lista modelli) per verificare chiave e connettività"""
+
+    async def operation(client: AsyncOpenAI):
+        await client.models.list(timeout=timeout)
+
+    await _call("models", operation)
+
+
+def gateway_status() -> Dict:
+    """Configurazione e stato del circuit breaker"""
+    return {
+        "configured": llm_configured(),
+        "base_url": OPENAI_BASE_URL,
+        "default_model": DEFAULT_MODEL,
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "timeout": LLM_TIMEOUT,
+        "max_retries": LLM_MAX_RETRIES,
+        "circuit_breaker": _breaker.state(),
+    }
+
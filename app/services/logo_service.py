@@ -0,0 +1,202 @@
+"""
+Service per il caricamento e la normalizzazione dei logo aziendali.
+
+Il file caricato viene scritto su disco a blocchi (mai interamente in
+memoria), validato con Pillow e convertito una sola volta in una variante
+pronta per il PDF: SVG rasterizzato, dimensioni ridotte alla massima
+risoluzione di stampa del riquadro del logo in copertina, PNG se ha
+trasparenza altrimenti JPEG (che reportlab incorpora senza ricodificarlo).
+Le dimensioni in pixel vengono salvate sulla sessione, così la generazione
+del PDF non deve riaprire l'immagine.
+
+La rasterizzazione degli SVG richiede cairosvg (e la libreria cairo di
+sistema): se non è disponibile l'SVG viene salvato così com'è, come prima
+della normalizzazione, senza dimensioni in pixel.
+"""
+from fastapi import UploadFile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+import io
+import os
+import shutil
+import tempfile
+import uuid
+
+
+LOGO_DIR = Path("/var/www/assessment_ai/uploads/logos")
+LOGO_URL_PREFIX = "/uploads/logos"
+ALLOWED_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.gif', '.svg']
+MAX_UPLOAD_BYTES = int(os.getenv("LOGO_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_SOURCE_PIXELS = 40_000_000      # Oltre: immagine rifiutata (decompression bomb)
+CHUNK_SIZE = 64 * 1024
+
+# Riquadro del logo in copertina (punti tipografici) e risoluzione di stampa
+LOGO_BOX_WIDTH_PT = 300
+LOGO_BOX_HEIGHT_PT = 150
+LOGO_PRINT_DPI = 300
+LOGO_MAX_WIDTH_PX = LOGO_BOX_WIDTH_PT * LOGO_PRINT_DPI // 72
+LOGO_MAX_HEIGHT_PX = LOGO_BOX_HEIGHT_PT * LOGO_PRINT_DPI // 72
+JPEG_QUALITY = 90
+
+
+class LogoValidationError(ValueError):
+    """File caricato non utilizzabile come logo"""
+
+
+@dataclass
+class PreparedLogo:
+    path: Path
+    url_path: str       # Path salvato su AssessmentSession.logo_path
+    width: Optional[int]    # None per gli SVG salvati senza rasterizzazione
+    height: Optional[int]
+
+
+async def save_upload(file: UploadFile, directory: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> Path:
+    """
+    Scrive il file caricato in un file temporaneo di directory, a blocchi.
+
+    Raises:
+        LogoValidationError: se il file supera max_bytes o è vuoto
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.upload')
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise LogoValidationError(f"File troppo grande (massimo {max_bytes // (1024 * 1024)} MB)")
+                out.write(chunk)
+        if written == 0:
+            raise LogoValidationError("File vuoto")
+        return Path(tmp_path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def _load_cairosvg():
+    """Modulo cairosvg, None se non installato o senza la libreria cairo di sistema"""
+    try:
+        import cairosvg
+    except (ImportError, OSError):
+        return None
+    return cairosvg
+
+
+def _rasterize_svg(source: Path, cairosvg):
+    """SVG -> immagine Pillow alla massima risoluzione del riquadro del logo"""
+    from PIL import Image
+
+    try:
+        png = cairosvg.svg2png(
+            url=str(source),
+            output_width=LOGO_MAX_WIDTH_PX,
+            unsafe=False,
+        )
+    except Exception as e:
+        raise LogoValidationError(f"SVG non valido: {e}")
+    return Image.open(io.BytesIO(png))
+
+
+def _open_raster(source: Path):
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(source) as probe:
+            if probe.format not in ('PNG', 'JPEG', 'GIF'):
+                raise LogoValidationError(f"Formato immagine non supportato: {probe.format}")
+            if probe.width * probe.height > MAX_SOURCE_PIXELS:
+                raise LogoValidationError("Immagine troppo grande in pixel")
+            probe.verify()
+    except LogoValidationError:
+        raise
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise LogoValidationError(f"Immagine non valida: {e}")
+
+    # verify() invalida l'oggetto: si riapre per la decodifica
+    image = Image.open(source)
+    image.seek(0)  # GIF animate: solo il primo frame
+    return image
+
+
+def _store_svg(source: Path, session_id, directory: Path) -> PreparedLogo:
+    """Salva l'SVG caricato senza conversione (server senza cairosvg)"""
+    filename = f"{session_id}_{uuid.uuid4().hex[:8]}.svg"
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / filename
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out, open(source, 'rb') as f:
+            shutil.copyfileobj(f, out, CHUNK_SIZE)
+        os.replace(tmp_path, target)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return PreparedLogo(path=target, url_path=f"{LOGO_URL_PREFIX}/{filename}", width=None, height=None)
+
+
+def prepare_logo(source: Path, extension: str, session_id, directory: Path = LOGO_DIR) -> PreparedLogo:
+    """
+    Valida il file caricato e salva la variante ottimizzata per il PDF.
+    Funzione sincrona (Pillow): dagli endpoint async va eseguita nel threadpool.
+
+    Raises:
+        LogoValidationError: se il file non è un'immagine utilizzabile
+    """
+    from PIL import Image, ImageOps
+
+    if extension == '.svg':
+        cairosvg = _load_cairosvg()
+        if cairosvg is None:
+            return _store_svg(source, session_id, directory)
+        source_image = _rasterize_svg(source, cairosvg)
+    else:
+        source_image = _open_raster(source)
+    try:
+        image = ImageOps.exif_transpose(source_image)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        image.thumbnail((LOGO_MAX_WIDTH_PX, LOGO_MAX_HEIGHT_PX), Image.LANCZOS)
+
+        suffix = '.png' if has_alpha else '.jpg'
+        filename = f"{session_id}_{uuid.uuid4().hex[:8]}{suffix}"
+        directory.mkdir(parents=True, exist_ok=True)
+        target = directory / filename
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if has_alpha:
+                    image.save(out, format='PNG', optimize=True)
+                else:
+                    image.save(out, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=False)
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        return PreparedLogo(
+            path=target,
+            url_path=f"{LOGO_URL_PREFIX}/{filename}",
+            width=image.width,
+            height=image.height,
+        )
+    finally:
+        source_image.close()
+
+
+def logo_size(path: str, width: Optional[int], height: Optional[int]):
+    """(larghezza, altezza) in pixel: quelle salvate all'upload o, per i logo precedenti, lette dal file"""
+    if width and height:
+        return width, height
+    from PIL import Image
+
+    with Image.open(path) as img:
+        return img.size
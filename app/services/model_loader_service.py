@@ -0,0 +1,142 @@
+"""
+Service per il caricamento dei modelli di assessment JSON (frontend/public/<model>.json).
+
+Ogni modello viene letto e parsato una sola volta e tenuto in una cache LRU
+in forma immutabile, insieme agli indici derivati (processi, categorie,
+dimensioni). La cache si invalida da sola se cambiano mtime o dimensione
+del file, ed esplicitamente con invalidate_model() dopo le scritture.
+"""
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+
+
+MODELS_DIR = Path("frontend/public")
+DEFAULT_MODEL = "i40_assessment_fto"
+MAX_CACHED_MODELS = 16
+
+
+class FrozenDict(dict):
+    """dict in sola lettura (resta serializzabile con json.dumps)"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Il modello in cache è in sola lettura")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+def freeze(value: Any) -> Any:
+    """Converte ricorsivamente dict -> FrozenDict e list -> tuple"""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class LoadedModel:
+    """Modello JSON parsato con indici derivati"""
+
+    def __init__(self, name: str, data: Any, signature: Tuple[int, int]):
+        self.name = name
+        self.data = freeze(data)
+        self.signature = signature  # (mtime_ns, size) del file letto
+
+        processes, categories, dimensions = [], {}, []
+        for process_data in self.data:
+            process_name = process_data.get('process', '')
+            processes.append(process_name)
+            for activity in process_data.get('activities', ()):
+                activity_name = activity.get('name', '')
+                for category_name, category_dimensions in activity.get('categories', {}).items():
+                    categories.setdefault(category_name, None)
+                    for dimension_name in category_dimensions.keys():
+                        dimensions.append(FrozenDict(
+                            process=process_name,
+                            activity=activity_name,
+                            category=category_name,
+                            dimension=dimension_name,
+                        ))
+
+        self.processes: Tuple[str, ...] = tuple(processes)
+        self.categories: Tuple[str, ...] = tuple(categories)
+        self.dimensions: Tuple[Dict, ...] = tuple(dimensions)
+        self._derived: Dict[str, Any] = {}
+        self._derived_lock = Lock()
+
+    def derived(self, key: str, build: Callable[["LoadedModel"], Any]) -> Any:
+        """Indice aggiuntivo calcolato una volta per questa versione del modello"""
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = build(self)
+            return self._derived[key]
+
+
+_models: "OrderedDict[str, LoadedModel]" = OrderedDict()
+_models_lock = Lock()
+_stats = {"hits": 0, "misses": 0, "reloads": 0, "invalidations": 0}
+
+
+def model_path(model_name: str) -> Path:
+    return MODELS_DIR / f"{model_name}.json"
+
+
+def get_model(model_name: Optional[str] = None) -> Optional[LoadedModel]:
+    """
+    Ritorna il modello parsato (None se il file non esiste).
+    Rilegge il file solo se mtime o dimensione sono cambiati.
+    Eventuali errori di parsing vengono propagati al chiamante.
+    """
+    model_name = model_name or DEFAULT_MODEL
+    path = model_path(model_name)
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _models_lock:
+        cached = _models.get(model_name)
+        if cached is not None and cached.signature == signature:
+            _models.move_to_end(model_name)
+            _stats["hits"] += 1
+            return cached
+        _stats["misses"] += 1
+        if cached is not None:
+            _stats["reloads"] += 1
+
+    # Lettura fuori dal lock: un doppio caricamento concorrente è innocuo
+    with open(path, 'r', encoding='utf-8') as f:
+        model = LoadedModel(model_name, json.load(f), signature)
+
+    with _models_lock:
+        _models[model_name] = model
+        _models.move_to_end(model_name)
+        while len(_models) > MAX_CACHED_MODELS:
+            _models.popitem(last=False)
+    return model
+
+
+def invalidate_model(model_name: Optional[str] = None) -> None:
+    """Scarta un modello dalla cache (tutti se None), da chiamare dopo ogni scrittura"""
+    with _models_lock:
+        _stats["invalidations"] += 1
+        if model_name is None:
+            _models.clear()
+        else:
+            _models.pop(model_name, None)
+
+
+def model_cache_stats() -> Dict:
+    """Contatori hit/miss e modelli attualmente in cache"""
+    with _models_lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+            "cached_models": list(_models.keys()),
+            "max_cached_models": MAX_CACHED_MODELS,
+        }
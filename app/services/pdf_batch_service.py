@@ -0,0 +1,246 @@
+"""
+Service per l'export dei report PDF di più sessioni in un unico ZIP.
+
+I report vengono generati in parallelo (al massimo PDF_BATCH_CONCURRENCY alla
+volta, ognuno con la propria sessione DB) e riusano il report store: un PDF
+già archiviato per gli stessi dati non viene rigenerato. Lo ZIP è prodotto
+in streaming mentre i file vengono completati: in memoria resta solo il
+blocco corrente, mai l'intero archivio. L'ultima voce (manifest.json)
+riporta l'esito di ogni sessione.
+
+L'avanzamento per file è consultabile con get_batch_progress() finché il
+processo resta attivo (registro in memoria, per istanza dell'app).
+"""
+from sqlalchemy.orm import Session
+from app import models
+from app.database import SessionLocal
+from app.services.pdf_report_service import store_pdf_report, report_filename, ReportDataNotFound
+from app.services.report_store_service import report_digest, get_report_store
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+from zipfile import ZipFile, ZIP_DEFLATED
+import json
+import os
+
+
+PDF_BATCH_CONCURRENCY = int(os.getenv("PDF_BATCH_CONCURRENCY", "4"))
+MAX_BATCH_SESSIONS = 500
+MAX_TRACKED_BATCHES = 100
+CHUNK_SIZE = 64 * 1024
+
+
+# ===============================
+#  SELEZIONE DELLE SESSIONI
+# ===============================
+
+def select_batch_sessions(
+    db: Session,
+    session_ids: Optional[List[UUID]] = None,
+    company_id: Optional[int] = None,
+    user_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    template_id: Optional[UUID] = None,
+    template_version_id: Optional[UUID] = None,
+) -> List[UUID]:
+    """ID delle sessioni che rispettano tutti i filtri indicati, in ordine di creazione"""
+    query = db.query(models.AssessmentSession.id)
+    if session_ids is not None:
+        query = query.filter(models.AssessmentSession.id.in_(session_ids))
+    if company_id is not None:
+        query = query.filter(models.AssessmentSession.company_id == company_id)
+    if user_id is not None:
+        query = query.filter(models.AssessmentSession.user_id == user_id)
+    if date_from is not None:
+        query = query.filter(models.AssessmentSession.creato_il >= date_from)
+    if date_to is not None:
+        query = query.filter(models.AssessmentSession.creato_il <= date_to)
+    if template_version_id is not None:
+        query = query.filter(models.AssessmentSession.template_version_id == template_version_id)
+    if template_id is not None:
+        query = query.join(
+            models.TemplateVersion,
+            models.TemplateVersion.id == models.AssessmentSession.template_version_id,
+        ).filter(models.TemplateVersion.template_id == template_id)
+    rows = query.order_by(models.AssessmentSession.creato_il, models.AssessmentSession.id).all()
+    return [row.id for row in rows]
+
+
+# ===============================
+#  AVANZAMENTO
+# ===============================
+
+_batches: "OrderedDict[str, Dict]" = OrderedDict()
+_batches_lock = Lock()
+
+
+def create_batch(session_ids: List[UUID]) -> str:
+    """Registra un nuovo export e ne restituisce l'id"""
+    batch_id = str(uuid4())
+    with _batches_lock:
+        _batches[batch_id] = {
+            "batch_id": batch_id,
+            "status": "running",
+            "total": len(session_ids),
+            "completed": 0,
+            "failed": 0,
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "files": {
+                str(sid): {"status": "pending", "filename": None, "error": None}
+                for sid in session_ids
+            },
+        }
+        while len(_batches) > MAX_TRACKED_BATCHES:
+            _batches.popitem(last=False)
+    return batch_id
+
+
+def _update_file(batch_id: str, session_id, status: str, filename: str = None, error: str = None) -> None:
+    with _batches_lock:
+        batch = _batches.get(batch_id)
+        if batch is None:
+            return
+        batch["files"][str(session_id)] = {"status": status, "filename": filename, "error": error}
+        if status == "done":
+            batch["completed"] += 1
+        elif status == "failed":
+            batch["failed"] += 1
+
+
+def _finish_batch(batch_id: str, status: str) -> None:
+    with _batches_lock:
+        batch = _batches.get(batch_id)
+        if batch is not None:
+            batch["status"] = status
+            batch["finished_at"] = datetime.now().isoformat()
+
+
+def get_batch_progress(batch_id: str) -> Optional[Dict]:
+    """Stato dell'export e di ogni file (None se sconosciuto a questa istanza)"""
+    with _batches_lock:
+        batch = _batches.get(batch_id)
+        if batch is None:
+            return None
+        return {**batch, "files": {sid: dict(info) for sid, info in batch["files"].items()}}
+
+
+# ===============================
+#  GENERAZIONE E STREAMING
+# ===============================
+
+def _ensure_report(session_id) -> Tuple[str, str]:
+    """
+    (digest, filename) del report della sessione, generato e archiviato se
+    manca. Eseguita nei thread del batch: usa una sessione DB propria.
+    """
+    db = SessionLocal()
+    try:
+        session = db.query(models.AssessmentSession).filter(
+            models.AssessmentSession.id == session_id
+        ).first()
+        if not session:
+            raise ReportDataNotFound("Sessione di assessment non trovata")
+        digest = report_digest(session_id, db)
+        if not get_report_store().exists(digest):
+            store_pdf_report(str(session_id), digest, db)
+        return digest, report_filename(session)
+    finally:
+        db.close()
+
+
+class _ZipBuffer:
+    """
+    Destinazione solo-scrittura per ZipFile: senza seek() zipfile scrive in
+    modalità streaming (data descriptor) e i byte si prelevano con drain()
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _unique_name(filename: str, used: Set[str]) -> str:
+    name, ext = os.path.splitext(filename)
+    candidate, counter = filename, 1
+    while candidate in used:
+        counter += 1
+        candidate = f"{name}_{counter}{ext}"
+    used.add(candidate)
+    return candidate
+
+
+def stream_pdf_batch(batch_id: str, session_ids: List[UUID], concurrency: int = PDF_BATCH_CONCURRENCY) -> Iterator[bytes]:
+    """
+    Blocchi dello ZIP con i report delle sessioni, nell'ordine di completamento.
+    Le sessioni che falliscono sono riportate nel manifest e non interrompono l'export.
+    """
+    buffer = _ZipBuffer()
+    used_names: Set[str] = set()
+    queue = iter(session_ids)
+    pending = {}
+    status = "aborted"
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor, \
+                ZipFile(buffer, 'w', compression=ZIP_DEFLATED, compresslevel=1) as zf:
+
+            def submit_next():
+                session_id = next(queue, None)
+                if session_id is not None:
+                    pending[executor.submit(_ensure_report, session_id)] = session_id
+
+            for _ in range(max(concurrency, 1)):
+                submit_next()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    session_id = pending.pop(future)
+                    submit_next()
+                    try:
+                        digest, filename = future.result()
+                        arcname = _unique_name(filename, used_names)
+                        with get_report_store().open(digest) as src, zf.open(arcname, 'w') as dst:
+                            for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                                dst.write(chunk)
+                                data = buffer.drain()
+                                if data:
+                                    yield data
+                        _update_file(batch_id, session_id, "done", filename=arcname)
+                    except Exception as e:
+                        print(f"❌ Export PDF {batch_id}: sessione {session_id}: {e}")
+                        _update_file(batch_id, session_id, "failed", error=str(e)[:500])
+                    data = buffer.drain()
+                    if data:
+                        yield data
+
+            manifest = get_batch_progress(batch_id) or {}
+            zf.writestr('manifest.json', json.dumps(manifest.get("files", {}), indent=2, ensure_ascii=False))
+        status = "done"
+        yield buffer.drain()
+
+    finally:
+        # Client disconnesso o errore: l'uscita dall'executor attende solo i
+        # report già in corso (al massimo concurrency), gli altri non partono
+        _finish_batch(batch_id, status)
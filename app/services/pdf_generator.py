@@ -4,18 +4,32 @@ from reportlab.lib.units import cm
 from reportlab.pdfgen import canvas
 from reportlab.platypus import Paragraph
 from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.utils import ImageReader
+from functools import lru_cache
 import io
 import os
 from datetime import datetime
-from typing import Dict, List, Any
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from typing import BinaryIO, Dict, List, Any, Optional
+from app.services.report_charts import get_chart_engine
+from app.services.logo_service import logo_size, LOGO_BOX_WIDTH_PT, LOGO_BOX_HEIGHT_PT
 import numpy as np
+from app.services.scoring_engine import SessionScores
+
+
+@lru_cache(maxsize=16)
+def _decoded_template(path: str, mtime_ns: int) -> ImageReader:
+    reader = ImageReader(path)
+    reader.getRGBData()  # Decodifica subito: le richieste successive riusano i pixel
+    return reader
+
+
+def load_page_template(path: str) -> ImageReader:
+    """Sfondo di pagina letto e decodificato una volta per processo (ricaricato se il file cambia)"""
+    return _decoded_template(path, os.stat(path).st_mtime_ns)
 
 
 class PDFReportGenerator:
-    def __init__(self):
+    def __init__(self, chart_engine: str = None):
         # Formato A4 Portrait (verticale)
         self.page_width, self.page_height = A4
         self.frontpage_template = '/var/www/assessment_ai/app/templates/pdf/frontpage.png'
@@ -26,16 +40,41 @@ class PDFReportGenerator:
         self.margin_top = 4 * cm
         self.margin_bottom = 2.5 * cm
         self.content_width = self.page_width - self.margin_left - self.margin_right
+        # Motore dei grafici: 'matplotlib' (PNG incorporati) o 'vector' (primitive reportlab)
+        self.charts = get_chart_engine(chart_engine)
 
     def generate_assessment_report(
         self,
         session_data: Dict,
         results_data: List[Dict],
         stats_data: Dict,
-        ai_conclusions: str = None
+        ai_conclusions: str = None,
+        scores: SessionScores = None
     ) -> bytes:
+        """Report PDF in memoria (per file grandi preferire write_assessment_report)"""
         buffer = io.BytesIO()
-        c = canvas.Canvas(buffer, pagesize=(self.page_width, self.page_height))
+        self.write_assessment_report(buffer, session_data, results_data, stats_data, ai_conclusions, scores)
+        return buffer.getvalue()
+
+    def write_assessment_report(
+        self,
+        output: BinaryIO,
+        session_data: Dict,
+        results_data: List[Dict],
+        stats_data: Dict,
+        ai_conclusions: str = None,
+        scores: SessionScores = None
+    ) -> None:
+        """Scrive il report PDF su output (file binario aperto in scrittura)"""
+        if scores is None:
+            scores = SessionScores.from_results(results_data)
+
+        # Fase 1: dati di tutti i grafici; fase 2: pre-render in parallelo
+        # (pool di processi, solo per il motore matplotlib); fase 3: composizione
+        specs = self._chart_specs(stats_data, results_data, scores)
+        self.charts.prerender(self._flatten_specs(specs))
+
+        c = canvas.Canvas(output, pagesize=(self.page_width, self.page_height))
 
         # Pagina 1: Copertina (senza numero)
         self._draw_frontpage(c, session_data)
@@ -46,28 +85,28 @@ class PDFReportGenerator:
 
         # Pagina 2: Radar Processi vs Domini (7 linee su 4 assi)
         self._draw_report_page(c)
-        self._add_radar_processes_vs_domains(c, stats_data)
+        self._add_radar_processes_vs_domains(c, specs['processes_vs_domains'])
         self._add_page_number(c, page_num)
         page_num += 1
         c.showPage()
 
         # Pagina 3: Radar per Processo (7 radar)
         self._draw_report_page(c)
-        self._add_process_radars(c, stats_data)
+        self._add_process_radars(c, specs['process_radars'])
         self._add_page_number(c, page_num)
         page_num += 1
         c.showPage()
 
         # Pagina 4: Radar Domini vs Processi (4 linee su 7 assi)
         self._draw_report_page(c)
-        self._add_radar_domains_vs_processes(c, stats_data)
+        self._add_radar_domains_vs_processes(c, specs['domains_vs_processes'])
         self._add_page_number(c, page_num)
         page_num += 1
         c.showPage()
 
         # Pagina 5: Radar per Categoria (4 radar)
         self._draw_report_page(c)
-        self._add_category_radars(c, stats_data)
+        self._add_category_radars(c, specs['category_radars'])
         self._add_page_number(c, page_num)
         page_num += 1
         c.showPage()
@@ -76,7 +115,7 @@ class PDFReportGenerator:
         page_num = self._add_strengths_weaknesses(c, stats_data, results_data, page_num)
         
         # Pagine Pareto Analysis
-        page_num = self._add_pareto_charts(c, results_data, page_num)
+        page_num = self._add_pareto_charts(c, specs['pareto'], page_num)
         
         # Pagine Raccomandazioni AI (da pareto_recommendations)
         pareto_recommendations = session_data.get("pareto_recommendations")
@@ -89,20 +128,30 @@ class PDFReportGenerator:
             page_num = self._add_ai_pages(c, ai_conclusions, page_num)
 
         c.save()
-        buffer.seek(0)
-        return buffer.getvalue()
+
+    def _draw_background(self, c: canvas.Canvas, template_path: str):
+        """
+        Sfondo di pagina come form XObject: l'immagine è definita una volta
+        per documento e ogni pagina la richiama per riferimento
+        """
+        form_name = 'bg_' + os.path.splitext(os.path.basename(template_path))[0]
+        if not c.hasForm(form_name):
+            c.beginForm(form_name, lowerx=0, lowery=0, upperx=self.page_width, uppery=self.page_height)
+            c.drawImage(
+                load_page_template(template_path),
+                0,
+                0,
+                width=self.page_width,
+                height=self.page_height,
+                preserveAspectRatio=True,
+                mask='auto'
+            )
+            c.endForm()
+        c.doForm(form_name)
 
     def _draw_frontpage(self, c: canvas.Canvas, session_data: Dict):
         # Disegna template di sfondo
-        c.drawImage(
-            self.frontpage_template,
-            0,
-            0,
-            width=self.page_width,
-            height=self.page_height,
-            preserveAspectRatio=True,
-            mask='auto'
-        )
+        self._draw_background(c, self.frontpage_template)
         
         # Logo aziendale (se presente) - tra "Digital Assessment" e nome azienda
         logo_path = session_data.get('logo_path')
@@ -111,12 +160,12 @@ class PDFReportGenerator:
             logo_path = "/var/www/assessment_ai" + logo_path
         if logo_path and os.path.exists(logo_path):
             try:
-                from PIL import Image
-                # Calcola dimensioni mantenendo aspect ratio - LOGO PIÙ GRANDE
-                img = Image.open(logo_path)
-                img_width, img_height = img.size
-                max_logo_width = 300  # Aumentato da 200 a 300
-                max_logo_height = 150  # Aumentato da 100 a 150
+                # Dimensioni salvate all'upload (logo già normalizzato): nessuna decodifica qui
+                img_width, img_height = logo_size(
+                    logo_path, session_data.get('logo_width'), session_data.get('logo_height')
+                )
+                max_logo_width = LOGO_BOX_WIDTH_PT
+                max_logo_height = LOGO_BOX_HEIGHT_PT
                 ratio = min(max_logo_width/img_width, max_logo_height/img_height)
                 logo_width = img_width * ratio
                 logo_height = img_height * ratio
@@ -173,35 +222,37 @@ class PDFReportGenerator:
         table.drawOn(c, table_x, table_y)
 
     def _draw_report_page(self, c: canvas.Canvas):
-        c.drawImage(
-            self.report_template,
-            0,
-            0,
-            width=self.page_width,
-            height=self.page_height,
-            preserveAspectRatio=True,
-            mask='auto'
-        )
+        self._draw_background(c, self.report_template)
+
+    # ===============================
+    #  DATI DEI GRAFICI (fase 1)
+    # ===============================
+
+    def _chart_specs(self, stats_data: Dict, results_data: List[Dict], scores: SessionScores) -> Dict[str, Any]:
+        """Spec di tutti i grafici del report, indipendenti dal canvas"""
+        return {
+            'processes_vs_domains': self._radar_processes_vs_domains_spec(stats_data),
+            'process_radars': self._process_radar_specs(stats_data),
+            'domains_vs_processes': self._radar_domains_vs_processes_spec(stats_data),
+            'category_radars': self._category_radar_specs(stats_data),
+            'pareto': self._pareto_spec(results_data, scores),
+        }
 
-    def _add_radar_processes_vs_domains(self, c: canvas.Canvas, stats_data: Dict):
+    @staticmethod
+    def _flatten_specs(specs: Dict[str, Any]) -> List[Dict]:
+        flat = []
+        for value in specs.values():
+            if isinstance(value, list):
+                flat.extend(value)
+            elif value is not None:
+                flat.append(value)
+        return flat
+
+    def _radar_processes_vs_domains_spec(self, stats_data: Dict) -> Optional[Dict]:
         """Radar con 4 assi (Domini) e 7 linee (Processi) - Governance in alto"""
-        
-        # Titolo sezione RADAR - diminuito e abbassato
-        c.setFont('Helvetica-Bold', 36)
-        c.setFillColor(colors.HexColor('#3DBFBF'))
-        radar_title = "RADAR"
-        title_width = c.stringWidth(radar_title, 'Helvetica-Bold', 36)
-        c.drawString((self.page_width - title_width) / 2, self.page_height - 100, radar_title)
-        
-        # Sottotitolo - abbassato
-        y_pos = self.page_height - self.margin_top - 2 * cm - 30  # Abbassato di ~30pt
-        c.setFont('Helvetica-Bold', 16)
-        c.setFillColor(colors.HexColor('#2C3E50'))
-        c.drawString(self.margin_left, y_pos, "Global Radar - Processi vs Domini")
-
         processes_radar = stats_data.get('processes_radar', [])
         if not processes_radar:
-            return
+            return None
 
         # Ordina per area (relazionata all'overall_score)
         def calc_area(x):
@@ -217,15 +268,9 @@ class PDFReportGenerator:
 
         processes_radar = sorted(processes_radar, key=calc_area, reverse=True)
 
-        fig, ax = plt.subplots(figsize=(7, 7), subplot_kw=dict(projection='polar'))
-
-        dimensions = ['Governance', 'M&C', 'Technology', 'Organization']
-        num_dims = len(dimensions)
-        angles = np.linspace(0, 2 * np.pi, num_dims, endpoint=False).tolist()
-        angles += angles[:1]
-
         colors_list = ['#8B5CF6', '#3B82F6', '#F59E0B', '#10B981', '#EF4444', '#EC4899', '#06B6D4']
 
+        series = []
         for i, proc in enumerate(processes_radar):
             dims = proc.get('dimensions', {})
             values = [
@@ -234,71 +279,36 @@ class PDFReportGenerator:
                 dims.get('technology', 0),
                 dims.get('organization', 0),
             ]
-            values += values[:1]
-            color = colors_list[i % len(colors_list)]
-            values_list = [
-                dims.get('governance', 0),
-                dims.get('monitoring_control', 0),
-                dims.get('technology', 0),
-                dims.get('organization', 0),
-            ]
-            n = len(values_list)
-            avg_radius = sum(values_list) / n if n else 0
+            n = len(values)
+            avg_radius = sum(values) / n if n else 0
             area = (n * (avg_radius ** 2) * np.sin(2 * np.pi / n)) / 2 if n else 0
-            label = f"{proc.get('process', '')} ({area:.2f})"
-            ax.plot(angles, values, 'o-', linewidth=2, color=color, label=label, markersize=4)
-            ax.fill(angles, values, alpha=0.1, color=color)
-
-        ax.set_xticks(angles[:-1])
-        ax.set_xticklabels(dimensions, size=11, weight='bold')
-        ax.set_ylim(0, 5)
-        ax.set_yticks([1, 2, 3, 4, 5])
-        ax.grid(True, alpha=0.3)
-        ax.legend(loc='upper right', bbox_to_anchor=(1.3, 1.1), fontsize=8)
-        ax.set_theta_offset(np.pi / 2)  # Governance in alto
-        ax.set_aspect('equal')
-
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=100, bbox_inches='tight')
-        plt.close()
-        img_buffer.seek(0)
-
-        from reportlab.lib.utils import ImageReader
-        img = ImageReader(img_buffer)
-        c.drawImage(
-            img,
-            self.margin_left - 1 * cm,
-            y_pos - 16 * cm,
-            width=18 * cm,
-            height=15 * cm,
-            preserveAspectRatio=True,
-        )
+            series.append({
+                'values': values,
+                'color': colors_list[i % len(colors_list)],
+                'label': f"{proc.get('process', '')} ({area:.2f})",
+            })
+
+        return {
+            'kind': 'radar',
+            'axes': ['Governance', 'M&C', 'Technology', 'Organization'],
+            'series': series,
+            'line_width': 2, 'marker_size': 4, 'fill_alpha': 0.1,
+            'axis_label_size': 11, 'axis_label_weight': 'bold',
+            'legend': {'anchor': (1.3, 1.1), 'size': 8},
+            'figsize': 7, 'dpi': 100,
+        }
 
-    def _add_radar_domains_vs_processes(self, c: canvas.Canvas, stats_data: Dict):
+    def _radar_domains_vs_processes_spec(self, stats_data: Dict) -> Optional[Dict]:
         """Radar con 7 assi (Processi) e 4 linee (Domini) - MKTG in alto"""
-        y_pos = self.page_height - self.margin_top - 2 * cm
-        c.setFont('Helvetica-Bold', 16)
-        c.setFillColor(colors.HexColor('#2C3E50'))
-        c.drawString(self.margin_left, y_pos, "Global Radar - Domini vs Processi")
-
         processes_radar = stats_data.get('processes_radar', [])
         if not processes_radar:
-            return
+            return None
 
         # Estrai processi effettivi dai dati e usa ordine preferito se presenti
         actual_processes = [p.get("process", "") for p in processes_radar]
         preferred_order = ["MKTG", "DESIGN & ENGINEERING", "EXECUTION", "QUALITY MANAGEMENT", "CUSTOMER CARE", "DIGITAL MKTG", "ADMINISTRATION"]
         process_order = [p for p in preferred_order if any(proc.upper() == p.upper() for proc in actual_processes)]
         process_order.extend([proc for proc in actual_processes if not any(proc.upper() == p.upper() for p in process_order)])
-        #         process_order = [
-        #             'MKTG',
-        #             'DESIGN & ENGINEERING',
-        #             'EXECUTION',
-        #             'QUALITY MANAGEMENT',
-        #             'CUSTOMER CARE',
-        #             'DIGITAL MKTG',
-        #             'ADMINISTRATION',
-        #         ]
 
         # Riordina secondo l'ordine specificato
         ordered_processes = []
@@ -316,13 +326,6 @@ class PDFReportGenerator:
         if not ordered_processes:
             ordered_processes = processes_radar
 
-        fig, ax = plt.subplots(figsize=(7, 7), subplot_kw=dict(projection='polar'))
-
-        process_names = [p.get('process', '')[:20] for p in ordered_processes]
-        num_procs = len(process_names)
-        angles = np.linspace(0, 2 * np.pi, num_procs, endpoint=False).tolist()
-        angles_plot = angles + [angles[0]]
-
         domain_data = {
             'Governance': {'color': '#3B82F6', 'values': []},
             'Monitoring & Control': {'color': '#10B981', 'values': []},
@@ -337,59 +340,31 @@ class PDFReportGenerator:
             domain_data['Technology']['values'].append(dims.get('technology', 0))
             domain_data['Organization']['values'].append(dims.get('organization', 0))
 
-        for domain_name, data in domain_data.items():
-            values = data['values'] + [data['values'][0]] if data['values'] else [0, 0]
-            total = sum(data['values'])
-            ax.plot(
-                angles_plot,
-                values,
-                'o-',
-                linewidth=2,
-                color=data['color'],
-                label=f"{domain_name} ({total:.2f})",
-                markersize=4,
-            )
-            ax.fill(angles_plot, values, alpha=0.1, color=data['color'])
-
-        ax.set_xticks(angles)
-        ax.set_xticklabels(process_names, size=8, weight='bold')
-        ax.set_ylim(0, 5)
-        ax.set_yticks([1, 2, 3, 4, 5])
-        ax.grid(True, alpha=0.3)
-        ax.legend(loc='upper right', bbox_to_anchor=(1.35, 1.1), fontsize=8)
-        ax.set_theta_offset(np.pi / 2)  # MKTG in alto
-        ax.set_aspect('equal')
-
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=100, bbox_inches='tight')
-        plt.close()
-        img_buffer.seek(0)
-
-        from reportlab.lib.utils import ImageReader
-        img = ImageReader(img_buffer)
-        c.drawImage(
-            img,
-            self.margin_left - 1 * cm,
-            y_pos - 16 * cm,
-            width=18 * cm,
-            height=15 * cm,
-            preserveAspectRatio=True,
-        )
-
-    def _add_category_radars(self, c: canvas.Canvas, stats_data: Dict):
-        y_pos = self.page_height - self.margin_top - 2 * cm
-        """4 radar (uno per categoria) con 7 assi (processi)"""
-        c.setFont('Helvetica-Bold', 16)
-        # Migliore leggibilità sul template
-        c.setFillColor(colors.HexColor('#2C3E50'))
-        c.setFillColor(colors.HexColor("#2C3E50"))
-        c.drawString(self.margin_left, y_pos, "Radar per Dominio")
+        return {
+            'kind': 'radar',
+            'axes': [p.get('process', '')[:20] for p in ordered_processes],
+            'series': [
+                {
+                    'values': data['values'],
+                    'color': data['color'],
+                    'label': f"{domain_name} ({sum(data['values']):.2f})",
+                }
+                for domain_name, data in domain_data.items()
+            ],
+            'line_width': 2, 'marker_size': 4, 'fill_alpha': 0.1,
+            'axis_label_size': 8, 'axis_label_weight': 'bold',
+            'legend': {'anchor': (1.35, 1.1), 'size': 8},
+            'figsize': 7, 'dpi': 100,
+        }
 
+    def _category_radar_specs(self, stats_data: Dict) -> List[Dict]:
+        """4 radar (uno per categoria) con 7 assi (processi) - primo processo in alto"""
         processes_radar = stats_data.get('processes_radar', [])
         if not processes_radar:
-            return
+            return []
 
         processes_radar = sorted(processes_radar, key=lambda x: x.get('overall_score', 0), reverse=True)
+        process_names = [p.get('process', '')[:12] for p in processes_radar]
 
         categories = [
             ('Governance', 'governance'),
@@ -398,6 +373,94 @@ class PDFReportGenerator:
             ('Organization', 'organization'),
         ]
 
+        return [
+            {
+                'kind': 'radar',
+                'axes': process_names,
+                'series': [{
+                    'values': [p.get('dimensions', {}).get(cat_key, 0) for p in processes_radar],
+                    'color': '#3DBFBF',
+                }],
+                'line_width': 2, 'marker_size': 4, 'fill_alpha': 0.3,
+                'axis_label_size': 5,
+                'ring_labels': ['1', '2', '3', '4', '5'], 'ring_label_size': 5,
+                'title': cat_name, 'title_size': 9,
+                'figsize': 3.2, 'dpi': 90,
+            }
+            for cat_name, cat_key in categories
+        ]
+
+    def _process_radar_specs(self, stats_data: Dict) -> List[Dict]:
+        """Fino a 9 radar (uno per processo) con 4 assi (domini) - Governance in alto"""
+        processes_radar = stats_data.get('processes_radar', [])
+        processes_radar = sorted(processes_radar, key=lambda x: x.get('overall_score', 0), reverse=True)
+
+        specs = []
+        for proc in processes_radar[:9]:
+            dims = proc.get('dimensions', {})
+            process_name = proc.get('process', '')[:18]
+            overall = proc.get('overall_score', 0)
+            specs.append({
+                'kind': 'radar',
+                'axes': ['Gov', 'M&C', 'Tech', 'Org'],
+                'series': [{
+                    'values': [
+                        dims.get('governance', 0),
+                        dims.get('monitoring_control', 0),
+                        dims.get('technology', 0),
+                        dims.get('organization', 0),
+                    ],
+                    'color': '#3B82F6',
+                }],
+                'line_width': 1.5, 'marker_size': 3, 'fill_alpha': 0.3,
+                'axis_label_size': 6,
+                'ring_labels': ['', '', '', '', ''], 'ring_label_size': 5,
+                'title': f'{process_name}\n({overall:.2f})', 'title_size': 7,
+                'figsize': 2.2, 'dpi': 80,
+            })
+        return specs
+
+    # ===============================
+    #  PAGINE DEI GRAFICI (fase 3)
+    # ===============================
+
+    def _add_radar_processes_vs_domains(self, c: canvas.Canvas, spec: Optional[Dict]):
+        """Radar con 4 assi (Domini) e 7 linee (Processi) - Governance in alto"""
+        
+        # Titolo sezione RADAR - diminuito e abbassato
+        c.setFont('Helvetica-Bold', 36)
+        c.setFillColor(colors.HexColor('#3DBFBF'))
+        radar_title = "RADAR"
+        title_width = c.stringWidth(radar_title, 'Helvetica-Bold', 36)
+        c.drawString((self.page_width - title_width) / 2, self.page_height - 100, radar_title)
+        
+        # Sottotitolo - abbassato
+        y_pos = self.page_height - self.margin_top - 2 * cm - 30  # Abbassato di ~30pt
+        c.setFont('Helvetica-Bold', 16)
+        c.setFillColor(colors.HexColor('#2C3E50'))
+        c.drawString(self.margin_left, y_pos, "Global Radar - Processi vs Domini")
+
+        if spec is not None:
+            self.charts.draw(c, spec, self.margin_left - 1 * cm, y_pos - 16 * cm, 18 * cm, 15 * cm)
+
+    def _add_radar_domains_vs_processes(self, c: canvas.Canvas, spec: Optional[Dict]):
+        """Radar con 7 assi (Processi) e 4 linee (Domini) - MKTG in alto"""
+        y_pos = self.page_height - self.margin_top - 2 * cm
+        c.setFont('Helvetica-Bold', 16)
+        c.setFillColor(colors.HexColor('#2C3E50'))
+        c.drawString(self.margin_left, y_pos, "Global Radar - Domini vs Processi")
+
+        if spec is not None:
+            self.charts.draw(c, spec, self.margin_left - 1 * cm, y_pos - 16 * cm, 18 * cm, 15 * cm)
+
+    def _add_category_radars(self, c: canvas.Canvas, specs: List[Dict]):
+        """4 radar (uno per categoria) con 7 assi (processi)"""
+        y_pos = self.page_height - self.margin_top - 2 * cm
+        c.setFont('Helvetica-Bold', 16)
+        # Migliore leggibilità sul template
+        c.setFillColor(colors.HexColor("#2C3E50"))
+        c.drawString(self.margin_left, y_pos, "Radar per Dominio")
+
         positions = [
             (self.margin_left, self.page_height - 7.5 * cm),
             (self.margin_left + 9 * cm, self.page_height - 7.5 * cm),
@@ -405,123 +468,28 @@ class PDFReportGenerator:
             (self.margin_left + 9 * cm, self.page_height - 16.5 * cm),
         ]
 
-        for idx, (cat_name, cat_key) in enumerate(categories):
-            x_pos, y_pos_cat = positions[idx]
-
-            fig, ax = plt.subplots(figsize=(3.2, 3.2), subplot_kw=dict(projection='polar'))
+        for (x_pos, y_pos_cat), spec in zip(positions, specs):
+            self.charts.draw(c, spec, x_pos, y_pos_cat - 9 * cm, 8 * cm, 8 * cm)
 
-            process_names = [p.get('process', '')[:12] for p in processes_radar]
-            values = [p.get('dimensions', {}).get(cat_key, 0) for p in processes_radar]
-
-            num_procs = len(process_names)
-            if num_procs == 0:
-                continue
-
-            angles = np.linspace(0, 2 * np.pi, num_procs, endpoint=False).tolist()
-            values_plot = values + [values[0]]
-            angles_plot = angles + [angles[0]]
-
-            ax.plot(angles_plot, values_plot, 'o-', linewidth=2, color='#3DBFBF', markersize=4)
-            ax.fill(angles_plot, values_plot, alpha=0.3, color='#3DBFBF')
-
-            ax.set_xticks(angles)
-            ax.set_xticklabels(process_names, size=5)
-            ax.set_ylim(0, 5)
-            ax.set_yticks([1, 2, 3, 4, 5])
-            ax.set_yticklabels(['1', '2', '3', '4', '5'], size=5)
-            ax.grid(True, alpha=0.3)
-            ax.set_theta_offset(np.pi / 2)  # Primo processo in alto
-            ax.set_aspect('equal')
-            plt.title(cat_name, size=9, weight='bold', y=1.08)
-
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='png', dpi=90, bbox_inches='tight')
-            plt.close()
-            img_buffer.seek(0)
-
-            from reportlab.lib.utils import ImageReader
-            img = ImageReader(img_buffer)
-            c.drawImage(
-                img,
-                x_pos,
-                y_pos_cat - 9 * cm,
-                width=8 * cm,
-                height=8 * cm,
-                preserveAspectRatio=True,
-            )
-
-    def _add_process_radars(self, c: canvas.Canvas, stats_data: Dict):
-        """7 radar (uno per processo) con 4 assi (domini)"""
+    def _add_process_radars(self, c: canvas.Canvas, specs: List[Dict]):
+        """Fino a 9 radar (uno per processo) con 4 assi (domini), griglia 3x3"""
         y_pos = self.page_height - self.margin_top - 2 * cm
         c.setFont('Helvetica-Bold', 16)
         c.setFillColor(colors.HexColor('#2C3E50'))
         c.drawString(self.margin_left, y_pos, "Radar per Processo")
 
-        processes_radar = stats_data.get('processes_radar', [])
-        if not processes_radar:
-            return
-
-        processes_radar = sorted(processes_radar, key=lambda x: x.get('overall_score', 0), reverse=True)
-
         radar_w = 5 * cm
         radar_h = 5 * cm
         cols = 3
         x_start = self.margin_left
         y_start = self.page_height - self.margin_top - 3 * cm
 
-        for idx, proc in enumerate(processes_radar[:9]):
+        for idx, spec in enumerate(specs):
             col = idx % cols
             row = idx // cols
             x_pos = x_start + col * (radar_w + 0.8 * cm)
             y_pos_proc = y_start - row * (radar_h + 1.8 * cm)
-
-            dims = proc.get('dimensions', {})
-            process_name = proc.get('process', '')[:18]
-            overall = proc.get('overall_score', 0)
-
-            fig, ax = plt.subplots(figsize=(2.2, 2.2), subplot_kw=dict(projection='polar'))
-
-            dimensions = ['Gov', 'M&C', 'Tech', 'Org']
-            values = [
-                dims.get('governance', 0),
-                dims.get('monitoring_control', 0),
-                dims.get('technology', 0),
-                dims.get('organization', 0),
-            ]
-
-            num_dims = len(dimensions)
-            angles = np.linspace(0, 2 * np.pi, num_dims, endpoint=False).tolist()
-            values_plot = values + values[:1]
-            angles_plot = angles + angles[:1]
-
-            ax.plot(angles_plot, values_plot, 'o-', linewidth=1.5, color='#3B82F6', markersize=3)
-            ax.fill(angles_plot, values_plot, alpha=0.3, color='#3B82F6')
-
-            ax.set_xticks(angles)
-            ax.set_xticklabels(dimensions, size=6)
-            ax.set_ylim(0, 5)
-            ax.set_yticks([1, 2, 3, 4, 5])
-            ax.set_yticklabels(['', '', '', '', ''], size=5)
-            ax.grid(True, alpha=0.3)
-            ax.set_theta_offset(np.pi / 2)  # Governance in alto
-            ax.set_aspect('equal')
-            plt.title(f'{process_name}\n({overall:.2f})', size=7, weight='bold', y=1.08)
-
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='png', dpi=80, bbox_inches='tight')
-            plt.close()
-            img_buffer.seek(0)
-
-            from reportlab.lib.utils import ImageReader
-            img = ImageReader(img_buffer)
-            c.drawImage(
-                img,
-                x_pos,
-                y_pos_proc - radar_h,
-                width=radar_w,
-                height=radar_h,
-                preserveAspectRatio=True,
-            )
+            self.charts.draw(c, spec, x_pos, y_pos_proc - radar_h, radar_w, radar_h)
 
     def _add_strengths_weaknesses(
         self,
@@ -1019,107 +987,68 @@ class PDFReportGenerator:
 
         return page_num
 
-    def _add_pareto_charts(self, c: canvas.Canvas, results_data: List[Dict], page_num: int) -> int:
-        """Genera due grafici Pareto in una singola pagina: per Processo e per Dominio"""
+    def _add_pareto_charts(self, c: canvas.Canvas, spec: Optional[Dict], page_num: int) -> int:
+        """Due grafici Pareto in una singola pagina: per Processo e per Dominio"""
         
-        # Filtra risultati validi
-        valid_results = [r for r in results_data if not r.get('is_not_applicable', False) and r.get('score') is not None]
-        
-        if not valid_results:
+        if spec is None:
             return page_num
         
-        # Calcola statistiche totali
-        total_touchpoints = len(valid_results)
-        total_score = sum(r['score'] for r in valid_results) / total_touchpoints
-        total_gap = 5 - total_score
-        
-        # Estrai processi e domini
-        processes = list(set(r['process'] for r in valid_results))
-        domains = list(set(r['category'] for r in valid_results))
-        domain_order = ['Governance', 'Monitoring & Control', 'Technology', 'Organization']
-        ordered_domains = [d for d in domain_order if d in domains] + [d for d in domains if d not in domain_order]
-        
-        # === DATI PER PROCESSO ===
-        # STEP 1: Calcola gap normalizzati
-        process_data = {}
-        for process in processes:
-            domain_gaps = {}
-            total_process_gap = 0
-            
-            for domain in ordered_domains:
-                domain_results = [r for r in valid_results if r['process'] == process and r['category'] == domain]
-                if domain_results:
-                    avg_score = sum(r['score'] for r in domain_results) / len(domain_results)
-                    gap = 5 - avg_score
-                    gap_normalized = gap / len(processes)
-                    domain_gaps[domain] = gap_normalized
-                    total_process_gap += gap_normalized
-                else:
-                    domain_gaps[domain] = 0
-            
-            process_data[process] = {'domain_gaps': domain_gaps, 'total': total_process_gap}
-        
-        # STEP 2: Calcola totale di tutti i gap normalizzati
-        total_all_gaps = sum(p['total'] for p in process_data.values())
-        
-        # STEP 3: Converti in percentuali
-        for process in process_data:
-            for domain in process_data[process]['domain_gaps']:
-                if total_all_gaps > 0:
-                    process_data[process]['domain_gaps'][domain] = (process_data[process]['domain_gaps'][domain] / total_all_gaps) * 100
-            process_data[process]['total'] = (process_data[process]['total'] / total_all_gaps) * 100
+        # Aggiungi al PDF
+        self._draw_report_page(c)
+        c.setFont('Helvetica-Bold', 36)
+        c.setFillColor(colors.HexColor('#3DBFBF'))
+        title = "PARETO ANALYSIS"
+        title_width = c.stringWidth(title, 'Helvetica-Bold', 36)
+        c.drawString((self.page_width - title_width) / 2, self.page_height - 100, title)
         
-        sorted_processes = sorted(processes, key=lambda p: process_data[p]['total'], reverse=True)
+        self._draw_pareto(c, spec)
         
-        cumulative = []
-        cum_sum = 0
-        for proc in sorted_processes:
-            cum_sum += process_data[proc]['total']
-            cumulative.append(cum_sum)
+        self._add_page_number(c, page_num)
+        c.showPage()
+        page_num += 1
         
-        # === DATI PER DOMINIO ===
-        # STEP 1: Calcola gap normalizzati
-        domain_data = {}
-        for domain in ordered_domains:
-            process_gaps = {}
-            total_domain_gap = 0
-            
-            for process in processes:
-                proc_results = [r for r in valid_results if r['category'] == domain and r['process'] == process]
-                if proc_results:
-                    avg_score = sum(r['score'] for r in proc_results) / len(proc_results)
-                    gap = 5 - avg_score
-                    gap_normalized = gap / len(ordered_domains)
-                    process_gaps[process] = gap_normalized
-                    total_domain_gap += gap_normalized
-                else:
-                    process_gaps[process] = 0
-            
-            domain_data[domain] = {'process_gaps': process_gaps, 'total': total_domain_gap}
+        return page_num
+
+    def _draw_pareto(self, c: canvas.Canvas, spec: Dict):
+        """Grafici Pareto allineati in alto a sinistra sotto il titolo"""
+        max_width = self.page_width - 2 * self.margin_left
+        max_height = self.page_height - 200
+        self.charts.draw(
+            c, spec, self.margin_left, self.page_height - 140 - max_height,
+            max_width, max_height, anchor='nw'
+        )
+
+    def _pareto_spec(self, results_data: List[Dict], scores: SessionScores = None) -> Optional[Dict]:
+        """Dati dei due grafici Pareto (None se non ci sono risposte valide)"""
         
-        # STEP 2: Calcola totale di tutti i gap normalizzati
-        total_all_domain_gaps = sum(d['total'] for d in domain_data.values())
+        if scores is None:
+            scores = SessionScores.from_results(results_data)
         
-        # STEP 3: Converti in percentuali
-        for domain in domain_data:
-            for process in domain_data[domain]['process_gaps']:
-                if total_all_domain_gaps > 0:
-                    domain_data[domain]['process_gaps'][process] = (domain_data[domain]['process_gaps'][process] / total_all_domain_gaps) * 100
-            domain_data[domain]['total'] = (domain_data[domain]['total'] / total_all_domain_gaps) * 100
+        # Solo processi e domini con risposte valide (non N/A, con score)
+        if scores.totals()['answer_count'] == 0:
+            return None
         
-        sorted_domains = sorted(ordered_domains, key=lambda d: domain_data[d]['total'], reverse=True)
+        processes = [p for p, n in zip(scores.processes, scores.answer_count.sum(axis=1)) if n > 0]
+        domains = [d for d, n in zip(scores.categories, scores.answer_count.sum(axis=0)) if n > 0]
+        domain_order = ['Governance', 'Monitoring & Control', 'Technology', 'Organization']
+        ordered_domains = [d for d in domain_order if d in domains] + [d for d in domains if d not in domain_order]
         
-        cumulative_domain = []
-        cum_sum_domain = 0
-        for dom in sorted_domains:
-            cum_sum_domain += domain_data[dom]['total']
-            cumulative_domain.append(cum_sum_domain)
+        # Gap normalizzati e percentuali per processo e per dominio in un'unica passata
+        pareto = scores.pareto(processes, ordered_domains)
         
-        # === CREA FIGURA CON 2 SUBPLOT ===
-        import matplotlib.pyplot as plt
-        import numpy as np
+        # === DATI PER PROCESSO ===
+        process_order = np.argsort(-pareto['process_pct'], kind='stable')
+        sorted_processes = [processes[i] for i in process_order]
+        cumulative = np.cumsum(pareto['process_pct'][process_order])
+        # [processi ordinati, domini]: contributo % di ogni dominio
+        process_domain_pct = pareto['process_cells_pct'][process_order]
         
-        fig, (ax_proc, ax_dom) = plt.subplots(2, 1, figsize=(12, 10))
+        # === DATI PER DOMINIO ===
+        domain_sort = np.argsort(-pareto['category_pct'], kind='stable')
+        sorted_domains = [ordered_domains[j] for j in domain_sort]
+        cumulative_domain = np.cumsum(pareto['category_pct'][domain_sort])
+        # [domini ordinati, processi]: contributo % di ogni processo
+        domain_process_pct = pareto['category_cells_pct'][domain_sort]
         
         domain_colors = {
             'Governance': '#3B82F6',
@@ -1127,106 +1056,59 @@ class PDFReportGenerator:
             'Technology': '#F39C12',
             'Organization': '#EF4444'
         }
-        
-        # === GRAFICO 1: Pareto by Process ===
-        x_pos = np.arange(len(sorted_processes))
-        bar_width = 0.8
-        bottom = np.zeros(len(sorted_processes))
-        
-        for domain in ordered_domains:
-            values = [process_data[proc]['domain_gaps'].get(domain, 0) for proc in sorted_processes]
-            ax_proc.bar(x_pos, values, bar_width, bottom=bottom, 
-                       label=domain, color=domain_colors.get(domain, '#999999'), alpha=0.8)
-            bottom += values
-        
-        ax_proc.set_xlabel('Process', fontsize=10, fontweight='bold')
-        ax_proc.set_ylabel('Gap %', fontsize=10, fontweight='bold')
-        ax_proc.set_xticks(x_pos)
-        ax_proc.set_xticklabels(sorted_processes, rotation=45, ha='right', fontsize=8)
-        ax_proc.set_ylim([0, 110])
-        
-        ax_proc2 = ax_proc.twinx()
-        ax_proc2.plot(x_pos, cumulative, 'ro-', linewidth=2, markersize=6, label='Cumulative')
-        ax_proc2.axhline(y=80, color='#10B981', linestyle='--', linewidth=2, label='80%')
-        ax_proc2.set_ylabel('Cumulative %', fontsize=10, fontweight='bold', color='#EF4444')
-        ax_proc2.set_ylim([0, 110])
-        ax_proc2.tick_params(axis='y', labelcolor='#EF4444')
-        
-        lines1, labels1 = ax_proc.get_legend_handles_labels()
-        lines2, labels2 = ax_proc2.get_legend_handles_labels()
-        ax_proc.legend(lines1 + lines2, labels1 + labels2, loc='upper left', fontsize=8, ncol=3)
-        ax_proc.set_title('Pareto by Process', fontsize=11, fontweight='bold')
-        
-        # === GRAFICO 2: Pareto by Domain ===
-        process_colors = {}
         color_palette = ['#3B82F6', '#10B981', '#F39C12', '#EF4444', '#8B5CF6', '#EC4899']
-        for idx, proc in enumerate(processes):
-            process_colors[proc] = color_palette[idx % len(color_palette)]
-        
-        x_pos_d = np.arange(len(sorted_domains))
-        bottom_d = np.zeros(len(sorted_domains))
-        
-        for process in processes:
-            values_d = [domain_data[dom]['process_gaps'].get(process, 0) for dom in sorted_domains]
-            ax_dom.bar(x_pos_d, values_d, bar_width, bottom=bottom_d,
-                      label=process, color=process_colors.get(process, '#999999'), alpha=0.8)
-            bottom_d += values_d
-        
-        ax_dom.set_xlabel('Domain', fontsize=10, fontweight='bold')
-        ax_dom.set_ylabel('Gap %', fontsize=10, fontweight='bold')
-        ax_dom.set_xticks(x_pos_d)
-        ax_dom.set_xticklabels(sorted_domains, rotation=45, ha='right', fontsize=8)
-        ax_dom.set_ylim([0, 110])
-        
-        ax_dom2 = ax_dom.twinx()
-        ax_dom2.plot(x_pos_d, cumulative_domain, 'ro-', linewidth=2, markersize=6, label='Cumulative')
-        ax_dom2.axhline(y=80, color='#10B981', linestyle='--', linewidth=2, label='80%')
-        ax_dom2.set_ylabel('Cumulative %', fontsize=10, fontweight='bold', color='#EF4444')
-        ax_dom2.set_ylim([0, 110])
-        ax_dom2.tick_params(axis='y', labelcolor='#EF4444')
-        
-        lines1_d, labels1_d = ax_dom.get_legend_handles_labels()
-        lines2_d, labels2_d = ax_dom2.get_legend_handles_labels()
-        ax_dom.legend(lines1_d + lines2_d, labels1_d + labels2_d, loc='upper left', fontsize=8, ncol=3)
-        ax_dom.set_title('Pareto by Domain', fontsize=11, fontweight='bold')
-        
-        plt.tight_layout()
         
-        # Salva figura
-        import tempfile
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-            plt.savefig(tmp.name, format='png', dpi=150, bbox_inches='tight')
-            temp_path = tmp.name
-        plt.close()
-        
-        # Aggiungi al PDF
-        self._draw_report_page(c)
-        c.setFont('Helvetica-Bold', 36)
-        c.setFillColor(colors.HexColor('#3DBFBF'))
-        title = "PARETO ANALYSIS"
-        title_width = c.stringWidth(title, 'Helvetica-Bold', 36)
-        c.drawString((self.page_width - title_width) / 2, self.page_height - 100, title)
-        
-        from PIL import Image
-        img = Image.open(temp_path)
-        img_width, img_height = img.size
-        max_width = self.page_width - 2 * self.margin_left
-        max_height = self.page_height - 200
-        ratio = min(max_width / img_width, max_height / img_height)
-        scaled_width = img_width * ratio
-        scaled_height = img_height * ratio
-        
-        x_pos_img = self.margin_left
-        y_pos_img = self.page_height - 140 - scaled_height
-        
-        c.drawImage(temp_path, x_pos_img, y_pos_img, width=scaled_width, height=scaled_height)
-        os.unlink(temp_path)
-        
-        self._add_page_number(c, page_num)
+        return {
+            'kind': 'pareto',
+            'figsize': (12, 10),
+            'dpi': 150,
+            'panels': [
+                {
+                    'title': 'Pareto by Process',
+                    'xlabel': 'Process',
+                    'categories': sorted_processes,
+                    'stacks': [
+                        {
+                            'label': domain,
+                            'color': domain_colors.get(domain, '#999999'),
+                            'values': process_domain_pct[:, j].tolist(),
+                        }
+                        for j, domain in enumerate(ordered_domains)
+                    ],
+                    'cumulative': cumulative.tolist(),
+                },
+                {
+                    'title': 'Pareto by Domain',
+                    'xlabel': 'Domain',
+                    'categories': sorted_domains,
+                    'stacks': [
+                        {
+                            'label': process,
+                            'color': color_palette[i % len(color_palette)],
+                            'values': domain_process_pct[:, i].tolist(),
+                        }
+                        for i, process in enumerate(processes)
+                    ],
+                    'cumulative': cumulative_domain.tolist(),
+                },
+            ],
+        }
+
+    def _draw_chart_pages(self, c: canvas.Canvas, stats_data: Dict, scores: SessionScores):
+        """Solo le pagine con grafici, senza sfondi (usato dal benchmark dei motori)"""
+        specs = self._chart_specs(stats_data, [], scores)
+        self.charts.prerender(self._flatten_specs(specs))
+        self._add_radar_processes_vs_domains(c, specs['processes_vs_domains'])
         c.showPage()
-        page_num += 1
-        
-        return page_num
+        self._add_process_radars(c, specs['process_radars'])
+        c.showPage()
+        self._add_radar_domains_vs_processes(c, specs['domains_vs_processes'])
+        c.showPage()
+        self._add_category_radars(c, specs['category_radars'])
+        c.showPage()
+        if specs['pareto'] is not None:
+            self._draw_pareto(c, specs['pareto'])
+            c.showPage()
 
     def _add_recommendations_page(self, c: canvas.Canvas, recommendations: str, page_num: int) -> int:
         """Aggiunge pagina con raccomandazioni AI basate su Pareto"""
@@ -1415,15 +1297,7 @@ class PDFReportGenerator:
         return page_num
 
     def _draw_ai_page(self, c: canvas.Canvas):
-        c.drawImage(
-            self.ai_template,
-            0,
-            0,
-            width=self.page_width,
-            height=self.page_height,
-            preserveAspectRatio=True,
-            mask='auto'
-        )
+        self._draw_background(c, self.ai_template)
 
     def _add_page_number(self, c: canvas.Canvas, page_num: int):
         """Aggiunge numero di pagina in basso al centro"""
@@ -0,0 +1,287 @@
+"""
+Service per la generazione in background dei report PDF (coda su PostgreSQL).
+
+Le richieste inseriscono un job in pdf_report_job; i worker sono processi
+separati (matplotlib/reportlab non bloccano l'event loop e non si contendono
+il GIL) che prelevano i job con SELECT ... FOR UPDATE SKIP LOCKED: più worker
+e più istanze dell'app condividono la stessa coda senza broker esterni.
+
+Ogni worker ha il proprio pool di processi per il render dei grafici: i
+PDF_CHART_WORKERS processi vengono divisi tra i worker, così N worker non
+avviano N pool grandi quanto le CPU.
+
+Un job è identificato da (sessione, digest dei dati del report): richieste
+identiche riusano lo stesso job e il PDF prodotto, salvato nel report store
+sotto lo stesso digest, resta scaricabile finché i dati della sessione non cambiano.
+
+Di default (PDF_WORKERS=0) l'app non avvia worker e vanno eseguiti a parte:
+    python -m app.services.pdf_job_service worker [--count N]
+Con PDF_WORKERS=N > 0 vengono avviati anche dall'app all'avvio.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, and_, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import models
+from app.services.pdf_report_service import store_pdf_report
+from app.services.report_store_service import report_digest, get_report_store
+from app.services.report_charts import PDF_CHART_WORKERS, set_render_workers, warm_render_pool, shutdown_render_pool
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from uuid import uuid4
+import multiprocessing
+import os
+
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0"))
+POLL_INTERVAL = 1.0          # secondi di attesa quando la coda è vuota
+STALE_JOB_SECONDS = 600      # un job 'running' più vecchio viene ripreso (worker morto)
+MAX_ATTEMPTS = 3             # oltre, un job bloccato viene marcato 'failed'
+
+
+# ===============================
+#  API DELLA CODA
+# ===============================
+
+def submit_pdf_job(session_id, db: Session) -> Optional[models.PdfReportJob]:
+    """
+    Accoda la generazione del report (None se la sessione non esiste).
+
+    Se esiste già un job per gli stessi dati viene riusato (anche se già
+    completato); un job fallito viene rimesso in coda. I job conclusi
+    per dati ormai superati vengono eliminati.
+    Non esegue il commit: la transazione resta al chiamante.
+    """
+    fingerprint = report_digest(session_id, db)
+    if fingerprint is None:
+        return None
+
+    table = models.PdfReportJob.__table__
+    db.execute(
+        delete(table).where(
+            table.c.session_id == session_id,
+            table.c.fingerprint != fingerprint,
+            table.c.status.in_(('done', 'failed')),
+        )
+    )
+
+    stmt = pg_insert(table).values(
+        id=uuid4(),
+        session_id=session_id,
+        fingerprint=fingerprint,
+        status='queued',
+        attempts=0,
+        created_at=datetime.now(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint='uq_pdf_report_job_fingerprint',
+        set_={
+            'status': 'queued',
+            'attempts': 0,
+            'error': None,
+            'created_at': stmt.excluded.created_at,
+            'started_at': None,
+            'finished_at': None,
+        },
+        where=table.c.status == 'failed',
+    )
+    db.execute(stmt)
+
+    job = db.query(models.PdfReportJob).filter(
+        models.PdfReportJob.session_id == session_id,
+        models.PdfReportJob.fingerprint == fingerprint,
+    ).one()
+
+    # Job concluso ma PDF non più presente nel report store: si rigenera
+    if job.status == 'done' and not get_report_store().exists(fingerprint):
+        job.status = 'queued'
+        job.attempts = 0
+        job.created_at = datetime.now()
+        job.started_at = None
+        job.finished_at = None
+        db.flush()
+    return job
+
+
+def get_pdf_job(job_id, db: Session) -> Optional[models.PdfReportJob]:
+    return db.query(models.PdfReportJob).filter(models.PdfReportJob.id == job_id).first()
+
+
+def delete_session_pdf_jobs(session_id, db: Session) -> int:
+    """Elimina i job di una sessione (da chiamare prima di cancellarla)"""
+    table = models.PdfReportJob.__table__
+    return db.execute(delete(table).where(table.c.session_id == session_id)).rowcount
+
+
+def pdf_job_status(job: models.PdfReportJob) -> Dict:
+    """Stato del job in forma serializzabile"""
+    return {
+        "job_id": str(job.id),
+        "session_id": str(job.session_id),
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "download_url": f"/api/pdf-jobs/{job.id}/download" if job.status == 'done' else None,
+    }
+
+
+# ===============================
+#  WORKER
+# ===============================
+
+def claim_next_job(db: Session):
+    """
+    Preleva il job più vecchio in coda (o bloccato da un worker morto)
+    con FOR UPDATE SKIP LOCKED e lo marca 'running'.
+    I job bloccati che hanno esaurito i tentativi vengono marcati 'failed'.
+
+    Returns:
+        riga (id, session_id, fingerprint) oppure None se la coda è vuota
+    """
+    table = models.PdfReportJob.__table__
+    stale_before = datetime.now() - timedelta(seconds=STALE_JOB_SECONDS)
+
+    db.execute(
+        update(table)
+        .where(
+            table.c.status == 'running',
+            table.c.started_at < stale_before,
+            table.c.attempts >= MAX_ATTEMPTS,
+        )
+        .values(
+            status='failed',
+            finished_at=datetime.now(),
+            error=f"Job interrotto {MAX_ATTEMPTS} volte (worker terminato durante la generazione)",
+        )
+    )
+
+    candidate = (
+        select(table.c.id)
+        .where(or_(
+            table.c.status == 'queued',
+            and_(
+                table.c.status == 'running',
+                table.c.started_at < stale_before,
+                table.c.attempts < MAX_ATTEMPTS,
+            ),
+        ))
+        .order_by(table.c.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    row = db.execute(
+        update(table)
+        .where(table.c.id == candidate)
+        .values(status='running', started_at=datetime.now(), attempts=table.c.attempts + 1)
+        .returning(table.c.id, table.c.session_id, table.c.fingerprint)
+    ).first()
+    db.commit()
+    return row
+
+
+def _finish_job(job_id, db: Session, **values) -> None:
+    table = models.PdfReportJob.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == job_id, table.c.status == 'running')
+        .values(finished_at=datetime.now(), **values)
+    )
+    db.commit()
+
+
+def run_pdf_job(job_id, session_id, fingerprint: str, db: Session) -> None:
+    """Genera il PDF di un job già prelevato, lo archivia e ne salva l'esito"""
+    try:
+        if report_digest(session_id, db) != fingerprint:
+            _finish_job(job_id, db, status='failed', error="Dati della sessione modificati: reinviare la richiesta")
+            return
+
+        filename = store_pdf_report(str(session_id), fingerprint, db)
+        _finish_job(job_id, db, status='done', error=None, filename=filename)
+        print(f"✅ PDF job {job_id}: report generato ({filename})")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ PDF job {job_id}: {e}")
+        _finish_job(job_id, db, status='failed', error=str(e)[:2000])
+
+
+def worker_loop(stop_event, chart_workers: int = PDF_CHART_WORKERS) -> None:
+    """Ciclo di un worker: preleva ed esegue job finché stop_event non viene impostato"""
+    from app.database import SessionLocal
+
+    print(f"🧾 PDF worker {os.getpid()} avviato ({chart_workers} processi di render)")
+    set_render_workers(chart_workers)
+    warm_render_pool()
+    try:
+        while not stop_event.is_set():
+            db = SessionLocal()
+            try:
+                job = claim_next_job(db)
+                if job is None:
+                    stop_event.wait(POLL_INTERVAL)
+                    continue
+                run_pdf_job(job.id, job.session_id, job.fingerprint, db)
+            except Exception as e:
+                db.rollback()
+                print(f"❌ PDF worker {os.getpid()}: {e}")
+                stop_event.wait(POLL_INTERVAL)
+            finally:
+                db.close()
+    finally:
+        shutdown_render_pool()
+
+
+_workers: List = []
+_stop_event = None
+
+
+def start_pdf_workers(count: int = PDF_WORKERS) -> int:
+    """
+    Avvia il pool di processi worker (spawn: nessuna connessione ereditata).
+    Non daemon: ogni worker avvia a sua volta il pool di render dei grafici,
+    con una quota fissa dei PDF_CHART_WORKERS processi.
+    """
+    global _stop_event
+    if _workers or count <= 0:
+        return len(_workers)
+
+    ctx = multiprocessing.get_context('spawn')
+    _stop_event = ctx.Event()
+    chart_workers = max(PDF_CHART_WORKERS // count, 1)
+    for _ in range(count):
+        proc = ctx.Process(target=worker_loop, args=(_stop_event, chart_workers), name="pdf-worker", daemon=False)
+        proc.start()
+        _workers.append(proc)
+    return count
+
+
+def stop_pdf_workers(timeout: float = 10.0) -> None:
+    """Ferma i worker al termine del job in corso"""
+    if _stop_event is not None:
+        _stop_event.set()
+    for proc in _workers:
+        proc.join(timeout)
+        if proc.is_alive():
+            proc.terminate()
+    _workers.clear()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Worker della coda dei report PDF")
+    parser.add_argument("command", choices=["worker"])
+    parser.add_argument("--count", type=int, default=max(PDF_WORKERS, 1), help="numero di processi worker")
+    args = parser.parse_args()
+
+    start_pdf_workers(args.count)
+    print(f"🧾 {args.count} PDF worker in esecuzione (Ctrl+C per terminare)")
+    try:
+        for proc in list(_workers):
+            proc.join()
+    except KeyboardInterrupt:
+        stop_pdf_workers()
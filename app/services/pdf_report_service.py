@@ -0,0 +1,296 @@
+"""
+Service per la preparazione e la generazione del report PDF di una sessione.
+
+Funzioni sincrone: vengono eseguite nel threadpool di FastAPI o nei worker
+della coda PDF (pdf_job_service), mai sull'event loop.
+
+Il PDF archiviato passa per un SpooledTemporaryFile (in memoria fino a
+PDF_SPOOL_MAX_BYTES, poi su disco) copiato a blocchi nel report store: il
+file finito non resta in memoria. Non riduce il picco durante la
+generazione: reportlab compone l'intero documento in memoria in
+Canvas.save() e il picco è dominato dalle immagini dei grafici (vedi
+tests/test_pdf_report_service.py).
+"""
+from sqlalchemy.orm import Session
+from app.models import AssessmentSession, AssessmentResult, LocalUser, TemplateVersion, AssessmentTemplate
+from app.services.pdf_generator import PDFReportGenerator
+from app.services.scoring_engine import SessionScores
+from app.services.report_store_service import get_report_store, record_report_digest
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Dict, List, Tuple
+import io
+import numpy as np
+import os
+import re
+
+
+PDF_SPOOL_MAX_BYTES = int(os.getenv("PDF_SPOOL_MAX_BYTES", str(1024 * 1024)))
+
+
+class ReportDataNotFound(ValueError):
+    """Sessione o risultati inesistenti: il report non si può generare"""
+
+
+def build_pdf_report(session_id: str, db: Session) -> Tuple[bytes, str]:
+    """
+    Genera il report PDF di una sessione di assessment in memoria
+
+    Returns:
+        (pdf_bytes, filename)
+
+    Raises:
+        ReportDataNotFound: se sessione o risultati non esistono
+    """
+    buffer = io.BytesIO()
+    filename = write_pdf_report(session_id, db, buffer)
+    return buffer.getvalue(), filename
+
+
+def store_pdf_report(session_id: str, digest: str, db: Session) -> str:
+    """
+    Genera il report, lo archivia nel report store sotto digest (passando
+    per un file temporaneo) e registra il digest per invalidate_session_reports
+
+    Returns:
+        filename del report
+
+    Raises:
+        ReportDataNotFound: se sessione o risultati non esistono
+    """
+    with SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_BYTES) as spool:
+        filename = write_pdf_report(session_id, db, spool)
+        spool.seek(0)
+        get_report_store().put_file(digest, spool)
+    record_report_digest(session_id, digest, db)
+    return filename
+
+
+def write_pdf_report(session_id: str, db: Session, output: BinaryIO) -> str:
+    """
+    Scrive il report PDF di una sessione su output (file binario)
+
+    Returns:
+        filename del report
+
+    Raises:
+        ReportDataNotFound: se sessione o risultati non esistono
+    """
+    session_id = str(session_id)
+
+    # Recupera dati sessione
+    session = db.query(AssessmentSession).filter(AssessmentSession.id == session_id).first()
+    if not session:
+        raise ReportDataNotFound("Sessione di assessment non trovata")
+
+    # Recupera risultati
+    results = db.query(AssessmentResult).filter(
+        AssessmentResult.session_id == session_id
+    ).all()
+
+    if not results:
+        raise ReportDataNotFound("Nessun risultato trovato per questa sessione")
+
+    # Recupera nome utente che ha creato l'assessment
+    user_name = "N/A"
+    if session.user_id:
+        user = db.query(LocalUser).filter(LocalUser.id == session.user_id).first()
+        if user:
+            user_name = user.email
+
+    session_data = {
+        "azienda_nome": session.azienda_nome or "Azienda Non Specificata",
+        "settore": session.settore,
+        "dimensione": session.dimensione,
+        "referente": session.referente,
+        "email": session.email,
+        "effettuato_da": session.effettuato_da,
+        "creato_il": session.creato_il,
+        "logo_path": session.logo_path,
+        "logo_width": session.logo_width,
+        "logo_height": session.logo_height,
+        "model_name": session.model_name or "i40_assessment_fto",
+        "template_name": None,
+        "data_chiusura": session.data_chiusura,
+        "user_name": user_name,
+        "pareto_recommendations": session.pareto_recommendations
+    }
+
+    # Prepara dati risultati per PDF
+    results_data = []
+    for result in results:
+        results_data.append({
+            "process": result.process,
+            "category": result.category,
+            "activity": result.activity,
+            "dimension": result.dimension,
+            "score": result.score,
+            "note": result.note,
+            "is_not_applicable": result.is_not_applicable
+        })
+
+    # Matrici punteggi calcolate una sola volta dalle risposte già caricate
+    scores = SessionScores.from_results(results)
+
+    # Calcola statistiche dettagliate
+    stats_data = calculate_pdf_stats(session_id, db, scores)
+    stats_data["session_id"] = session_id
+
+    # Se usa template_version_id, recupera il nome del template
+    if session.template_version_id:
+        template_version = db.query(TemplateVersion).filter(
+            TemplateVersion.id == session.template_version_id
+        ).first()
+        if template_version:
+            template = db.query(AssessmentTemplate).filter(
+                AssessmentTemplate.id == template_version.template_id
+            ).first()
+            if template:
+                session_data["template_name"] = f"{template.name} (v{template_version.version})"
+
+    # Calcola dati radar per processi (per grafico globale con 4 dimensioni)
+    stats_data["processes_radar"] = calculate_processes_radar(session_id, db, scores)
+
+    # Recupera conclusioni AI dalla sessione già caricata
+    ai_conclusions = session.raccomandazioni if session.raccomandazioni else None
+
+    pdf_generator = PDFReportGenerator()
+    pdf_generator.write_assessment_report(
+        output, session_data, results_data, stats_data, ai_conclusions, scores=scores
+    )
+
+    return report_filename(session)
+
+
+def report_filename(session: AssessmentSession) -> str:
+    """Nome file del report (senza caratteri speciali)"""
+    clean_company_name = session.azienda_nome.replace(' ', '_').replace('/', '_') if session.azienda_nome else 'Assessment'
+    clean_company_name = re.sub(r'[^\w\-_]', '', clean_company_name)
+    return f"Assessment_Report_{clean_company_name}_{str(session.id)[:8]}.pdf"
+
+
+def calculate_pdf_stats(session_id: str, db: Session, scores: SessionScores = None) -> Dict:
+    """
+    Calcola statistiche dettagliate per il PDF
+    Riusa e ottimizza la logica esistente da radar.py
+    
+    Args:
+        session_id: ID della sessione
+        db: Sessione database
+        scores: matrici già calcolate (se None vengono lette dagli aggregati)
+        
+    Returns:
+        Dict: Statistiche complete per il PDF
+    """
+    
+    # Matrici processo x dominio: O(processi x domini)
+    if scores is None:
+        scores = SessionScores.load(session_id, db)
+    overall = scores.totals()
+    
+    # Statistiche generali
+    applicable_questions = overall["answer_count"]
+    not_applicable_questions = overall["na_count"]
+    total_questions = applicable_questions + not_applicable_questions
+    
+    # Calcola media generale (solo domande applicabili)
+    overall_average = overall["average"] if applicable_questions > 0 else 0.0
+    
+    # Statistiche per processo
+    processes_stats = {}
+    
+    for process_name, agg in scores.by_process().items():
+        if agg["answer_count"] > 0:
+            processes_stats[process_name] = {
+                "applicable_count": agg["answer_count"],
+                "average_score": agg["average"],
+                "min_score": agg["min_score"],
+                "max_score": agg["max_score"],
+                "total_score": agg["score_sum"],
+                "score_distribution": {
+                    str(score): count for score, count in enumerate(agg["distribution"])
+                }
+            }
+    
+    # Statistiche per categoria (cross-process)
+    categories_stats = {}
+    
+    for (process_name, category), agg in scores.by_cell().items():
+        if agg["answer_count"] > 0:
+            categories_stats[f"{process_name}::{category}"] = {
+                "count": agg["answer_count"],
+                "average": agg["average"],
+                "min": agg["min_score"],
+                "max": agg["max_score"]
+            }
+    
+    # Compila risultato finale
+    stats_result = {
+        "total_questions": total_questions,
+        "applicable_questions": applicable_questions, 
+        "not_applicable_questions": not_applicable_questions,
+        "overall_average": round(overall_average, 2),
+        "by_process": processes_stats,
+        "by_category": categories_stats,
+        "completion_rate": (applicable_questions / max(total_questions, 1)) * 100,
+        "session_metadata": {
+            "total_processes": len(processes_stats),
+            "processes_with_data": len([p for p in processes_stats.values() if p["applicable_count"] > 0])
+        }
+    }
+    
+    return stats_result
+
+
+def calculate_processes_radar(session_id: str, db: Session, scores: SessionScores = None) -> List[Dict]:
+    """
+    Calcola i dati radar per ogni processo con le 4 dimensioni
+    (Governance, Monitoring & Control, Technology, Organization)
+    Usa la logica "media delle medie delle righe" come nel frontend
+    
+    Args:
+        scores: matrici calcolate dalle risposte (se None vengono lette dal DB)
+    """
+    
+    # Servono le singole risposte: la media è per riga (attività)
+    if scores is None:
+        scores = SessionScores.load_results(session_id, db)
+    
+    if not scores.processes:
+        return []
+    
+    # Per ogni categoria (dominio), media delle medie delle attività per ogni processo
+    category_mapping = {
+        "Governance": "governance",
+        "Monitoring & Control": "monitoring_control",
+        "Technology": "technology",
+        "Organization": "organization"
+    }
+    row_averages = scores.row_average_matrix(categories=list(category_mapping))
+    
+    processes_data = {}
+    for i, proc in enumerate(scores.processes):
+        processes_data[proc] = {
+            "process": proc,
+            "dimensions": {
+                dim_key: 0.0 if np.isnan(avg) else round(float(avg), 2)
+                for dim_key, avg in zip(category_mapping.values(), row_averages[i])
+            },
+            "overall_score": 0.0
+        }
+    
+    # Calcola punteggio complessivo per ogni processo
+    for proc in processes_data:
+        dimensions = processes_data[proc]["dimensions"]
+        valid_scores = [v for v in dimensions.values() if v > 0]
+        if valid_scores:
+            processes_data[proc]["overall_score"] = round(sum(valid_scores) / len(valid_scores), 2)
+    
+    # Converti in lista e ordina per punteggio
+    processes_list = sorted(
+        list(processes_data.values()),
+        key=lambda x: x["overall_score"],
+        reverse=True
+    )
+    
+    return processes_list
+
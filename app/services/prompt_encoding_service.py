@@ -0,0 +1,188 @@
+"""
+Service per la codifica compatta nei prompt AI della struttura degli assessment.
+
+I modelli ripetono gli stessi testi di domanda (lunghi, in italiano) per
+ogni attività: serializzarli come JSON annidato o una riga per domanda
+spreca token e allunga i tempi di risposta. compact_table() produce un
+dizionario deduplicato (codice breve -> testo) per le colonne indicate e
+una tabella con una riga per elemento e i campi separati da "|".
+
+count_tokens() conta i token con tiktoken, se installato e con le codifiche
+disponibili, altrimenti con una stima basata su parole e punteggiatura.
+"""
+from app.services.llm_gateway import DEFAULT_MODEL
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+import re
+
+
+CELL_SEPARATOR = "|"
+FALLBACK_ENCODING = "o200k_base"
+APPROX_CHARS_PER_TOKEN = 4
+
+# Stima: cifre a gruppi di 3, parole a blocchi di ~4 caratteri, un token per
+# segno di punteggiatura, a capo o sequenza di spazi (indentazione JSON)
+_TOKEN_PIECES = re.compile(r"\s*\n\s*| {2,}|\d{1,3}|[^\W\d_]+|[^\w\s]|_")
+
+
+# ===============================
+#  CODIFICA COMPATTA
+# ===============================
+
+def _cell(value) -> str:
+    """Valore su una riga, senza separatori di colonna"""
+    if value is None:
+        return ""
+    return " ".join(str(value).split()).replace(CELL_SEPARATOR, "/")
+
+
+def code_dictionary(values: Iterable, prefix: str) -> Dict[str, str]:
+    """Codici brevi (prefisso + numero) per i valori distinti, nell'ordine di prima comparsa"""
+    dictionary: Dict[str, str] = {}
+    for value in values:
+        value = _cell(value)
+        if value:
+            dictionary.setdefault(value, f"{prefix}{len(dictionary) + 1}")
+    return dictionary
+
+
+def format_dictionary(title: str, dictionary: Mapping[str, str]) -> str:
+    return "\n".join([f"{title.upper()} (codice = testo):"] + [f"{code} = {text}" for text, code in dictionary.items()])
+
+
+def compact_table(
+    rows: Iterable[Mapping],
+    columns: Sequence[str],
+    codes: Optional[Mapping[str, str]] = None,
+    headers: Optional[Mapping[str, str]] = None,
+    dictionaries: Optional[Mapping[str, Mapping[str, str]]] = None,
+) -> str:
+    """
+    Tabella compatta delle righe. Le colonne in codes (colonna -> prefisso)
+    vengono sostituite da codici brevi definiti una sola volta in un
+    dizionario prima della tabella. Le colonne in dictionaries usano un
+    dizionario già presente altrove nel prompt (es. condiviso fra più
+    blocchi), che non viene ripetuto; i valori assenti restano in chiaro.
+
+    Esempio con codes={"activity": "A"}:
+        ATTIVITÀ (codice = testo):
+        A1 = promozione tramite app
+
+        id|attività|domanda
+        127|A1|Q1
+    """
+    rows = list(rows)
+    headers = headers or {}
+    local = {
+        column: code_dictionary((row.get(column) for row in rows), prefix)
+        for column, prefix in (codes or {}).items()
+    }
+    encoders = {**(dictionaries or {}), **local}
+
+    parts = [format_dictionary(headers.get(column, column), d) + "\n" for column, d in local.items() if d]
+    parts.append(CELL_SEPARATOR.join(headers.get(column, column) for column in columns))
+    for row in rows:
+        cells = []
+        for column in columns:
+            value = _cell(row.get(column))
+            encoder = encoders.get(column)
+            cells.append(encoder.get(value, value) if encoder is not None else value)
+        parts.append(CELL_SEPARATOR.join(cells))
+    return "\n".join(parts)
+
+
+# ===============================
+#  STRUTTURA DEGLI ASSESSMENT
+# ===============================
+
+QUESTION_HEADERS = {"process": "processo", "activity": "attività", "question": "domanda",
+                    "score": "punteggio", "note": "nota"}
+
+
+def question_text(dimension: Mapping) -> str:
+    """Voce del dizionario delle domande: testo con la sua categoria"""
+    return f"[{dimension['category']}] {dimension['dimension']}"
+
+
+def question_dictionary(dimensions: Iterable[Mapping]) -> Dict[str, str]:
+    """Dizionario deduplicato delle domande (Q1, Q2, ...): i modelli ripetono le stesse domande per ogni attività"""
+    return code_dictionary((question_text(d) for d in dimensions), "Q")
+
+
+def encode_questions(items: Iterable, dictionary: Optional[Mapping[str, str]] = None) -> str:
+    """
+    Tabella id|attività|domanda per coppie (id, dimensione del modello).
+    Con dictionary (da question_dictionary) le domande sono codici di un
+    dizionario già inviato; senza, il dizionario viene aggiunto alla tabella.
+    """
+    rows = ({"id": dimension_id, "activity": d["activity"], "question": question_text(d)}
+            for dimension_id, d in items)
+    return compact_table(
+        rows,
+        ("id", "activity", "question"),
+        codes={"activity": "A"} if dictionary is not None else {"activity": "A", "question": "Q"},
+        headers=QUESTION_HEADERS,
+        dictionaries={"question": dictionary} if dictionary is not None else None,
+    )
+
+
+def encode_critical_areas(areas: Iterable[Mapping]) -> str:
+    """Aree critiche (process, category, dimension, score, note) come tabella processo|domanda|punteggio|nota"""
+    rows = ({**a, "question": question_text(a)} for a in areas)
+    return compact_table(
+        rows,
+        ("process", "question", "score", "note"),
+        codes={"process": "P", "question": "Q"},
+        headers=QUESTION_HEADERS,
+    )
+
+
+# ===============================
+#  CONTEGGIO TOKEN
+# ===============================
+
+@lru_cache(maxsize=16)
+def _encoding(model: str):
+    """Codifica tiktoken del modello; None se tiktoken o le sue codifiche non sono disponibili"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:      # es. file della codifica non scaricabile
+        print(f"⚠️ tiktoken non utilizzabile per {model}, uso la stima: {e}")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Stima dei token senza tokenizer (errore tipico entro il 15-20%)"""
+    total = 0
+    for piece in _TOKEN_PIECES.findall(text or ""):
+        if piece[0].isalpha():
+            total += -(-len(piece) // APPROX_CHARS_PER_TOKEN)
+        else:
+            total += 1
+    return total
+
+
+def token_counter(model: Optional[str] = None) -> str:
+    """Metodo di conteggio in uso per il modello: nome della codifica tiktoken o 'stima'"""
+    encoding = _encoding(model or DEFAULT_MODEL)
+    return encoding.name if encoding is not None else "stima"
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    encoding = _encoding(model or DEFAULT_MODEL)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text or "", disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: Optional[str] = None) -> int:
+    """Token di input di una chat completion (contenuti più ~4 token di struttura per messaggio)"""
+    return 3 + sum(4 + count_tokens(m.get("content", ""), model) for m in messages)
+
@@ -0,0 +1,141 @@
+"""
+Service di cache per i grafici renderizzati (PNG matplotlib e SVG dei radar).
+
+La chiave è l'hash di (tipo di grafico, parametri, dati aggregati della sessione):
+se le risposte non cambiano, la stessa richiesta riusa i byte già prodotti e
+l'hash fa anche da ETag, così il browser può ricevere un 304 senza alcun render.
+La cache è un LRU limitato per numero di elementi e per byte totali.
+"""
+from fastapi import Request
+from fastapi.responses import Response
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+import hashlib
+import json
+
+
+# Da incrementare quando cambia il codice di disegno: invalida cache ed ETag già emessi
+RENDER_VERSION = 1
+
+MAX_CACHED_RENDERS = 256
+MAX_CACHED_BYTES = 64 * 1024 * 1024
+
+# Il client deve sempre rivalidare: le risposte possono cambiare in qualsiasi momento
+CACHE_CONTROL = "private, no-cache"
+
+_renders: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+_renders_lock = Lock()
+_cached_bytes = 0
+_stats = {"hits": 0, "misses": 0, "not_modified": 0, "evictions": 0}
+
+
+def render_key(chart_type: str, params: Dict, data: Any) -> str:
+    """Hash deterministico di tipo di grafico, parametri e dati di input"""
+    payload = json.dumps(
+        [RENDER_VERSION, chart_type, params, data],
+        sort_keys=True, separators=(',', ':'), default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _etag(key: str) -> str:
+    return f'"{key[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Confronto debole di If-None-Match (lista separata da virgole, W/ o *)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _get(key: str) -> Optional[Tuple[bytes, str]]:
+    with _renders_lock:
+        entry = _renders.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        _renders.move_to_end(key)
+        _stats["hits"] += 1
+        return entry
+
+
+def _put(key: str, content: bytes, media_type: str) -> None:
+    global _cached_bytes
+    if len(content) > MAX_CACHED_BYTES:
+        return
+    with _renders_lock:
+        previous = _renders.pop(key, None)
+        if previous is not None:
+            _cached_bytes -= len(previous[0])
+        _renders[key] = (content, media_type)
+        _cached_bytes += len(content)
+        while len(_renders) > MAX_CACHED_RENDERS or _cached_bytes > MAX_CACHED_BYTES:
+            _, (evicted, _) = _renders.popitem(last=False)
+            _cached_bytes -= len(evicted)
+            _stats["evictions"] += 1
+
+
+def cached_render(
+    request: Request,
+    chart_type: str,
+    params: Dict,
+    data: Any,
+    render: Callable[[], Union[bytes, str]],
+    media_type: str,
+) -> Response:
+    """
+    Risposta per un grafico: 304 se il client ha già questa versione,
+    altrimenti i byte dalla cache o, al primo uso, quelli prodotti da render().
+    Le eccezioni di render() vengono propagate e nulla viene messo in cache.
+    """
+    key = render_key(chart_type, params, data)
+    etag = _etag(key)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        with _renders_lock:
+            _stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+
+    entry = _get(key)
+    if entry is None:
+        content = render()
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        _put(key, content, media_type)
+    else:
+        content, media_type = entry
+
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+def clear_render_cache() -> None:
+    """Svuota la cache dei grafici"""
+    global _cached_bytes
+    with _renders_lock:
+        _renders.clear()
+        _cached_bytes = 0
+
+
+def render_cache_stats() -> Dict:
+    """Contatori hit/miss/304 e occupazione della cache"""
+    with _renders_lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+            "cached_renders": len(_renders),
+            "cached_bytes": _cached_bytes,
+            "max_cached_renders": MAX_CACHED_RENDERS,
+            "max_cached_bytes": MAX_CACHED_BYTES,
+        }
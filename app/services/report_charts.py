@@ -0,0 +1,564 @@
+"""
+Service per il disegno dei grafici del report PDF (radar e Pareto).
+
+I grafici sono descritti da "spec" (dict serializzabili costruiti da
+PDFReportGenerator) e disegnati sul canvas reportlab da un motore:
+
+- "matplotlib": renderizza un PNG e lo incorpora con drawImage (comportamento storico)
+- "vector": disegna poligoni, griglie ed etichette direttamente con le
+  primitive del canvas (niente rasterizzazione, PDF più leggeri)
+
+Il motore si sceglie con PDFReportGenerator(chart_engine=...) o con la
+variabile d'ambiente PDF_CHART_ENGINE.
+
+Con il motore matplotlib i PNG di un report vengono prodotti tutti insieme
+(prerender) prima di comporre le pagine, in un pool di processi già avviato
+(PDF_CHART_WORKERS processi, default il numero di CPU; 0 o 1 = nel processo
+corrente). Si usa l'API a oggetti (Figure + FigureCanvasAgg, vedi new_figure)
+e non pyplot, che ha uno stato globale condiviso tra i thread.
+"""
+from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+import io
+import math
+import multiprocessing
+import os
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import numpy as np
+
+
+DEFAULT_CHART_ENGINE = os.getenv("PDF_CHART_ENGINE", "matplotlib")
+PDF_CHART_WORKERS = int(os.getenv("PDF_CHART_WORKERS", str(os.cpu_count() or 1)))
+
+RADAR_MAX = 5
+RADAR_RINGS = [1, 2, 3, 4, 5]
+GRID_COLOR = colors.HexColor('#B0B0B0')
+TEXT_COLOR = colors.HexColor('#262626')
+
+
+def _font(weight: Optional[str]) -> str:
+    return 'Helvetica-Bold' if weight == 'bold' else 'Helvetica'
+
+
+# ===============================
+#  MATPLOTLIB (PNG)
+# ===============================
+
+def new_figure(figsize: Tuple[float, float], polar: bool = False) -> Tuple[Figure, Any]:
+    """
+    Figura con un singolo asse, indipendente dallo stato globale di pyplot:
+    si può usare da più thread contemporaneamente e non va chiusa.
+    """
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(projection='polar') if polar else fig.add_subplot()
+    return fig, ax
+
+
+def render_radar_png(spec: Dict) -> bytes:
+    """PNG di un radar descritto da spec (stesso aspetto dei grafici storici)"""
+    size = spec['figsize']
+    fig, ax = new_figure((size, size), polar=True)
+
+    angles = np.linspace(0, 2 * np.pi, len(spec['axes']), endpoint=False).tolist()
+    angles_plot = angles + angles[:1]
+
+    for series in spec['series']:
+        values = list(series['values']) + list(series['values'][:1])
+        ax.plot(angles_plot, values, 'o-', linewidth=spec['line_width'], color=series['color'],
+                label=series.get('label'), markersize=spec['marker_size'])
+        ax.fill(angles_plot, values, alpha=spec['fill_alpha'], color=series['color'])
+
+    ax.set_xticks(angles)
+    ax.set_xticklabels(spec['axes'], size=spec['axis_label_size'], weight=spec.get('axis_label_weight', 'normal'))
+    ax.set_ylim(0, RADAR_MAX)
+    ax.set_yticks(RADAR_RINGS)
+    if spec.get('ring_labels') is not None:
+        ax.set_yticklabels(spec['ring_labels'], size=spec['ring_label_size'])
+    ax.grid(True, alpha=0.3)
+    if spec.get('legend'):
+        ax.legend(loc='upper right', bbox_to_anchor=spec['legend']['anchor'], fontsize=spec['legend']['size'])
+    ax.set_theta_offset(np.pi / 2)  # Primo asse in alto
+    ax.set_aspect('equal')
+    if spec.get('title'):
+        ax.set_title(spec['title'], size=spec['title_size'], weight='bold', y=1.08)
+
+    img_buffer = io.BytesIO()
+    fig.savefig(img_buffer, format='png', dpi=spec['dpi'], bbox_inches='tight')
+    return img_buffer.getvalue()
+
+
+def render_pareto_png(spec: Dict) -> bytes:
+    """PNG dei due grafici Pareto (per processo e per dominio) uno sotto l'altro"""
+    width, height = spec['figsize']
+    fig = Figure(figsize=(width, height))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(len(spec['panels']), 1)
+    bar_width = 0.8
+
+    for ax, panel in zip(np.atleast_1d(axes), spec['panels']):
+        x_pos = np.arange(len(panel['categories']))
+        bottom = np.zeros(len(panel['categories']))
+
+        for stack in panel['stacks']:
+            values = np.asarray(stack['values'], dtype=float)
+            ax.bar(x_pos, values, bar_width, bottom=bottom,
+                   label=stack['label'], color=stack['color'], alpha=0.8)
+            bottom += values
+
+        ax.set_xlabel(panel['xlabel'], fontsize=10, fontweight='bold')
+        ax.set_ylabel('Gap %', fontsize=10, fontweight='bold')
+        ax.set_xticks(x_pos)
+        ax.set_xticklabels(panel['categories'], rotation=45, ha='right', fontsize=8)
+        ax.set_ylim([0, 110])
+
+        ax2 = ax.twinx()
+        ax2.plot(x_pos, panel['cumulative'], 'ro-', linewidth=2, markersize=6, label='Cumulative')
+        ax2.axhline(y=80, color='#10B981', linestyle='--', linewidth=2, label='80%')
+        ax2.set_ylabel('Cumulative %', fontsize=10, fontweight='bold', color='#EF4444')
+        ax2.set_ylim([0, 110])
+        ax2.tick_params(axis='y', labelcolor='#EF4444')
+
+        lines1, labels1 = ax.get_legend_handles_labels()
+        lines2, labels2 = ax2.get_legend_handles_labels()
+        ax.legend(lines1 + lines2, labels1 + labels2, loc='upper left', fontsize=8, ncol=3)
+        ax.set_title(panel['title'], fontsize=11, fontweight='bold')
+
+    fig.tight_layout()
+    img_buffer = io.BytesIO()
+    fig.savefig(img_buffer, format='png', dpi=spec['dpi'], bbox_inches='tight')
+    return img_buffer.getvalue()
+
+
+PNG_RENDERERS = {
+    'radar': render_radar_png,
+    'pareto': render_pareto_png,
+}
+
+
+def render_png(spec: Dict) -> bytes:
+    """PNG di un grafico (funzione di modulo: eseguibile nei processi del pool)"""
+    return PNG_RENDERERS[spec['kind']](spec)
+
+
+# ===============================
+#  POOL DI RENDER
+# ===============================
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = Lock()
+
+
+def _warm_up():
+    """Inizializzatore dei processi del pool: import e cache dei font pronti al primo grafico"""
+    render_png({
+        'kind': 'radar', 'axes': ['a', 'b', 'c'], 'series': [{'values': [1, 2, 3], 'color': '#3B82F6'}],
+        'line_width': 1, 'marker_size': 1, 'fill_alpha': 0.1, 'axis_label_size': 5,
+        'title': 'warm-up', 'title_size': 5, 'figsize': 1, 'dpi': 20,
+    })
+
+
+def set_render_workers(workers: int) -> None:
+    """Dimensione del pool di render per il processo corrente (da chiamare prima del primo uso)"""
+    global PDF_CHART_WORKERS
+    PDF_CHART_WORKERS = workers
+
+
+def get_render_pool(workers: Optional[int] = None) -> Optional[ProcessPoolExecutor]:
+    """
+    Pool di processi condiviso (creato al primo uso). None se il render
+    parallelo è disabilitato o se il processo corrente è daemon (non può
+    avere processi figli).
+    """
+    global _pool
+    workers = PDF_CHART_WORKERS if workers is None else workers
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_warm_up,
+            )
+        return _pool
+
+
+def warm_render_pool(workers: Optional[int] = None) -> None:
+    """Avvia subito tutti i processi del pool (altrimenti partono alla prima richiesta)"""
+    workers = PDF_CHART_WORKERS if workers is None else workers
+    pool = get_render_pool(workers)
+    if pool is not None:
+        list(pool.map(int, range(workers)))
+
+
+def shutdown_render_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def render_charts(specs: List[Dict]) -> List[bytes]:
+    """PNG di più grafici, in parallelo nel pool quando disponibile (stesso ordine di specs)"""
+    pool = get_render_pool() if len(specs) > 1 else None
+    if pool is not None:
+        try:
+            return list(pool.map(render_png, specs))
+        except BrokenProcessPool as e:
+            print(f"⚠️ Pool di render non disponibile, render nel processo corrente: {e}")
+            shutdown_render_pool()
+    return [render_png(spec) for spec in specs]
+
+
+class MatplotlibChartEngine:
+    """Grafici rasterizzati con matplotlib e incorporati come immagini"""
+
+    name = 'matplotlib'
+
+    def render(self, spec: Dict) -> bytes:
+        return spec.get('image') or render_png(spec)
+
+    def prerender(self, specs: List[Dict]) -> None:
+        """Renderizza in parallelo i PNG dei grafici e li salva in spec['image']"""
+        pending = [spec for spec in specs if not spec.get('image')]
+        for spec, image in zip(pending, render_charts(pending)):
+            spec['image'] = image
+
+    def draw(self, c: canvas.Canvas, spec: Dict, x: float, y: float, width: float, height: float, anchor: str = 'c'):
+        img = ImageReader(io.BytesIO(self.render(spec)))
+        c.drawImage(img, x, y, width=width, height=height, preserveAspectRatio=True, anchor=anchor)
+
+
+# ===============================
+#  VETTORIALE (REPORTLAB)
+# ===============================
+
+def _draw_legend(c: canvas.Canvas, items: List[Tuple[str, str]], x: float, top: float, font_size: float,
+                 columns: int = 1, column_width: Optional[float] = None, marker: bool = True):
+    """Legenda con riquadro: items = [(etichetta, colore)]"""
+    if not items:
+        return
+    line_h = font_size * 1.5
+    swatch = font_size * 1.6
+    text_w = max(c.stringWidth(label, 'Helvetica', font_size) for label, _ in items)
+    column_width = column_width or (swatch + font_size * 0.6 + text_w + font_size)
+    rows = math.ceil(len(items) / columns)
+    pad = font_size * 0.5
+
+    c.saveState()
+    c.setStrokeColor(colors.HexColor('#CCCCCC'))
+    c.setFillColor(colors.white, alpha=0.8)
+    c.setLineWidth(0.5)
+    c.roundRect(x, top - rows * line_h - 2 * pad, columns * column_width + pad, rows * line_h + 2 * pad,
+                font_size * 0.3, stroke=1, fill=1)
+
+    c.setFont('Helvetica', font_size)
+    for idx, (label, color) in enumerate(items):
+        col, row = idx % columns, idx // columns
+        lx = x + pad + col * column_width
+        ly = top - pad - (row + 1) * line_h + line_h * 0.35
+        item_color = colors.HexColor(color)
+        if marker:
+            c.setStrokeColor(item_color)
+            c.setLineWidth(font_size * 0.15)
+            c.line(lx, ly + font_size * 0.3, lx + swatch, ly + font_size * 0.3)
+            c.setFillColor(item_color)
+            c.circle(lx + swatch / 2, ly + font_size * 0.3, font_size * 0.25, stroke=0, fill=1)
+        else:
+            c.setFillColor(item_color, alpha=0.8)
+            c.rect(lx, ly, swatch, font_size * 0.7, stroke=0, fill=1)
+        c.setFillColor(TEXT_COLOR)
+        c.drawString(lx + swatch + font_size * 0.4, ly, label)
+    c.restoreState()
+
+
+def _draw_axis_label(c: canvas.Canvas, text: str, x: float, y: float, angle: float, font: str, size: float):
+    """Etichetta di un asse del radar allineata verso l'esterno"""
+    cos_a, sin_a = math.cos(angle), math.sin(angle)
+    baseline = y - size * 0.35
+    if sin_a < -0.3:
+        baseline = y - size * 0.9
+    elif sin_a > 0.3:
+        baseline = y + size * 0.1
+    c.setFont(font, size)
+    if cos_a > 0.2:
+        c.drawString(x, baseline, text)
+    elif cos_a < -0.2:
+        c.drawRightString(x, baseline, text)
+    else:
+        c.drawCentredString(x, baseline, text)
+
+
+def draw_vector_radar(c: canvas.Canvas, spec: Dict, x: float, y: float, width: float, height: float, anchor: str = 'c'):
+    """Radar disegnato con le primitive del canvas nel riquadro (x, y, width, height)"""
+    axes = spec['axes']
+    n = len(axes)
+    if n == 0:
+        return
+
+    side = min(width, height)
+    # Le dimensioni dei font seguono la scala della figura matplotlib equivalente
+    scale = side / (spec['figsize'] * 72)
+    axis_font = _font(spec.get('axis_label_weight'))
+    axis_size = max(spec['axis_label_size'] * scale * 1.25, 4)
+    title_size = max(spec.get('title_size', 9) * scale * 1.25, 5)
+
+    legend = spec.get('legend')
+    legend_items = [(s['label'], s['color']) for s in spec['series'] if s.get('label')] if legend else []
+    legend_size = max(legend['size'] * scale * 1.25, 4) if legend else 0
+    legend_w = 0
+    if legend_items:
+        legend_w = max(c.stringWidth(label, 'Helvetica', legend_size) for label, _ in legend_items) + legend_size * 3.5
+
+    title_lines = spec['title'].split('\n') if spec.get('title') else []
+    title_h = len(title_lines) * title_size * 1.25 + (title_size * 0.6 if title_lines else 0)
+
+    label_w = max(c.stringWidth(a, axis_font, axis_size) for a in axes)
+    margin = max(axis_size * 1.6, min(label_w, side * 0.22))
+    radius = max((min(width - legend_w, height - title_h) - 2 * margin) / 2, side * 0.15)
+
+    # Posizionamento del radar nel riquadro secondo anchor (come drawImage)
+    block_w = 2 * (radius + margin) + legend_w
+    block_h = 2 * (radius + margin) + title_h
+    if 'w' in anchor:
+        left = x
+    elif 'e' in anchor:
+        left = x + width - block_w
+    else:
+        left = x + (width - block_w) / 2
+    if 'n' in anchor:
+        top = y + height
+    elif 's' in anchor:
+        top = y + block_h
+    else:
+        top = y + (height + block_h) / 2
+    cx = left + radius + margin
+    cy = top - title_h - margin - radius
+
+    angles = [math.pi / 2 + 2 * math.pi * i / n for i in range(n)]
+
+    def point(angle, value):
+        r = radius * max(0.0, min(float(value), RADAR_MAX)) / RADAR_MAX
+        return cx + r * math.cos(angle), cy + r * math.sin(angle)
+
+    c.saveState()
+
+    # Griglia: cerchi concentrici e raggi
+    c.setStrokeColor(GRID_COLOR, alpha=0.6)
+    c.setLineWidth(0.4)
+    for ring in RADAR_RINGS:
+        c.circle(cx, cy, radius * ring / RADAR_MAX, stroke=1, fill=0)
+    for angle in angles:
+        c.line(cx, cy, cx + radius * math.cos(angle), cy + radius * math.sin(angle))
+
+    # Etichette degli anelli
+    ring_labels = spec.get('ring_labels')
+    if ring_labels is None:
+        ring_labels = [str(r) for r in RADAR_RINGS]
+    ring_size = max(spec.get('ring_label_size', spec['axis_label_size']) * scale * 1.25, 3.5)
+    ring_angle = math.pi / 2 + math.pi / n if n > 1 else math.pi / 4
+    c.setFillColor(TEXT_COLOR)
+    c.setFont('Helvetica', ring_size)
+    for ring, label in zip(RADAR_RINGS, ring_labels):
+        if label:
+            lx, ly = point(ring_angle, ring)
+            c.drawCentredString(lx, ly - ring_size * 0.35, label)
+
+    # Serie: area semitrasparente, contorno e punti
+    line_width = spec['line_width'] * scale * 1.25
+    marker_r = spec['marker_size'] * scale * 0.6
+    for series in spec['series']:
+        color = colors.HexColor(series['color'])
+        points = [point(a, v) for a, v in zip(angles, series['values'])]
+        if not points:
+            continue
+        path = c.beginPath()
+        path.moveTo(*points[0])
+        for px, py in points[1:]:
+            path.lineTo(px, py)
+        path.close()
+        c.setFillColor(color, alpha=spec['fill_alpha'])
+        c.drawPath(path, stroke=0, fill=1)
+        c.setStrokeColor(color)
+        c.setLineWidth(line_width)
+        c.setLineJoin(1)
+        c.drawPath(path, stroke=1, fill=0)
+        c.setFillColor(color)
+        for px, py in points:
+            c.circle(px, py, marker_r, stroke=0, fill=1)
+
+    # Etichette degli assi
+    c.setFillColor(TEXT_COLOR)
+    for angle, label in zip(angles, axes):
+        lx = cx + (radius + axis_size * 0.6) * math.cos(angle)
+        ly = cy + (radius + axis_size * 0.6) * math.sin(angle)
+        _draw_axis_label(c, label, lx, ly, angle, axis_font, axis_size)
+
+    # Titolo
+    if title_lines:
+        c.setFont('Helvetica-Bold', title_size)
+        for idx, line in enumerate(title_lines):
+            c.drawCentredString(cx, top - (idx + 1) * title_size * 1.2, line)
+
+    c.restoreState()
+
+    if legend_items:
+        _draw_legend(c, legend_items, cx + radius + margin, top - title_h, legend_size)
+
+
+def _draw_pareto_panel(c: canvas.Canvas, panel: Dict, x: float, y: float, width: float, height: float, font_size: float):
+    """Un grafico Pareto: barre impilate, cumulata e soglia 80%"""
+    categories = panel['categories']
+    n = len(categories)
+    if n == 0:
+        return
+
+    tick_size = font_size * 0.8
+    label_w = max(c.stringWidth(cat, 'Helvetica', tick_size) for cat in categories)
+    bottom_margin = label_w * 0.72 + tick_size * 2 + font_size * 1.6
+    left_margin = font_size * 4
+    right_margin = font_size * 4
+    top_margin = font_size * 2
+
+    px, py = x + left_margin, y + bottom_margin
+    pw, ph = width - left_margin - right_margin, height - bottom_margin - top_margin
+    y_max = 110.0
+
+    def to_y(value):
+        return py + ph * float(value) / y_max
+
+    slot = pw / n
+    bar_w = slot * 0.8
+
+    def bar_x(i):
+        return px + slot * i + (slot - bar_w) / 2
+
+    c.saveState()
+
+    # Barre impilate
+    bottoms = [0.0] * n
+    for stack in panel['stacks']:
+        c.setFillColor(colors.HexColor(stack['color']), alpha=0.8)
+        for i, value in enumerate(stack['values']):
+            value = float(value)
+            if value > 0:
+                c.rect(bar_x(i), to_y(bottoms[i]), bar_w, to_y(bottoms[i] + value) - to_y(bottoms[i]), stroke=0, fill=1)
+            bottoms[i] += value
+
+    # Soglia 80% e cumulata
+    c.setStrokeColor(colors.HexColor('#10B981'))
+    c.setLineWidth(1.5)
+    c.setDash(5, 3)
+    c.line(px, to_y(80), px + pw, to_y(80))
+    c.setDash()
+
+    red = colors.HexColor('#EF4444')
+    points = [(px + slot * (i + 0.5), to_y(v)) for i, v in enumerate(panel['cumulative'])]
+    c.setStrokeColor(red)
+    c.setFillColor(red)
+    c.setLineWidth(1.5)
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        c.line(x1, y1, x2, y2)
+    for cx, cy in points:
+        c.circle(cx, cy, font_size * 0.3, stroke=0, fill=1)
+
+    # Assi, tacche ed etichette
+    c.setStrokeColor(TEXT_COLOR)
+    c.setLineWidth(0.6)
+    c.rect(px, py, pw, ph, stroke=1, fill=0)
+    c.setFont('Helvetica', tick_size)
+    for value in range(0, 101, 20):
+        ty = to_y(value)
+        c.setFillColor(TEXT_COLOR)
+        c.line(px - 3, ty, px, ty)
+        c.drawRightString(px - 5, ty - tick_size * 0.35, str(value))
+        c.setFillColor(red)
+        c.line(px + pw, ty, px + pw + 3, ty)
+        c.drawString(px + pw + 5, ty - tick_size * 0.35, str(value))
+
+    c.setFillColor(TEXT_COLOR)
+    for i, category in enumerate(categories):
+        tx = px + slot * (i + 0.5)
+        c.line(tx, py, tx, py - 3)
+        c.saveState()
+        c.translate(tx, py - tick_size * 0.8)
+        c.rotate(45)
+        c.drawRightString(0, -tick_size * 0.7, category)
+        c.restoreState()
+
+    c.setFont('Helvetica-Bold', font_size)
+    c.drawCentredString(px + pw / 2, y + font_size * 0.3, panel['xlabel'])
+    c.drawCentredString(px + pw / 2, py + ph + font_size * 0.6, panel['title'])
+    c.saveState()
+    c.translate(x + font_size * 1.1, py + ph / 2)
+    c.rotate(90)
+    c.drawCentredString(0, 0, 'Gap %')
+    c.restoreState()
+    c.saveState()
+    c.setFillColor(red)
+    c.translate(x + width - font_size * 0.6, py + ph / 2)
+    c.rotate(90)
+    c.drawCentredString(0, 0, 'Cumulative %')
+    c.restoreState()
+
+    c.restoreState()
+
+    legend_items = [(s['label'], s['color']) for s in panel['stacks']]
+    _draw_legend(c, legend_items, px + 4, py + ph - 4, tick_size, columns=3, marker=False)
+
+
+def draw_vector_pareto(c: canvas.Canvas, spec: Dict, x: float, y: float, width: float, height: float, anchor: str = 'c'):
+    """Grafici Pareto impilati verticalmente nel riquadro, stesso rapporto della figura matplotlib"""
+    fig_w, fig_h = spec['figsize']
+    ratio = min(width / fig_w, height / fig_h)
+    draw_w, draw_h = fig_w * ratio, fig_h * ratio
+    left = x if 'w' in anchor else (x + width - draw_w if 'e' in anchor else x + (width - draw_w) / 2)
+    bottom = y + height - draw_h if 'n' in anchor else (y if 's' in anchor else y + (height - draw_h) / 2)
+
+    panels = spec['panels']
+    panel_h = draw_h / len(panels)
+    font_size = max(10 * ratio / 72 * 1.25, 5)
+    for idx, panel in enumerate(panels):
+        panel_y = bottom + draw_h - (idx + 1) * panel_h
+        _draw_pareto_panel(c, panel, left, panel_y, draw_w, panel_h, font_size)
+
+
+VECTOR_RENDERERS = {
+    'radar': draw_vector_radar,
+    'pareto': draw_vector_pareto,
+}
+
+
+class VectorChartEngine:
+    """Grafici disegnati direttamente sul canvas reportlab"""
+
+    name = 'vector'
+
+    def prerender(self, specs: List[Dict]) -> None:
+        """Nessun pre-render: i grafici vettoriali si disegnano direttamente sul canvas"""
+
+    def draw(self, c: canvas.Canvas, spec: Dict, x: float, y: float, width: float, height: float, anchor: str = 'c'):
+        VECTOR_RENDERERS[spec['kind']](c, spec, x, y, width, height, anchor)
+
+
+CHART_ENGINES = {
+    'matplotlib': MatplotlibChartEngine,
+    'vector': VectorChartEngine,
+}
+
+
+def get_chart_engine(name: Optional[str] = None):
+    """Motore grafico per nome ('matplotlib' o 'vector'; default da PDF_CHART_ENGINE)"""
+    name = name or DEFAULT_CHART_ENGINE
+    if name not in CHART_ENGINES:
+        raise ValueError(f"Motore grafico sconosciuto: {name}. Disponibili: {', '.join(CHART_ENGINES)}")
+    return CHART_ENGINES[name]()
+
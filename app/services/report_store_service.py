@@ -0,0 +1,330 @@
+"""
+Service per l'archivio dei report PDF generati (content-addressed).
+
+Ogni PDF è salvato sotto il digest dei dati da cui è prodotto (metadati della
+sessione, risposte, pareto_recommendations, raccomandazioni, contenuto del
+logo e motore grafico PDF_CHART_ENGINE): finché i dati non cambiano il download non rigenera nulla, e il digest
+fa da ETag. Il backend è sostituibile (REPORT_STORE_BACKEND, default "local"
+su filesystem). Ogni PDF archiviato è registrato in session_report_digest:
+le scritture che cambiano i dati chiamano invalidate_session_reports(), che
+elimina i PDF registrati senza ricalcolare il digest delle risposte.
+"""
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func, literal
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from app import models
+from app.services.render_cache_service import etag_matches
+from app.services.report_charts import DEFAULT_CHART_ENGINE
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+
+
+# Da incrementare quando cambia il layout del report: i PDF già archiviati non valgono più
+REPORT_FORMAT_VERSION = 1
+
+REPORT_STORE_BACKEND = os.getenv("REPORT_STORE_BACKEND", "local")
+REPORT_STORE_DIR = Path(os.getenv("REPORT_STORE_DIR", "/var/www/assessment_ai/reports"))
+UPLOADS_ROOT = "/var/www/assessment_ai"
+CHUNK_SIZE = 64 * 1024
+
+# Campi della sessione che finiscono nel report
+SESSION_REPORT_FIELDS = [
+    'azienda_nome', 'settore', 'dimensione', 'referente', 'email', 'effettuato_da',
+    'creato_il', 'logo_path', 'model_name', 'template_version_id', 'data_chiusura',
+    'user_id', 'raccomandazioni', 'pareto_recommendations',
+]
+
+
+# ===============================
+#  BACKEND
+# ===============================
+
+class ReportStore:
+    """Interfaccia dei backend di archiviazione dei report"""
+
+    def open(self, digest: str) -> BinaryIO:
+        """File binario in lettura (FileNotFoundError se il report non c'è)"""
+        raise NotImplementedError
+
+    def put(self, digest: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def put_file(self, digest: str, f: BinaryIO) -> None:
+        """Archivia il contenuto di un file binario (i backend possono copiarlo a blocchi)"""
+        self.put(digest, f.read())
+
+    def delete(self, digest: str) -> None:
+        """Elimina il report (nessun errore se non esiste)"""
+        raise NotImplementedError
+
+    def exists(self, digest: str) -> bool:
+        try:
+            self.open(digest).close()
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class LocalReportStore(ReportStore):
+    """Report salvati come <root>/<2 caratteri>/<digest>.pdf"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.pdf"
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self._path(digest), 'rb')
+
+    def put(self, digest: str, data: bytes) -> None:
+        self.put_file(digest, io.BytesIO(data))
+
+    def put_file(self, digest: str, f: BinaryIO) -> None:
+        path = self._path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Scrittura atomica: un lettore concorrente vede il file completo o nessun file
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                shutil.copyfileobj(f, out, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def delete(self, digest: str) -> None:
+        try:
+            self._path(digest).unlink()
+        except FileNotFoundError:
+            pass
+
+    def exists(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+
+_backends: Dict[str, Callable[[], ReportStore]] = {
+    "local": lambda: LocalReportStore(REPORT_STORE_DIR),
+}
+_store: Optional[ReportStore] = None
+
+
+def register_report_store(name: str, factory: Callable[[], ReportStore]) -> None:
+    """Registra un backend alternativo (selezionabile con REPORT_STORE_BACKEND)"""
+    _backends[name] = factory
+
+
+def get_report_store() -> ReportStore:
+    global _store
+    if _store is None:
+        if REPORT_STORE_BACKEND not in _backends:
+            raise ValueError(f"Backend report store sconosciuto: {REPORT_STORE_BACKEND}")
+        _store = _backends[REPORT_STORE_BACKEND]()
+    return _store
+
+
+# ===============================
+#  DIGEST DEI DATI
+# ===============================
+
+def resolve_logo_path(logo_path: Optional[str]) -> Optional[str]:
+    """Path assoluto del logo (i path salvati sono relativi a /uploads/)"""
+    if logo_path and logo_path.startswith("/uploads/"):
+        return UPLOADS_ROOT + logo_path
+    return logo_path
+
+
+@lru_cache(maxsize=256)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    """sha256 del contenuto (ricalcolato solo se mtime o dimensione cambiano)"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def logo_digest(logo_path: Optional[str]) -> Optional[str]:
+    path = resolve_logo_path(logo_path)
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return _file_digest(path, stat.st_mtime_ns, stat.st_size)
+
+
+def report_digest(session_id, db: Session) -> Optional[str]:
+    """
+    Digest sha256 dei dati usati dal report (None se la sessione non esiste).
+    Le risposte vengono riassunte nel DB con un unico md5(string_agg(...)).
+    """
+    session = db.query(models.AssessmentSession).filter(
+        models.AssessmentSession.id == session_id
+    ).first()
+    if not session:
+        return None
+
+    res = models.AssessmentResult.__table__
+    answer = func.concat_ws(
+        '|', res.c.process, res.c.activity, res.c.category, res.c.dimension,
+        res.c.score, res.c.note, res.c.is_not_applicable,
+    )
+    answers_digest = db.execute(
+        select(func.md5(func.coalesce(
+            func.string_agg(answer, aggregate_order_by(
+                literal('\n'), res.c.process, res.c.activity, res.c.category, res.c.dimension
+            )),
+            '',
+        ))).where(res.c.session_id == session_id)
+    ).scalar()
+
+    payload = json.dumps(
+        [REPORT_FORMAT_VERSION, DEFAULT_CHART_ENGINE, str(session.id), answers_digest, logo_digest(session.logo_path)]
+        + [getattr(session, f) for f in SESSION_REPORT_FIELDS],
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def record_report_digest(session_id, digest: str, db: Session) -> None:
+    """
+    Registra un PDF appena archiviato sotto digest (con commit).
+    Va chiamata DOPO la scrittura nel report store: un'invalidazione concorrente
+    che non trova ancora la riga lascia il digest a quella successiva.
+    """
+    table = models.SessionReportDigest.__table__
+    db.execute(
+        pg_insert(table)
+        .values(session_id=session_id, digest=digest)
+        .on_conflict_do_nothing()
+    )
+    db.commit()
+
+
+def invalidate_session_reports(session_id, db: Session) -> None:
+    """
+    Elimina i report archiviati della sessione e i job conclusi che li referenziano.
+    Legge solo i digest registrati: nessuna lettura delle risposte.
+    """
+    recorded = models.SessionReportDigest.__table__
+    digests = db.execute(
+        delete(recorded).where(recorded.c.session_id == session_id).returning(recorded.c.digest)
+    ).scalars().all()
+
+    store = get_report_store()
+    for digest in digests:
+        try:
+            store.delete(digest)
+        except Exception as e:
+            print(f"⚠️ Report store: impossibile eliminare {digest}: {e}")
+
+    jobs = models.PdfReportJob.__table__
+    db.execute(delete(jobs).where(
+        jobs.c.session_id == session_id,
+        jobs.c.status.in_(('done', 'failed')),
+    ))
+
+
+# ===============================
+#  RISPOSTA HTTP (ETag + Range)
+# ===============================
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Intervallo (start, end) inclusivo di un header Range a intervallo singolo.
+    Solleva ValueError se l'intervallo non è soddisfacibile; None se l'header
+    non è gestito (es. più intervalli) e va servito l'intero file.
+    """
+    unit, _, spec = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise ValueError
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError("Range non valido")
+    if start >= size or end < start:
+        raise ValueError("Range non soddisfacibile")
+    return start, min(end, size - 1)
+
+
+def _iter_file(f: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+    try:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def report_response(request: Request, digest: str, filename: str) -> Optional[Response]:
+    """
+    Risposta HTTP per un report archiviato: 304 se If-None-Match corrisponde,
+    206 per richieste Range, altrimenti 200. None se il report non è archiviato.
+    """
+    etag = f'"{digest}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f"attachment; filename={filename}",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        f = get_report_store().open(digest)
+    except FileNotFoundError:
+        return None
+    size = f.seek(0, io.SEEK_END)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            f.close()
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return StreamingResponse(
+                _iter_file(f, start, end),
+                status_code=206,
+                media_type="application/pdf",
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(end - start + 1),
+                },
+            )
+
+    return StreamingResponse(
+        _iter_file(f, 0, size - 1),
+        media_type="application/pdf",
+        headers={**headers, "Content-Length": str(size)},
+    )
@@ -0,0 +1,109 @@
+"""
+Service per l'ordinamento dei risultati secondo il template (DB o JSON).
+
+Le tabelle di rango vengono calcolate una volta per versione di template
+(o per versione del modello JSON in cache) e riusate tra le richieste: ordinare una
+sessione costa O(n log n) con un lookup O(1) per risultato.
+"""
+from sqlalchemy.orm import Session
+from app import models
+from app.services.model_loader_service import get_model
+from app.services.template_cache_service import get_version_questions, cached_version_value
+from typing import Dict, List, Optional, Tuple
+
+
+# Ordine standard dei domini del modello Polimi
+STANDARD_DOMAINS = ['Governance', 'Monitoring & Control', 'Technology', 'Organization']
+
+UNRANKED_DB = 9999
+UNRANKED_JSON = 999
+
+
+class RankTable:
+    """Ranghi di ordinamento precalcolati per un template"""
+
+    def __init__(
+        self,
+        dimension_rank: Optional[Dict[Tuple, int]] = None,
+        process_rank: Optional[Dict[str, int]] = None,
+        category_rank: Optional[Dict[str, int]] = None,
+        activity_rank: Optional[Dict[Tuple[str, str], Dict[str, int]]] = None,
+    ):
+        # Template DB: (process, activity, category, dimension) -> posizione della domanda
+        self.dimension_rank = dimension_rank
+        # Modello JSON: rango di processo, dominio e attività (per processo/dominio)
+        self.process_rank = process_rank or {}
+        self.category_rank = category_rank or {}
+        self.activity_rank = activity_rank or {}
+
+    @classmethod
+    def from_questions(cls, questions: List) -> "RankTable":
+        """Tabella da domande DB (a parità di chiave vince l'ultima, come prima)"""
+        return cls(dimension_rank={
+            (q.process, q.activity, q.category, q.text): idx
+            for idx, q in enumerate(questions)
+        })
+
+    @classmethod
+    def from_json_model(cls, model_data: List[Dict]) -> "RankTable":
+        """Tabella da modello JSON: processi, domini standard e attività in ordine di comparsa"""
+        process_rank: Dict[str, int] = {}
+        activity_rank: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+        for proc in model_data:
+            proc_name = proc.get('process')
+            process_rank.setdefault(proc_name, len(process_rank))
+
+            for activity in proc.get('activities', []):
+                act_name = activity.get('name')
+                for category in activity.get('categories', {}).keys():
+                    ranks = activity_rank.setdefault((proc_name, category), {})
+                    ranks.setdefault(act_name, len(ranks))
+
+        return cls(
+            process_rank=process_rank,
+            category_rank={cat: idx for idx, cat in enumerate(STANDARD_DOMAINS)},
+            activity_rank=activity_rank,
+        )
+
+    def sort_key(self, result) -> Tuple:
+        if self.dimension_rank is not None:
+            key = (result.process, result.activity, result.category, result.dimension)
+            return (self.dimension_rank.get(key, UNRANKED_DB),)
+
+        return (
+            self.process_rank.get(result.process, UNRANKED_JSON),
+            self.category_rank.get(result.category, UNRANKED_JSON),
+            self.activity_rank.get((result.process, result.category), {}).get(result.activity, UNRANKED_JSON),
+        )
+
+
+def get_db_rank_table(template_version_id, db: Session) -> RankTable:
+    """Tabella di rango di una versione di template (calcolata una volta per versione)"""
+    return cached_version_value(
+        template_version_id, 'rank_table',
+        lambda: RankTable.from_questions(get_version_questions(template_version_id, db))
+    )
+
+
+def get_json_rank_table(model_name: str) -> Optional[RankTable]:
+    """Tabella di rango di un modello JSON (ricalcolata solo se il modello cambia)"""
+    model = get_model(model_name)
+    if model is None:
+        return None
+    return model.derived('rank_table', lambda m: RankTable.from_json_model(m.data))
+
+
+def sort_session_results(session: models.AssessmentSession, results: List, db: Session) -> None:
+    """Ordina in place i risultati di una sessione secondo il suo template"""
+    if session.template_version_id:
+        table = get_db_rank_table(session.template_version_id, db)
+    else:
+        try:
+            table = get_json_rank_table(session.model_name or 'i40_assessment_fto')
+        except Exception as e:
+            print(f"⚠️ Warning: Could not order results from JSON: {e}")
+            return
+
+    if table is not None:
+        results.sort(key=table.sort_key)
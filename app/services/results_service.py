@@ -0,0 +1,126 @@
+"""
+Service per la scrittura dei risultati di assessment.
+Le scritture sono set-based: un solo statement per l'intero payload.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import literal, literal_column, select, func, false
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import models
+from app.services.score_aggregate_service import refresh_session_aggregates
+from typing import Dict, List, Tuple
+from uuid import UUID, uuid4
+
+
+def upsert_assessment_results(session_id: UUID, results: List, db: Session) -> Tuple[int, int]:
+    """
+    Inserisce o aggiorna le risposte di una sessione con un unico
+    INSERT ... ON CONFLICT DO UPDATE.
+
+    Se il payload contiene più volte la stessa risposta vince l'ultima,
+    come avveniva con l'aggiornamento riga per riga.
+    Non esegue il commit: la transazione resta al chiamante.
+
+    Returns:
+        (created, updated)
+    """
+    rows: Dict[tuple, Dict] = {}
+    for r in results:
+        data = r.dict()
+        key = (data['process'], data['activity'], data['category'], data['dimension'])
+        rows[key] = {'id': uuid4(), 'session_id': session_id, **data}
+
+    if not rows:
+        return 0, 0
+
+    table = models.AssessmentResult.__table__
+    stmt = pg_insert(table).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        constraint='uq_assessment_result_answer',
+        set_={
+            'score': stmt.excluded.score,
+            'note': stmt.excluded.note,
+            'is_not_applicable': stmt.excluded.is_not_applicable,
+        },
+    ).returning(literal_column('(xmax = 0)').label('inserted'))
+
+    # xmax = 0 solo per le righe appena inserite, non per quelle aggiornate
+    inserted_flags = db.execute(stmt).scalars().all()
+    created = sum(1 for inserted in inserted_flags if inserted)
+
+    # Aggiorna gli aggregati solo per le coppie (processo, categoria) toccate
+    refresh_session_aggregates(
+        session_id, db, groups={(process, category) for process, _, category, _ in rows}
+    )
+    return created, len(inserted_flags) - created
+
+
+# Colonne valorizzate dalla pre-popolazione di una nuova sessione
+PREPOPULATE_COLUMNS = [
+    'id', 'session_id', 'process', 'activity', 'category', 'dimension',
+    'score', 'note', 'is_not_applicable',
+]
+
+
+def prepopulate_from_template_version(session_id: UUID, template_version_id, db: Session) -> int:
+    """
+    Pre-crea le risposte (score=0) di una sessione con un unico
+    INSERT INTO assessment_result SELECT ... FROM questions WHERE version_id = :v.
+    Nessun oggetto Python per domanda: il lavoro resta tutto nel DB.
+
+    Returns:
+        numero di righe inserite
+    """
+    table = models.AssessmentResult.__table__
+    questions = models.Question.__table__
+
+    source = select(
+        func.gen_random_uuid(),
+        literal(session_id, type_=table.c.session_id.type),
+        func.coalesce(questions.c.process, ''),
+        func.coalesce(questions.c.activity, ''),
+        func.coalesce(questions.c.category, ''),
+        questions.c.text,
+        literal(0),
+        literal(''),
+        false(),
+    ).where(questions.c.version_id == template_version_id)
+
+    # Domande con la stessa chiave producono una sola risposta
+    stmt = pg_insert(table).from_select(PREPOPULATE_COLUMNS, source).on_conflict_do_nothing()
+    inserted = db.execute(stmt).rowcount
+    refresh_session_aggregates(session_id, db)
+    return inserted
+
+
+def prepopulate_from_dimensions(session_id: UUID, dimensions: List[Dict], db: Session) -> int:
+    """
+    Pre-crea le risposte (score=0) di una sessione da una lista di
+    {'process', 'activity', 'category', 'dimension'} con un unico INSERT multi-riga.
+    Usato per i modelli JSON legacy.
+
+    Returns:
+        numero di righe inserite
+    """
+    if not dimensions:
+        return 0
+
+    rows = [
+        {
+            'id': uuid4(),
+            'session_id': session_id,
+            'process': d['process'],
+            'activity': d['activity'],
+            'category': d['category'],
+            'dimension': d['dimension'],
+            'score': 0,
+            'note': '',
+            'is_not_applicable': False,
+        }
+        for d in dimensions
+    ]
+
+    stmt = pg_insert(models.AssessmentResult.__table__).values(rows).on_conflict_do_nothing()
+    inserted = db.execute(stmt).rowcount
+    refresh_session_aggregates(session_id, db)
+    return inserted
+
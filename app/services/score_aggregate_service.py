@@ -0,0 +1,237 @@
+"""
+Service per gli aggregati di punteggio per sessione (tabella session_score_aggregate).
+
+Ogni scrittura su assessment_result ricalcola, nella stessa transazione,
+solo le coppie (processo, categoria) toccate. Le letture analitiche
+lavorano quindi su O(processi x domini) righe invece che su O(risposte).
+
+Uso da riga di comando:
+    python -m app.services.score_aggregate_service backfill [--session ID]
+    python -m app.services.score_aggregate_service check [--session ID]
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func, and_, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import models
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+
+SCORE_LEVELS = range(6)
+
+AGGREGATE_COLUMNS = [
+    'session_id', 'process', 'category', 'score_sum', 'answer_count', 'na_count',
+] + [f'score_{n}_count' for n in SCORE_LEVELS]
+
+VALUE_COLUMNS = AGGREGATE_COLUMNS[3:]
+
+
+def _aggregate_source(*filters):
+    """SELECT che calcola gli aggregati dai risultati grezzi"""
+    res = models.AssessmentResult.__table__
+    applicable = res.c.is_not_applicable.is_(False)
+
+    return select(
+        res.c.session_id,
+        res.c.process,
+        res.c.category,
+        func.coalesce(func.sum(res.c.score).filter(applicable), 0).label('score_sum'),
+        func.count().filter(applicable).label('answer_count'),
+        func.count().filter(res.c.is_not_applicable.is_(True)).label('na_count'),
+        *[
+            func.count().filter(and_(applicable, res.c.score == n)).label(f'score_{n}_count')
+            for n in SCORE_LEVELS
+        ],
+    ).where(*filters).group_by(res.c.session_id, res.c.process, res.c.category)
+
+
+def refresh_session_aggregates(
+    session_id: UUID,
+    db: Session,
+    groups: Optional[Iterable[Tuple[str, str]]] = None
+) -> None:
+    """
+    Ricalcola gli aggregati di una sessione nella transazione corrente.
+
+    Args:
+        groups: coppie (process, category) da ricalcolare; None = tutta la sessione
+
+    Non esegue il commit: va chiamato nella stessa transazione che ha
+    scritto i risultati, così aggregati e risposte restano coerenti.
+    """
+    res = models.AssessmentResult.__table__
+    agg = models.SessionScoreAggregate.__table__
+
+    filters = [res.c.session_id == session_id]
+    if groups is not None:
+        groups = list(set(groups))
+        if not groups:
+            return
+        filters.append(tuple_(res.c.process, res.c.category).in_(groups))
+
+    stmt = pg_insert(agg).from_select(AGGREGATE_COLUMNS, _aggregate_source(*filters))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['session_id', 'process', 'category'],
+        set_={col: stmt.excluded[col] for col in VALUE_COLUMNS},
+    )
+    db.execute(stmt)
+
+
+def delete_session_aggregates(session_id: UUID, db: Session) -> int:
+    """Elimina gli aggregati di una sessione (senza commit)"""
+    agg = models.SessionScoreAggregate.__table__
+    return db.execute(delete(agg).where(agg.c.session_id == session_id)).rowcount
+
+
+def get_session_aggregates(session_id: UUID, db: Session) -> List:
+    """Righe aggregate (process, category, ...) di una sessione, ordinate per processo e categoria"""
+    agg = models.SessionScoreAggregate
+    return (
+        db.query(agg)
+        .filter(agg.session_id == session_id)
+        .order_by(agg.process, agg.category)
+        .all()
+    )
+
+
+def combine_aggregates(rows: List, key: Callable = lambda row: row.process) -> Dict:
+    """
+    Somma le righe aggregate raggruppandole per key(row).
+
+    Returns:
+        {key: {'score_sum', 'answer_count', 'na_count', 'distribution': [n0..n5],
+               'average', 'min_score', 'max_score'}}
+        average/min_score/max_score sono None se non ci sono risposte applicabili.
+    """
+    combined = {}
+    for row in rows:
+        k = key(row)
+        if k not in combined:
+            combined[k] = {
+                'score_sum': 0,
+                'answer_count': 0,
+                'na_count': 0,
+                'distribution': [0] * len(SCORE_LEVELS),
+            }
+        item = combined[k]
+        item['score_sum'] += row.score_sum
+        item['answer_count'] += row.answer_count
+        item['na_count'] += row.na_count
+        for n in SCORE_LEVELS:
+            item['distribution'][n] += getattr(row, f'score_{n}_count')
+
+    for item in combined.values():
+        scored = [n for n in SCORE_LEVELS if item['distribution'][n] > 0]
+        item['average'] = item['score_sum'] / item['answer_count'] if item['answer_count'] else None
+        item['min_score'] = scored[0] if scored else None
+        item['max_score'] = scored[-1] if scored else None
+
+    return combined
+
+
+# ===============================
+#  MANUTENZIONE
+# ===============================
+
+def backfill_score_aggregates(db: Session, session_ids: Optional[List[UUID]] = None) -> int:
+    """
+    Ricostruisce da zero gli aggregati di tutte le sessioni (o di quelle indicate).
+
+    Returns:
+        numero di righe aggregate scritte
+    """
+    res = models.AssessmentResult.__table__
+    agg = models.SessionScoreAggregate.__table__
+
+    delete_stmt = delete(agg)
+    filters = []
+    if session_ids:
+        delete_stmt = delete_stmt.where(agg.c.session_id.in_(session_ids))
+        filters.append(res.c.session_id.in_(session_ids))
+
+    db.execute(delete_stmt)
+    written = db.execute(
+        pg_insert(agg).from_select(AGGREGATE_COLUMNS, _aggregate_source(*filters))
+    ).rowcount
+    db.commit()
+    return written
+
+
+def check_score_aggregates(db: Session, session_id: Optional[UUID] = None) -> List[Dict]:
+    """
+    Confronta gli aggregati salvati con quelli ricalcolati dai risultati grezzi.
+
+    Returns:
+        lista delle differenze: [{'session_id', 'process', 'category', 'expected', 'stored'}]
+        (expected/stored = None se la riga manca da una delle due parti)
+    """
+    res = models.AssessmentResult.__table__
+    agg = models.SessionScoreAggregate.__table__
+
+    filters = [res.c.session_id == session_id] if session_id else []
+    expected = _aggregate_source(*filters).subquery('expected')
+    stored = select(agg)
+    if session_id:
+        stored = stored.where(agg.c.session_id == session_id)
+    stored = stored.subquery('stored')
+
+    join_on = and_(
+        expected.c.session_id == stored.c.session_id,
+        expected.c.process == stored.c.process,
+        expected.c.category == stored.c.category,
+    )
+    differs = or_(*[expected.c[col].is_distinct_from(stored.c[col]) for col in VALUE_COLUMNS])
+
+    stmt = (
+        select(
+            func.coalesce(expected.c.session_id, stored.c.session_id).label('session_id'),
+            func.coalesce(expected.c.process, stored.c.process).label('process'),
+            func.coalesce(expected.c.category, stored.c.category).label('category'),
+            (expected.c.session_id.isnot(None)).label('has_expected'),
+            (stored.c.session_id.isnot(None)).label('has_stored'),
+            *[expected.c[col].label(f'expected_{col}') for col in VALUE_COLUMNS],
+            *[stored.c[col].label(f'stored_{col}') for col in VALUE_COLUMNS],
+        )
+        .select_from(expected.join(stored, join_on, full=True))
+        .where(differs)
+    )
+
+    mismatches = []
+    for row in db.execute(stmt).mappings():
+        mismatches.append({
+            'session_id': str(row['session_id']),
+            'process': row['process'],
+            'category': row['category'],
+            'expected': {col: row[f'expected_{col}'] for col in VALUE_COLUMNS} if row['has_expected'] else None,
+            'stored': {col: row[f'stored_{col}'] for col in VALUE_COLUMNS} if row['has_stored'] else None,
+        })
+    return mismatches
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Manutenzione session_score_aggregate")
+    parser.add_argument("command", choices=["backfill", "check"])
+    parser.add_argument("--session", dest="session_id", default=None, help="Limita ad una sessione")
+    args = parser.parse_args()
+
+    session_id = UUID(args.session_id) if args.session_id else None
+    db = SessionLocal()
+    try:
+        if args.command == "backfill":
+            written = backfill_score_aggregates(db, [session_id] if session_id else None)
+            print(f"✅ Backfill completato: {written} righe aggregate")
+        else:
+            mismatches = check_score_aggregates(db, session_id)
+            if not mismatches:
+                print("✅ Aggregati coerenti con i risultati")
+            else:
+                print(f"❌ {len(mismatches)} aggregati non coerenti:")
+                for m in mismatches:
+                    print(f"  • {m['session_id']} [{m['process']} / {m['category']}] "
+                          f"atteso={m['expected']} salvato={m['stored']}")
+                raise SystemExit(1)
+    finally:
+        db.close()
@@ -0,0 +1,293 @@
+"""
+Service di calcolo punteggi condiviso da router, calcoli e generatore PDF.
+
+Le risposte di una sessione vengono caricate una sola volta e ridotte,
+con un'unica passata NumPy, a matrici processo x dominio:
+somma score, risposte applicabili, N/A, distribuzione 0-5 e
+"media delle medie delle righe". Statistiche, radar e Pareto sono
+calcolati da queste matrici senza riscandire le risposte.
+"""
+from sqlalchemy.orm import Session
+from app import models
+from app.services.score_aggregate_service import get_session_aggregates
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+import numpy as np
+
+
+MAX_SCORE = 5.0
+SCORE_LEVELS = 6
+
+
+def _field(row, name: str, default=None):
+    """Legge un campo sia da oggetti ORM/Row che da dict"""
+    if isinstance(row, dict):
+        return row.get(name, default)
+    return getattr(row, name, default)
+
+
+def _encode(values: Iterable) -> Tuple[List, np.ndarray]:
+    """Codifica i valori in interi (ordine di prima comparsa)"""
+    labels: Dict = {}
+    codes = [labels.setdefault(v, len(labels)) for v in values]
+    return list(labels), np.asarray(codes, dtype=np.intp)
+
+
+class SessionScores:
+    """Punteggi di una sessione in forma di matrici processo x dominio"""
+
+    def __init__(
+        self,
+        processes: List[str],
+        categories: List[str],
+        score_sum: np.ndarray,
+        answer_count: np.ndarray,
+        na_count: np.ndarray,
+        distribution: np.ndarray,
+        row_avg_sum: Optional[np.ndarray] = None,
+        row_count: Optional[np.ndarray] = None,
+    ):
+        self.processes = processes
+        self.categories = categories
+        self.process_index = {p: i for i, p in enumerate(processes)}
+        self.category_index = {c: i for i, c in enumerate(categories)}
+        self.score_sum = score_sum            # [P, D] somma score applicabili
+        self.answer_count = answer_count      # [P, D] risposte applicabili
+        self.na_count = na_count              # [P, D] risposte non applicabili
+        self.distribution = distribution      # [P, D, 6] conteggi score 0-5
+        self.row_avg_sum = row_avg_sum        # [P, D] somma delle medie di riga (attività)
+        self.row_count = row_count            # [P, D] righe (attività) con almeno uno score
+
+    # ------------------------------------------------------------------
+    # Caricamento
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_results(cls, results: Iterable) -> "SessionScores":
+        """
+        Costruisce le matrici dalle singole risposte (ORM, Row o dict con
+        process, category, activity, score, is_not_applicable).
+        Le risposte N/A o senza score sono escluse dalle medie.
+        """
+        results = list(results)
+        processes, p = _encode(_field(r, 'process') for r in results)
+        categories, d = _encode(_field(r, 'category') for r in results)
+        activities, a = _encode(_field(r, 'activity') for r in results)
+        scores = np.array(
+            [np.nan if _field(r, 'score') is None else _field(r, 'score') for r in results],
+            dtype=float,
+        )
+        na = np.array([bool(_field(r, 'is_not_applicable', False)) for r in results], dtype=bool)
+
+        n_cells = len(processes) * len(categories)
+        shape = (len(processes), len(categories))
+        cell = p * len(categories) + d
+        valid = ~na & ~np.isnan(scores)
+        valid_cell, valid_scores = cell[valid], scores[valid]
+
+        score_sum = np.bincount(valid_cell, weights=valid_scores, minlength=n_cells).reshape(shape)
+        answer_count = np.bincount(valid_cell, minlength=n_cells).reshape(shape)
+        na_count = np.bincount(cell[na], minlength=n_cells).reshape(shape)
+
+        # Distribuzione: solo score interi 0-5
+        levels = np.isin(valid_scores, np.arange(SCORE_LEVELS))
+        distribution = np.bincount(
+            valid_cell[levels] * SCORE_LEVELS + valid_scores[levels].astype(np.intp),
+            minlength=n_cells * SCORE_LEVELS,
+        ).reshape(shape + (SCORE_LEVELS,))
+
+        # Media delle medie delle righe: prima per (cella, attività), poi per cella
+        n_activities = max(len(activities), 1)
+        row_keys, row_of = np.unique(valid_cell * n_activities + a[valid], return_inverse=True)
+        row_of = row_of.reshape(-1)
+        row_avg = (
+            np.bincount(row_of, weights=valid_scores, minlength=len(row_keys))
+            / np.maximum(np.bincount(row_of, minlength=len(row_keys)), 1)
+        )
+        row_cell = row_keys // n_activities
+        row_avg_sum = np.bincount(row_cell, weights=row_avg, minlength=n_cells).reshape(shape)
+        row_count = np.bincount(row_cell, minlength=n_cells).reshape(shape)
+
+        return cls(processes, categories, score_sum, answer_count, na_count, distribution,
+                   row_avg_sum, row_count)
+
+    @classmethod
+    def from_aggregates(cls, aggregates: Iterable) -> "SessionScores":
+        """Costruisce le matrici dalle righe di session_score_aggregate (senza medie di riga)"""
+        aggregates = list(aggregates)
+        processes, p = _encode(row.process for row in aggregates)
+        categories, d = _encode(row.category for row in aggregates)
+        shape = (len(processes), len(categories))
+
+        score_sum = np.zeros(shape)
+        answer_count = np.zeros(shape, dtype=np.int64)
+        na_count = np.zeros(shape, dtype=np.int64)
+        distribution = np.zeros(shape + (SCORE_LEVELS,), dtype=np.int64)
+
+        if aggregates:
+            score_sum[p, d] = [row.score_sum for row in aggregates]
+            answer_count[p, d] = [row.answer_count for row in aggregates]
+            na_count[p, d] = [row.na_count for row in aggregates]
+            distribution[p, d] = [
+                [getattr(row, f'score_{n}_count') for n in range(SCORE_LEVELS)] for row in aggregates
+            ]
+
+        return cls(processes, categories, score_sum, answer_count, na_count, distribution)
+
+    @classmethod
+    def load(cls, session_id: UUID, db: Session) -> "SessionScores":
+        """Matrici di una sessione lette dagli aggregati (una query, O(processi x domini))"""
+        return cls.from_aggregates(get_session_aggregates(session_id, db))
+
+    @classmethod
+    def load_results(cls, session_id: UUID, db: Session) -> "SessionScores":
+        """Matrici di una sessione calcolate dalle risposte (serve per le medie di riga)"""
+        res = models.AssessmentResult
+        rows = (
+            db.query(res.process, res.category, res.activity, res.score, res.is_not_applicable)
+            .filter(res.session_id == session_id)
+            .all()
+        )
+        return cls.from_results(rows)
+
+    # ------------------------------------------------------------------
+    # Statistiche
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _summary(score_sum: float, answer_count: int, na_count: int, distribution: np.ndarray) -> Dict:
+        scored = np.flatnonzero(distribution)
+        score_sum = float(score_sum)
+        return {
+            # score interi -> somma intera, come nei calcoli originali
+            'score_sum': int(score_sum) if score_sum.is_integer() else score_sum,
+            'answer_count': int(answer_count),
+            'na_count': int(na_count),
+            'distribution': [int(n) for n in distribution],
+            'average': score_sum / int(answer_count) if answer_count else None,
+            'min_score': int(scored[0]) if len(scored) else None,
+            'max_score': int(scored[-1]) if len(scored) else None,
+        }
+
+    def totals(self) -> Dict:
+        """Statistiche dell'intera sessione"""
+        return self._summary(
+            self.score_sum.sum(), self.answer_count.sum(), self.na_count.sum(),
+            self.distribution.sum(axis=(0, 1)),
+        )
+
+    def by_process(self) -> Dict[str, Dict]:
+        """Statistiche per processo (stesso formato di totals)"""
+        score_sum, answers, na = self.score_sum.sum(axis=1), self.answer_count.sum(axis=1), self.na_count.sum(axis=1)
+        distribution = self.distribution.sum(axis=1)
+        return {
+            proc: self._summary(score_sum[i], answers[i], na[i], distribution[i])
+            for i, proc in enumerate(self.processes)
+        }
+
+    def by_category(self) -> Dict[str, Dict]:
+        """Statistiche per dominio (stesso formato di totals)"""
+        score_sum, answers, na = self.score_sum.sum(axis=0), self.answer_count.sum(axis=0), self.na_count.sum(axis=0)
+        distribution = self.distribution.sum(axis=0)
+        return {
+            cat: self._summary(score_sum[j], answers[j], na[j], distribution[j])
+            for j, cat in enumerate(self.categories)
+        }
+
+    def by_cell(self) -> Dict[Tuple[str, str], Dict]:
+        """Statistiche per coppia (processo, dominio) con almeno una risposta"""
+        cells = {}
+        for i, j in zip(*np.nonzero(self.answer_count + self.na_count)):
+            cells[(self.processes[i], self.categories[j])] = self._summary(
+                self.score_sum[i, j], self.answer_count[i, j], self.na_count[i, j], self.distribution[i, j]
+            )
+        return cells
+
+    # ------------------------------------------------------------------
+    # Matrici per radar e Pareto
+    # ------------------------------------------------------------------
+
+    def _select(self, matrix: np.ndarray, processes: Optional[List[str]], categories: Optional[List[str]],
+                fill=0) -> np.ndarray:
+        """Riordina/estende una matrice [P, D] secondo le liste richieste (mancanti = fill)"""
+        processes = self.processes if processes is None else processes
+        categories = self.categories if categories is None else categories
+        rows = np.array([self.process_index.get(p, -1) for p in processes], dtype=np.intp)
+        cols = np.array([self.category_index.get(c, -1) for c in categories], dtype=np.intp)
+
+        selected = np.full((len(rows), len(cols)), fill, dtype=float)
+        ok_rows, ok_cols = rows >= 0, cols >= 0
+        if ok_rows.any() and ok_cols.any():
+            selected[np.ix_(ok_rows, ok_cols)] = matrix[np.ix_(rows[ok_rows], cols[ok_cols])]
+        return selected
+
+    def average_matrix(self, processes: Optional[List[str]] = None,
+                       categories: Optional[List[str]] = None) -> np.ndarray:
+        """Media score applicabili [processi, domini]; NaN dove non ci sono risposte"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            averages = np.where(self.answer_count > 0, self.score_sum / np.maximum(self.answer_count, 1), np.nan)
+        return self._select(averages, processes, categories, fill=np.nan)
+
+    def percentage_matrix(self, processes: Optional[List[str]] = None,
+                          categories: Optional[List[str]] = None) -> np.ndarray:
+        """Score ottenuto / score massimo in % [processi, domini]; 0 dove non ci sono risposte"""
+        max_score = self.answer_count * MAX_SCORE
+        percentages = np.where(max_score > 0, self.score_sum / np.maximum(max_score, 1) * 100, 0.0)
+        return self._select(percentages, processes, categories, fill=0.0)
+
+    def row_average_matrix(self, processes: Optional[List[str]] = None,
+                           categories: Optional[List[str]] = None) -> np.ndarray:
+        """Media delle medie delle righe (attività) [processi, domini]; NaN dove non ci sono risposte"""
+        if self.row_avg_sum is None:
+            raise ValueError("Medie di riga non disponibili: usare SessionScores.from_results")
+        averages = np.where(self.row_count > 0, self.row_avg_sum / np.maximum(self.row_count, 1), np.nan)
+        return self._select(averages, processes, categories, fill=np.nan)
+
+    def pareto(self, processes: Optional[List[str]] = None,
+               categories: Optional[List[str]] = None) -> Dict:
+        """
+        Analisi Pareto (formula Enterprise Assessment) in forma vettoriale.
+
+        gap cella = 5 - media cella (0 se la cella non ha risposte),
+        normalizzato per numero di processi (vista processi) o di domini (vista domini).
+
+        Returns:
+            {
+                'processes', 'categories',
+                'process_gap': [P] gap normalizzato per processo,
+                'process_pct': [P] % sul totale,
+                'process_cells_pct': [P, D] contributo % di ogni dominio,
+                'total_process_gap': float,
+                'category_gap', 'category_pct': [D],
+                'category_cells_pct': [D, P] contributo % di ogni processo,
+                'total_category_gap': float
+            }
+        """
+        processes = list(self.processes if processes is None else processes)
+        categories = list(self.categories if categories is None else categories)
+        averages = self.average_matrix(processes, categories)
+        gaps = np.where(np.isnan(averages), 0.0, MAX_SCORE - averages)
+
+        def _view(cells: np.ndarray, divisor: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+            normalized = cells / divisor if divisor else cells
+            per_item = normalized.sum(axis=1)
+            total = float(per_item.sum())
+            scale = 100.0 / total if total > 0 else 0.0
+            return per_item, per_item * scale, normalized * scale, total
+
+        process_gap, process_pct, process_cells, total_process = _view(gaps, len(processes))
+        category_gap, category_pct, category_cells, total_category = _view(gaps.T, len(categories))
+
+        return {
+            'processes': processes,
+            'categories': categories,
+            'process_gap': process_gap,
+            'process_pct': process_pct,
+            'process_cells_pct': process_cells,
+            'total_process_gap': total_process,
+            'category_gap': category_gap,
+            'category_pct': category_pct,
+            'category_cells_pct': category_cells,
+            'total_category_gap': total_category,
+        }
+
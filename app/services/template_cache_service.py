@@ -0,0 +1,99 @@
+"""
+Service di cache per le versioni di template (domande, strutture derivate, payload).
+
+Una versione referenziata dalle sessioni è di fatto immutabile: domande,
+liste processi/domini, tabella di ordinamento e payload di
+GET /versions/{id} vengono calcolati una volta e riusati.
+La cache è un LRU limitato per numero di versioni e viene invalidata
+esplicitamente dai mutatori di template_service.
+"""
+from sqlalchemy.orm import Session
+from app import models
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from typing import Any, Callable, Dict, Tuple
+
+
+MAX_CACHED_VERSIONS = 32
+
+# Copia in sola lettura di una Question, indipendente dalla sessione SQLAlchemy
+QuestionSnapshot = namedtuple('QuestionSnapshot', [
+    'id', 'version_id', 'domain_id', 'code', 'text', 'help_text',
+    'process', 'activity', 'category', 'dimension', 'order', 'max_score',
+])
+
+_versions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_versions_lock = Lock()
+_generation = 0  # incrementata ad ogni invalidazione
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def cached_version_value(template_version_id, key: str, build: Callable[[], Any]) -> Any:
+    """
+    Valore `key` della versione, calcolato con build() al primo uso.
+    None non viene messo in cache (es. versione inesistente).
+    """
+    global _generation
+    version_key = str(template_version_id)
+
+    with _versions_lock:
+        entry = _versions.get(version_key)
+        if entry is not None and key in entry:
+            _versions.move_to_end(version_key)
+            _stats["hits"] += 1
+            return entry[key]
+        _stats["misses"] += 1
+        generation = _generation
+
+    value = build()
+    if value is None:
+        return None
+
+    with _versions_lock:
+        # Se nel frattempo c'è stata un'invalidazione il valore può essere vecchio
+        if generation == _generation:
+            _versions.setdefault(version_key, {})[key] = value
+            _versions.move_to_end(version_key)
+            while len(_versions) > MAX_CACHED_VERSIONS:
+                _versions.popitem(last=False)
+    return value
+
+
+def invalidate_template_version(template_version_id=None) -> None:
+    """Scarta tutto ciò che è in cache per una versione (tutte se None)"""
+    global _generation
+    with _versions_lock:
+        _generation += 1
+        _stats["invalidations"] += 1
+        if template_version_id is None:
+            _versions.clear()
+        else:
+            _versions.pop(str(template_version_id), None)
+
+
+def template_cache_stats() -> Dict:
+    """Contatori hit/miss e versioni in cache"""
+    with _versions_lock:
+        return {
+            **_stats,
+            "cached_versions": len(_versions),
+            "max_cached_versions": MAX_CACHED_VERSIONS,
+        }
+
+
+def get_version_questions(template_version_id, db: Session) -> Tuple[QuestionSnapshot, ...]:
+    """Domande di una versione (stessa query di prima, eseguita solo al primo uso)"""
+    def _load():
+        questions = db.query(models.Question).filter(
+            models.Question.version_id == template_version_id
+        ).all()
+        return tuple(
+            QuestionSnapshot(
+                id=q.id, version_id=q.version_id, domain_id=q.domain_id, code=q.code,
+                text=q.text, help_text=q.help_text, process=q.process, activity=q.activity,
+                category=q.category, dimension=q.dimension, order=q.order, max_score=q.max_score,
+            )
+            for q in questions
+        )
+
+    return cached_version_value(template_version_id, 'questions', _load)
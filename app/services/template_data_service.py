@@ -4,6 +4,8 @@ Sostituisce la lettura da JSON per le nuove sessioni.
 """
 from sqlalchemy.orm import Session
 from app import models
+from app.services.model_loader_service import get_model
+from app.services.template_cache_service import get_version_questions, cached_version_value
 from typing import List, Dict, Set
 from uuid import UUID
 
@@ -19,35 +21,33 @@ def get_session_data_source(session: models.AssessmentSession, db: Session) -> d
             'model_name': str | None,
             'processes': List[str],
             'domains': List[str],
-            'questions': List[Question] (solo se source='db')
+            'questions': Tuple[QuestionSnapshot] (solo se source='db')
         }
     """
     if session.template_version_id:
-        # NUOVO SISTEMA: Leggi dal DB
-        questions = db.query(models.Question).filter(
-            models.Question.version_id == session.template_version_id
-        ).all()
+        # NUOVO SISTEMA: Leggi dal DB (versione in cache, query solo al primo uso)
+        version_id = session.template_version_id
+        questions = get_version_questions(version_id, db)
         
-        processes = sorted(list(set([q.process for q in questions if q.process])))
-        domains = sorted(list(set([q.category for q in questions if q.category])))
+        processes, domains = cached_version_value(version_id, 'processes_domains', lambda: (
+            tuple(sorted(set(q.process for q in questions if q.process))),
+            tuple(sorted(set(q.category for q in questions if q.category))),
+        ))
         
         return {
             'source': 'db',
-            'template_version_id': session.template_version_id,
+            'template_version_id': version_id,
             'model_name': None,
-            'processes': processes,
-            'domains': domains,
+            'processes': list(processes),
+            'domains': list(domains),
             'questions': questions
         }
     else:
-        # VECCHIO SISTEMA: Usa JSON
-        import json
-        from pathlib import Path
-        
+        # VECCHIO SISTEMA: Usa JSON (modello parsato in cache)
         model_name = session.model_name or 'i40_assessment_fto'
-        model_path = Path(f"frontend/public/{model_name}.json")
+        model = get_model(model_name)
         
-        if not model_path.exists():
+        if model is None:
             return {
                 'source': 'json',
                 'template_version_id': None,
@@ -57,10 +57,7 @@ def get_session_data_source(session: models.AssessmentSession, db: Session) -> d
                 'questions': []
             }
         
-        with open(model_path, 'r', encoding='utf-8') as f:
-            model_data = json.load(f)
-        
-        processes = [p['process'] for p in model_data]
+        processes = list(model.processes)
         # Domini standard del modello Polimi
         domains = ['Governance', 'Monitoring & Control', 'Technology', 'Organization']
         
@@ -102,29 +99,8 @@ def get_all_dimensions_for_session(session: models.AssessmentSession, db: Sessio
         return dimensions
     else:
         # Leggi da JSON (vecchio sistema)
-        import json
-        from pathlib import Path
-        
-        model_name = data_source['model_name']
-        model_path = Path(f"frontend/public/{model_name}.json")
-        
-        if not model_path.exists():
+        model = get_model(data_source['model_name'])
+        if model is None:
             return []
         
-        with open(model_path, 'r', encoding='utf-8') as f:
-            model_data = json.load(f)
-        
-        dimensions = []
-        for process_data in model_data:
-            process_name = process_data.get('process', '')
-            for activity in process_data.get('activities', []):
-                activity_name = activity.get('name', '')
-                for category_name, dims in activity.get('categories', {}).items():
-                    for dimension_name in dims.keys():
-                        dimensions.append({
-                            'process': process_name,
-                            'activity': activity_name,
-                            'category': category_name,
-                            'dimension': dimension_name
-                        })
-        return dimensions
+        return [dict(d) for d in model.dimensions]
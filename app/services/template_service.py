@@ -1,9 +1,11 @@
+import json
 import re
 from typing import Optional
 
 from sqlalchemy.orm import Session, joinedload
 
 from app import models
+from app.services.template_cache_service import cached_version_value, invalidate_template_version
 
 
 # ===============================
@@ -128,13 +130,28 @@ def create_template_version(
                 db.add(new_q)
         db.commit()
 
+    invalidate_template_version(new_version.id)
     return new_version
 
 
 def get_template_version_full(db: Session, version_id: str):
     """
     Ritorna la versione con domini + domande già caricati.
+    Il risultato è in cache per versione: non va modificato dal chiamante.
     """
+    return cached_version_value(version_id, 'full', lambda: _build_template_version_full(db, version_id))
+
+
+def get_template_version_full_json(db: Session, version_id: str) -> Optional[bytes]:
+    """Come get_template_version_full, ma già serializzato in JSON (in cache)"""
+    def _serialize():
+        version = get_template_version_full(db, version_id)
+        return json.dumps(version, ensure_ascii=False).encode('utf-8') if version else None
+
+    return cached_version_value(version_id, 'full_json', _serialize)
+
+
+def _build_template_version_full(db: Session, version_id: str):
     from sqlalchemy.orm import joinedload
     
     # Carica version con template_domains e i loro domini
@@ -237,6 +254,7 @@ def add_domain_to_version(
     db.add(td)
     db.commit()
     db.refresh(td)
+    invalidate_template_version(template_version_id)
     return td
 
 
@@ -261,6 +279,7 @@ def update_template_domain(
 
     db.commit()
     db.refresh(td)
+    invalidate_template_version(td.version_id)
     return td
 
 
@@ -301,6 +320,7 @@ def add_question_to_template_domain(
     db.add(q)
     db.commit()
     db.refresh(q)
+    invalidate_template_version(td.version_id)
     return q
 
 
@@ -316,4 +336,5 @@ def deactivate_question(db: Session, question_id: str):
     q.is_active = False
     db.commit()
     db.refresh(q)
+    invalidate_template_version(q.version_id)
     return q
@@ -0,0 +1,43 @@
+"""
+Streaming SSE contro il server finto locale: il primo frammento arriva
+prima della risposta completa non in streaming, con lo stesso testo.
+"""
+from app.services import llm_cache_service, llm_gateway
+from app.services.ai_stream_service import completion_events
+import asyncio
+import json
+import time
+
+
+WORDS = 200
+TOKEN_DELAY = 0.005
+
+
+def test_stream_first_token_before_blocking_reply(fake_llm, monkeypatch):
+    fake_llm(reply=" ".join(f"parola{i}" for i in range(WORDS)), token_delay=TOKEN_DELAY)
+    monkeypatch.setattr(llm_cache_service, "LLM_CACHE_ENABLED", False)    # si misura la generazione
+    messages = [{"role": "user", "content": "raccomandazioni"}]
+
+    async def run():
+        start = time.perf_counter()
+        text = await llm_gateway.chat_completion(messages, model="fake")
+        blocking = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first_token, streamed, done = None, [], None
+        async for event in completion_events(messages, model="fake"):
+            name, data = event.split("\n", 1)
+            payload = json.loads(data.split("data: ", 1)[1])
+            if name == "event: token":
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                streamed.append(payload["text"])
+            elif name == "event: done":
+                done = payload
+        return text, blocking, first_token, "".join(streamed), done
+
+    text, blocking, first_token, streamed, done = asyncio.run(run())
+    assert blocking >= WORDS * TOKEN_DELAY
+    assert first_token < blocking / 4
+    assert streamed == text
+    assert done == {"length": len(text), "saved": False, "model_used": "fake", "cached": False}
@@ -0,0 +1,93 @@
+"""
+Analisi delle interviste per blocchi: un blocco che fallisce (errore AI di
+qualunque tipo o risposta non valida) finisce in failed_chunks senza
+interrompere gli altri; nelle risposte si scartano solo le voci non valide
+(anche punteggi o confidenze non finiti).
+"""
+from app.services import interview_analysis_service
+from app.services.interview_analysis_service import interview_chunks, iter_interview_analysis, parse_chunk_response
+from app.services.model_loader_service import LoadedModel
+import asyncio
+import json
+import pytest
+
+
+class BadRequestError(Exception):
+    """Come openai.BadRequestError: non è un LLMError né un ValueError"""
+
+
+MODEL = LoadedModel("test", [
+    {"process": process, "activities": [
+        {"name": "Attività", "categories": {"Governance": {f"{process} domanda {d}": {} for d in range(2)}}},
+    ]}
+    for process in ("ACQUISTI", "VENDITE", "PRODUZIONE")
+], (0, 0))
+
+
+def _run(monkeypatch, reply):
+    async def fake_completion(messages, **params):
+        return reply(messages[-1]["content"])
+
+    monkeypatch.setattr(interview_analysis_service, "cached_chat_completion", fake_completion)
+
+    async def collect():
+        return [event async for event in iter_interview_analysis(MODEL, "trascrizione")]
+
+    return asyncio.run(collect())
+
+
+def _answer_all(prompt):
+    chunk = next(c for c in interview_chunks(MODEL) if f"PROCESSO: {c.process}\n" in prompt)
+    if chunk.process == "VENDITE":
+        raise BadRequestError("context_length_exceeded")
+    if chunk.process == "PRODUZIONE":
+        return "non è JSON"
+    return json.dumps({"results": [{"id": i, "score": 4, "confidence": 0.9} for i, _ in chunk.items]})
+
+
+def test_failed_chunks_do_not_stop_the_analysis(monkeypatch):
+    events = _run(monkeypatch, _answer_all)
+    done = events[-1]
+
+    assert done["type"] == "done"
+    assert [e["type"] for e in events[:-1]] == ["progress"] * 3
+    assert done["answered"] == 2 and done["missing"] == 4
+    assert {r["process"] for r in done["results"]} == {"ACQUISTI"}
+
+    errors = {f["process"]: f["error"] for f in done["failed_chunks"]}
+    assert set(errors) == {"VENDITE", "PRODUZIONE"}
+    assert "BadRequestError" in errors["VENDITE"]
+    assert errors["PRODUZIONE"].startswith("Risposta AI non valida")
+
+
+def test_cancellation_is_not_recorded_as_chunk_failure(monkeypatch):
+    def cancelled(prompt):
+        raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        _run(monkeypatch, cancelled)
+
+
+def test_non_finite_values_drop_only_their_item():
+    chunk = interview_chunks(MODEL)[0]
+    first, second = [i for i, _ in chunk.items]
+    text = (
+        '{"results": ['
+        f'{{"id": {first}, "score": 3, "confidence": NaN}},'
+        f'{{"id": {second}, "score": 2, "confidence": Infinity}},'
+        f'{{"id": {first + 100}, "score": 1}}'
+        ']}'
+    )
+    results, _ = parse_chunk_response(chunk, text)
+    assert {i: (r["score"], r["confidence"]) for i, r in results.items()} == {first: (3, None), second: (2, None)}
+
+    for raw_score in ('"Infinity"', "1e999", "-1e999", "NaN", "1" + "0" * 400):
+        text = (
+            '{"results": ['
+            f'{{"id": {first}, "score": {raw_score}, "confidence": 0.5}},'
+            f'{{"id": {second}, "score": 4, "confidence": 0.9}}'
+            ']}'
+        )
+        results, warnings = parse_chunk_response(chunk, text)
+        assert list(results) == [second], raw_score
+        assert len(warnings) == 1 and warnings[0].startswith(f"id {first}: punteggio non valido")
@@ -0,0 +1,110 @@
+"""
+Gateway LLM contro il server finto locale (fixture fake_llm): retry,
+concorrenza, streaming e circuit breaker (con una sola prova in half-open).
+"""
+from app.services import llm_gateway
+from app.services.llm_gateway import CircuitBreaker, LLMUnavailable, chat_completion, stream_chat_completion
+import asyncio
+import pytest
+
+
+def _ask(content, **kwargs):
+    return chat_completion([{"role": "user", "content": content}], model="fake", **kwargs)
+
+
+def test_retries_server_errors(fake_llm):
+    _, counter = fake_llm(fail_first=2)
+    assert asyncio.run(_ask("ciao")) == "eco: ciao"
+    assert counter["requests"] == 3
+    assert llm_gateway._breaker.state()["state"] == "closed"
+
+
+def test_concurrent_calls(fake_llm):
+    fake_llm()
+
+    async def run():
+        return await asyncio.gather(*[_ask(str(i)) for i in range(20)])
+
+    assert asyncio.run(run()) == [f"eco: {i}" for i in range(20)]
+
+
+def test_stream_reassembles_reply_and_usage(fake_llm):
+    fake_llm()
+    usage = {}
+
+    async def run():
+        return [c async for c in stream_chat_completion(
+            [{"role": "user", "content": "a b c"}], model="fake", usage=usage
+        )]
+
+    chunks = asyncio.run(run())
+    assert len(chunks) == 4 and "".join(chunks) == "eco: a b c"
+    assert usage == {"prompt_tokens": 3, "completion_tokens": 4}
+
+
+def test_breaker_opens_after_threshold(fake_llm, monkeypatch):
+    server, _ = fake_llm()
+    server.shutdown()
+    server.server_close()
+    monkeypatch.setattr(llm_gateway, "LLM_MAX_RETRIES", 1)
+
+    async def run():
+        failures = 0
+        for _ in range(3):
+            try:
+                await _ask("x", timeout=1)
+            except LLMUnavailable:
+                failures += 1
+        return failures
+
+    assert asyncio.run(run()) == 3
+    assert llm_gateway._breaker.state()["state"] == "open"
+
+
+def test_half_open_allows_single_probe():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+
+    assert breaker.acquire() == "probe"
+    assert breaker.acquire() is None
+    assert not breaker.allow()
+
+    # Prova fallita: circuito riaperto, la prova successiva può partire
+    breaker.record_failure()
+    breaker.release_probe()
+    assert breaker.acquire() == "probe"
+
+    breaker.record_success()
+    breaker.release_probe()
+    assert breaker.acquire() == "closed"
+    assert breaker.acquire() == "closed"
+
+
+def test_half_open_concurrent_calls_send_one_probe(fake_llm, monkeypatch):
+    _, counter = fake_llm(token_delay=0.05)
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    monkeypatch.setattr(llm_gateway, "_breaker", breaker)
+
+    async def run():
+        return await asyncio.gather(*[_ask(str(i)) for i in range(5)], return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, str) for r in results) == 1
+    assert sum(isinstance(r, LLMUnavailable) for r in results) == 4
+    assert counter["requests"] == 1
+    assert breaker.state() == {"state": "closed", "consecutive_failures": 0, "probe_in_flight": False}
+
+
+def test_probe_released_after_non_retryable_error(fake_llm, monkeypatch):
+    fake_llm()
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    monkeypatch.setattr(llm_gateway, "_breaker", breaker)
+
+    async def failing(client):
+        raise ValueError("richiesta non valida")
+
+    with pytest.raises(ValueError):
+        asyncio.run(llm_gateway._call("test", failing))
+    assert breaker.acquire() == "probe"
@@ -0,0 +1,45 @@
+"""
+Normalizzazione dei logo caricati: raster ridotti al riquadro della
+copertina, SVG rasterizzati con cairosvg o salvati così come sono senza.
+"""
+from app.services import logo_service
+from app.services.logo_service import (
+    LOGO_MAX_HEIGHT_PX, LOGO_MAX_WIDTH_PX, LogoValidationError, prepare_logo,
+)
+from PIL import Image
+import pytest
+
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg" width="40" height="20"><rect width="40" height="20" fill="red"/></svg>'
+
+
+def test_raster_logo_downsized_to_logo_box(tmp_path):
+    source = tmp_path / "logo.upload"
+    Image.new('RGB', (4000, 1000), 'blue').save(source, format='PNG')
+
+    logo = prepare_logo(source, '.png', 'sessione', directory=tmp_path / "logos")
+
+    assert logo.path.suffix == '.jpg'
+    assert logo.width <= LOGO_MAX_WIDTH_PX and logo.height <= LOGO_MAX_HEIGHT_PX
+    with Image.open(logo.path) as saved:
+        assert saved.size == (logo.width, logo.height)
+
+
+def test_svg_saved_as_is_without_cairosvg(tmp_path, monkeypatch):
+    monkeypatch.setattr(logo_service, "_load_cairosvg", lambda: None)
+    source = tmp_path / "logo.upload"
+    source.write_bytes(SVG)
+
+    logo = prepare_logo(source, '.svg', 'sessione', directory=tmp_path / "logos")
+
+    assert logo.path.suffix == '.svg'
+    assert logo.path.read_bytes() == SVG
+    assert logo.url_path.endswith(logo.path.name)
+    assert (logo.width, logo.height) == (None, None)
+
+
+def test_invalid_raster_rejected(tmp_path):
+    source = tmp_path / "logo.upload"
+    source.write_bytes(b"non un'immagine")
+    with pytest.raises(LogoValidationError):
+        prepare_logo(source, '.png', 'sessione', directory=tmp_path / "logos")
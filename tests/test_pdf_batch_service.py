@@ -0,0 +1,25 @@
+"""
+Selezione delle sessioni dell'export multiplo: i filtri valgono anche con
+valori "falsy" (company_id=0, lista di id vuota).
+"""
+from app import models
+from app.services.pdf_batch_service import select_batch_sessions
+from uuid import uuid4
+
+
+def _sessions(db, *company_ids):
+    sessions = [models.AssessmentSession(id=uuid4(), azienda_nome=f"Azienda {c}", company_id=c) for c in company_ids]
+    db.add_all(sessions)
+    db.flush()
+    return [s.id for s in sessions]
+
+
+def test_company_id_zero_is_a_filter(db):
+    zero, one, _ = _sessions(db, 0, 1, None)
+    assert select_batch_sessions(db, company_id=0) == [zero]
+    assert select_batch_sessions(db, company_id=1) == [one]
+
+
+def test_empty_session_ids_selects_nothing(db):
+    _sessions(db, 0, 1)
+    assert select_batch_sessions(db, session_ids=[]) == []
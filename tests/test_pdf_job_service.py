@@ -0,0 +1,53 @@
+"""
+Prelievo dei job della coda PDF: i job bloccati da un worker morto vengono
+ripresi finché hanno tentativi disponibili, poi marcati 'failed'.
+"""
+from app import models
+from app.services.pdf_job_service import MAX_ATTEMPTS, STALE_JOB_SECONDS, claim_next_job
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+
+def _job(db, status, attempts=0, started_seconds_ago=None):
+    session = models.AssessmentSession(id=uuid4(), azienda_nome="Azienda PDF")
+    db.add(session)
+    db.flush()
+    job = models.PdfReportJob(
+        session_id=session.id,
+        fingerprint=uuid4().hex,
+        status=status,
+        attempts=attempts,
+        created_at=datetime.now() - timedelta(hours=1),
+        started_at=datetime.now() - timedelta(seconds=started_seconds_ago) if started_seconds_ago else None,
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+def test_claim_takes_queued_job(db):
+    job = _job(db, 'queued')
+    claimed = claim_next_job(db)
+    assert claimed.id == job.id
+    db.refresh(job)
+    assert (job.status, job.attempts) == ('running', 1)
+
+
+def test_claim_retries_stale_job_with_attempts_left(db):
+    job = _job(db, 'running', attempts=MAX_ATTEMPTS - 1, started_seconds_ago=STALE_JOB_SECONDS + 60)
+    claimed = claim_next_job(db)
+    assert claimed.id == job.id
+    db.refresh(job)
+    assert (job.status, job.attempts) == ('running', MAX_ATTEMPTS)
+
+
+def test_claim_fails_stale_job_at_attempt_limit(db):
+    stale = _job(db, 'running', attempts=MAX_ATTEMPTS, started_seconds_ago=STALE_JOB_SECONDS + 60)
+    running = _job(db, 'running', attempts=MAX_ATTEMPTS, started_seconds_ago=10)
+
+    assert claim_next_job(db) is None
+    db.refresh(stale)
+    db.refresh(running)
+    assert stale.status == 'failed'
+    assert stale.finished_at is not None and stale.error
+    assert running.status == 'running'
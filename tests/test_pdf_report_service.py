@@ -0,0 +1,52 @@
+"""
+Picco di memoria Python (tracemalloc) di un report archiviato con
+store_pdf_report, per motore grafico, su dati sintetici: fallisce se supera
+il limite fissato.
+"""
+from app.services import pdf_report_service, report_charts, report_store_service
+from app.services.pdf_generator import PDFReportGenerator
+from app.services.report_store_service import LocalReportStore
+from pathlib import Path
+import tracemalloc
+import pytest
+
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "app" / "templates" / "pdf"
+
+# Picchi misurati: ~20.6 MB (matplotlib, dominato dal PNG del Pareto) e ~8.6 MB (vector)
+PEAK_LIMITS = {"matplotlib": 28 * 1024 * 1024, "vector": 12 * 1024 * 1024}
+
+
+@pytest.mark.parametrize("engine", sorted(PEAK_LIMITS))
+def test_stored_report_peak_memory_within_limit(engine, synthetic_report, tmp_path, monkeypatch):
+    results, stats_data, scores = synthetic_report
+    generator = PDFReportGenerator(chart_engine=engine)
+    # Sfondi dalla copia nel repository (i path di default sono quelli del server)
+    generator.frontpage_template = str(TEMPLATES_DIR / "frontpage.png")
+    generator.report_template = str(TEMPLATES_DIR / "report.png")
+    generator.ai_template = str(TEMPLATES_DIR / "aiconclusion.png")
+    session_data = {"azienda_nome": "Memoria S.r.l.", "model_name": "test"}
+
+    def write_report(session_id, db, output):
+        generator.write_assessment_report(output, session_data, results, stats_data, scores=scores)
+        return "report.pdf"
+
+    store = LocalReportStore(tmp_path)
+    monkeypatch.setattr(report_charts, "PDF_CHART_WORKERS", 0)    # render nel processo misurato
+    monkeypatch.setattr(report_store_service, "_store", store)
+    monkeypatch.setattr(pdf_report_service, "write_pdf_report", write_report)
+    monkeypatch.setattr(pdf_report_service, "record_report_digest", lambda session_id, digest, db: None)
+
+    # Primo giro fuori misura: import, font e sfondi già caricati
+    pdf_report_service.store_pdf_report("s", "0" * 64, None)
+
+    tracemalloc.start()
+    try:
+        pdf_report_service.store_pdf_report("s", "1" * 64, None)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    with store.open("1" * 64) as f:
+        assert f.read(5) == b"%PDF-"
+    assert peak <= PEAK_LIMITS[engine], f"picco {peak / 1024 / 1024:.1f} MB"
@@ -0,0 +1,129 @@
+"""
+Codifica compatta dei prompt contro i formati precedenti (JSON del modello,
+una riga per domanda, elenco delle aree critiche) su un modello reale di
+frontend/public: meno token e latenza minore sul server finto locale, che
+impiega un tempo proporzionale alle parole del prompt. L'endpoint
+ai-suggestions-enhanced invia le aree critiche con la codifica compatta.
+"""
+from app.routers import radar
+from app.services import interview_analysis_service as interview
+from app.services.llm_gateway import chat_completion
+from app.services.model_loader_service import MODELS_DIR, get_model
+from app.services.prompt_encoding_service import count_tokens, encode_critical_areas
+from types import SimpleNamespace
+from typing import Dict, List
+from uuid import uuid4
+import asyncio
+import json
+import time
+import pytest
+
+
+MODEL_NAME = "main_template"
+TRANSCRIPT = "Intervista di prova: l'azienda usa un ERP e fogli Excel per la pianificazione."
+PROMPT_DELAY = 0.0001
+
+# Coppie formato precedente -> codifica compatta
+COMPARISONS = (
+    ("intervista_json", "intervista_compatta"),
+    ("intervista_righe", "intervista_compatta"),
+    ("aree_critiche_righe", "aree_critiche_compatta"),
+)
+
+
+def _line_listing(items) -> str:
+    """Formato precedente dei blocchi dell'intervista: una riga per domanda con il testo completo"""
+    lines, heading = [], None
+    for dimension_id, dimension in items:
+        if (dimension["activity"], dimension["category"]) != heading:
+            heading = (dimension["activity"], dimension["category"])
+            lines.append(f"# {dimension['activity']} | {dimension['category']}")
+        lines.append(f"{dimension_id}. {dimension['dimension']}")
+    return "\n".join(lines)
+
+
+def _critical_listing(areas) -> str:
+    """Formato precedente delle aree critiche nei suggerimenti AI"""
+    return "".join(
+        f"\n🔴 [{a['process']}] {a['category']} → {a['dimension']} (Punteggio: {a['score']}/5)\n"
+        for a in areas
+    )
+
+
+@pytest.fixture(scope="module")
+def variants() -> Dict[str, List[List[Dict[str, str]]]]:
+    """Richieste inviate da ogni variante: l'analisi a blocchi ne invia una per blocco"""
+    if not (MODELS_DIR / f"{MODEL_NAME}.json").exists():
+        pytest.skip(f"{MODEL_NAME}.json non presente in {MODELS_DIR}")
+    model = get_model(MODEL_NAME)
+    chunks = interview.interview_chunks(model)
+    # Suggerimenti AI: caso peggiore, tutte le domande sotto soglia
+    areas = [{**d, "score": 1, "note": None} for d in model.dimensions]
+
+    def interview_messages(questions: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": interview.SYSTEM_PROMPT},
+            {"role": "user", "content": f"TRASCRIZIONE DELL'INTERVISTA:\n{TRANSCRIPT}\n\nDOMANDE:\n{questions}"},
+        ]
+
+    return {
+        "intervista_json": [interview_messages(json.dumps(model.data, indent=2))],
+        "intervista_righe": [interview_messages(_line_listing(c.items)) for c in chunks],
+        "intervista_compatta": [interview.chunk_messages(c, TRANSCRIPT) for c in chunks],
+        "aree_critiche_righe": [[{"role": "user", "content": _critical_listing(areas)}]],
+        "aree_critiche_compatta": [[{"role": "user", "content": encode_critical_areas(areas)}]],
+    }
+
+
+def test_compact_encoding_uses_fewer_tokens(variants):
+    tokens = {
+        name: sum(count_tokens(m["content"], interview.INTERVIEW_MODEL) for messages in batch for m in messages)
+        for name, batch in variants.items()
+    }
+    for before, after in COMPARISONS:
+        assert tokens[after] < tokens[before], f"{before} -> {after}: {tokens[before]} -> {tokens[after]}"
+
+
+def test_compact_encoding_lowers_latency(variants, fake_llm):
+    fake_llm(reply="ok", prompt_delay=PROMPT_DELAY)
+
+    async def latency(batch) -> float:
+        # Come l'analisi delle interviste: blocchi in parallelo, fino all'ultima risposta
+        limit = asyncio.Semaphore(max(interview.INTERVIEW_CHUNK_CONCURRENCY, 1))
+
+        async def send(messages):
+            async with limit:
+                await chat_completion(messages, model="fake", max_tokens=1, temperature=0)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(messages) for messages in batch))
+        return time.perf_counter() - start
+
+    async def run():
+        return {name: await latency(batch) for name, batch in variants.items()}
+
+    seconds = asyncio.run(run())
+    for before, after in COMPARISONS:
+        assert seconds[after] < seconds[before], f"{before} -> {after}: {seconds[before]:.2f}s -> {seconds[after]:.2f}s"
+
+
+def test_ai_suggestions_enhanced_sends_compact_prompt(monkeypatch):
+    results = [
+        SimpleNamespace(process="VENDITA", category="CRM", dimension="Gestione lead", score=score, note=note)
+        for score, note in ((1, "solo Excel"), (2, None), (4, None))
+    ]
+    sent = []
+
+    async def fake_completion(messages, **kwargs):
+        sent.append(messages)
+        return "raccomandazioni"
+
+    monkeypatch.setattr(radar, "_session_and_applicable_results", lambda session_id, db: (None, results))
+    monkeypatch.setattr(radar, "llm_configured", lambda: True)
+    monkeypatch.setattr(radar, "cached_chat_completion", fake_completion)
+
+    response = asyncio.run(radar.ai_suggestions_enhanced(uuid4(), db=None))
+
+    assert response["critical_count"] == 2
+    assert sent == [radar._suggestions_messages(radar._critical_areas(results), len(results))]
+    assert "🔴" not in sent[0][1]["content"]
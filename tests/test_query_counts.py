@@ -0,0 +1,60 @@
+"""
+Numero di query per endpoint: summary, detailed-stats e test-radar-debug
+leggono una sola query raggruppata ciascuno. Un ritorno alle query separate
+(conteggi, medie, distribuzione, per processo) fa fallire questi test.
+"""
+from app import models
+from app.routers import radar
+from app.services.results_service import prepopulate_from_dimensions
+from app.services.score_aggregate_service import refresh_session_aggregates
+from uuid import uuid4
+import pytest
+
+
+CATEGORIES = ("Governance", "Monitoring & Control", "Technology", "Organization")
+
+
+@pytest.fixture
+def session_id(db):
+    session = models.AssessmentSession(id=uuid4(), azienda_nome="Azienda query")
+    db.add(session)
+    db.flush()
+    prepopulate_from_dimensions(session.id, [
+        {"process": f"Processo {p}", "activity": f"Attività {a}",
+         "category": category, "dimension": f"Domanda {d}"}
+        for p in range(3) for a in range(2) for category in CATEGORIES for d in range(2)
+    ], db)
+    db.execute(models.AssessmentResult.__table__.update().where(
+        models.AssessmentResult.dimension == "Domanda 1"
+    ).values(is_not_applicable=True))
+    refresh_session_aggregates(session.id, db)
+    db.flush()
+    return session.id
+
+
+def _statements(capture_sql, endpoint, session_id, db):
+    with capture_sql() as captured:
+        payload = endpoint(session_id, db=db)
+    return payload, [statement for statement, _ in captured]
+
+
+def test_assessment_summary_single_query(db, capture_sql, session_id):
+    payload, statements = _statements(capture_sql, radar.assessment_summary, session_id, db)
+    assert len(statements) == 1, statements
+    assert "session_score_aggregate" in statements[0]
+    assert payload["total_questions"] == 3 * 2 * len(CATEGORIES) * 2
+    assert payload["not_applicable_questions"] == payload["total_questions"] // 2
+
+
+def test_detailed_stats_single_query(db, capture_sql, session_id):
+    payload, statements = _statements(capture_sql, radar.detailed_stats, session_id, db)
+    assert len(statements) == 1, statements
+    assert "session_score_aggregate" in statements[0]
+    assert len(payload["by_process"]) == 3
+
+
+def test_radar_debug_single_query(db, capture_sql, session_id):
+    payload, statements = _statements(capture_sql, radar.test_radar_debug, session_id, db)
+    assert len(statements) == 1, statements
+    assert "assessment_result" in statements[0]
+    assert payload["total_results"] == 3 * 2 * len(CATEGORIES) * 2
@@ -0,0 +1,85 @@
+"""
+Render concorrente dei radar: 50 richieste parallele a /radar-image (threadpool
+di FastAPI e render cache) producono gli stessi PNG del render seriale.
+Motori grafici del report: il vettoriale produce pagine dei grafici più
+leggere e più rapide del matplotlib.
+"""
+from app import database
+from app.routers import radar
+from app.services import report_charts
+from app.services.pdf_generator import PDFReportGenerator
+from app.services.render_cache_service import clear_render_cache
+from reportlab.pdfgen import canvas
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from uuid import uuid4
+import io
+import random
+import time
+import pytest
+
+
+REQUESTS = 50
+SESSIONS = 25
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(radar.router, prefix="/api")
+    app.dependency_overrides[database.get_db] = lambda: None
+    clear_render_cache()
+    with TestClient(app) as client:
+        yield client
+    clear_render_cache()
+
+
+def test_concurrent_radar_images_match_serial_render(client, monkeypatch):
+    rng = random.Random(7)
+    averages = {}
+    for _ in range(SESSIONS):
+        processes = [f"PROCESS {i}" for i in range(rng.randint(3, 9))]
+        averages[uuid4()] = {p: round(rng.uniform(0, 5), 2) for p in processes}
+    monkeypatch.setattr(radar, "get_applicable_process_averages", lambda session_id, db: averages[session_id])
+
+    expected = {
+        session_id: radar.render_radar_chart_png(list(scores), list(scores.values()))
+        for session_id, scores in averages.items()
+    }
+    clear_render_cache()
+
+    # Ogni sessione richiesta due volte: render concorrenti e letture dalla cache
+    requests = [session_id for session_id in averages for _ in range(REQUESTS // SESSIONS)]
+    rng.shuffle(requests)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        responses = list(executor.map(
+            lambda session_id: client.get(f"/api/assessment/{session_id}/radar-image"), requests
+        ))
+
+    assert len(responses) == REQUESTS
+    for session_id, response in zip(requests, responses):
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/png"
+        assert response.content == expected[session_id]
+
+
+def test_vector_chart_pages_lighter_and_faster_than_matplotlib(synthetic_report, monkeypatch):
+    _, stats_data, scores = synthetic_report
+    monkeypatch.setattr(report_charts, "PDF_CHART_WORKERS", 0)    # render nel processo misurato
+
+    def chart_pages(engine):
+        generator = PDFReportGenerator(chart_engine=engine)
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=(generator.page_width, generator.page_height))
+        start = time.perf_counter()
+        generator._draw_chart_pages(c, stats_data, scores)
+        c.save()
+        return time.perf_counter() - start, len(buffer.getvalue())
+
+    chart_pages("matplotlib")    # primo giro fuori misura: import e font
+    matplotlib_seconds, matplotlib_bytes = chart_pages("matplotlib")
+    vector_seconds, vector_bytes = chart_pages("vector")
+
+    assert vector_bytes < matplotlib_bytes
+    assert vector_seconds < matplotlib_seconds
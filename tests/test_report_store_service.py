@@ -0,0 +1,59 @@
+"""
+Invalidazione dei PDF archiviati: vengono eliminati i digest registrati
+all'archiviazione, senza rileggere le risposte della sessione.
+"""
+from app import models
+from app.services import report_store_service
+from app.services.report_store_service import (
+    LocalReportStore, invalidate_session_reports, record_report_digest,
+)
+from uuid import uuid4
+import pytest
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalReportStore(tmp_path)
+    monkeypatch.setattr(report_store_service, "_store", store)
+    return store
+
+
+def _session(db):
+    session = models.AssessmentSession(id=uuid4(), azienda_nome="Azienda report")
+    db.add(session)
+    db.flush()
+    return session.id
+
+
+def _recorded(session_id, db):
+    rows = db.query(models.SessionReportDigest).filter(models.SessionReportDigest.session_id == session_id)
+    return {row.digest for row in rows}
+
+
+def test_invalidate_deletes_recorded_reports_without_reading_answers(db, capture_sql, store):
+    session_id, other_id = _session(db), _session(db)
+    for sid, digest in ((session_id, "a" * 64), (session_id, "b" * 64), (other_id, "c" * 64)):
+        store.put(digest, b"%PDF")
+        record_report_digest(sid, digest, db)
+
+    with capture_sql() as captured:
+        invalidate_session_reports(session_id, db)
+
+    assert not store.exists("a" * 64) and not store.exists("b" * 64)
+    assert store.exists("c" * 64)
+    assert _recorded(session_id, db) == set()
+    assert _recorded(other_id, db) == {"c" * 64}
+    assert not any("assessment_result" in statement for statement, _ in captured)
+
+
+def test_digest_recorded_after_invalidation_is_deleted_by_the_next_one(db, store):
+    # PDF generato con i dati vecchi mentre la scrittura non è ancora confermata
+    session_id = _session(db)
+    invalidate_session_reports(session_id, db)
+    store.put("d" * 64, b"%PDF")
+    record_report_digest(session_id, "d" * 64, db)
+    record_report_digest(session_id, "d" * 64, db)
+
+    invalidate_session_reports(session_id, db)
+    assert not store.exists("d" * 64)
+    assert _recorded(session_id, db) == set()
@@ -0,0 +1,102 @@
+"""
+Regressione dei piani di query: le letture per radar e summary su
+assessment_result devono usare gli indici composti di add_result_indexes.
+
+Le query controllate sono quelle realmente eseguite (catturate durante la
+chiamata) e rieseguite con EXPLAIN con gli stessi parametri. Con pochi dati
+il planner preferirebbe comunque un seq scan: enable_seqscan=off verifica
+che un indice adatto esista e sia utilizzabile per la forma della query.
+"""
+from app import models
+from app.services.results_service import prepopulate_from_dimensions
+from app.services.score_aggregate_service import refresh_session_aggregates
+from uuid import uuid4
+import json
+
+
+RESULT_INDEXES = {
+    "ix_assessment_result_session_na_process_category",
+    "ix_assessment_result_session_process_category_activity",
+}
+CATEGORIES = ("Governance", "Monitoring & Control", "Technology", "Organization")
+
+
+def _seed(db, sessions=3):
+    session_ids = []
+    for s in range(sessions):
+        session = models.AssessmentSession(id=uuid4(), azienda_nome=f"Azienda {s}")
+        db.add(session)
+        db.flush()
+        prepopulate_from_dimensions(session.id, [
+            {"process": f"Processo {p}", "activity": f"Attività {a}",
+             "category": category, "dimension": f"Domanda {d}"}
+            for p in range(8) for a in range(5) for category in CATEGORIES for d in range(3)
+        ], db)
+        session_ids.append(session.id)
+    db.execute(models.AssessmentResult.__table__.update().where(
+        models.AssessmentResult.dimension == "Domanda 2"
+    ).values(is_not_applicable=True))
+    db.connection().exec_driver_sql("ANALYZE assessment_result")
+    db.connection().exec_driver_sql("SET LOCAL enable_seqscan = off")
+    return session_ids
+
+
+def _result_scans(plan):
+    """
+    (seq scan su assessment_result, indici di assessment_result usati) nel piano.
+    Nei bitmap scan l'indice è sul nodo figlio, senza Relation Name.
+    """
+    seq_scans, indexes = [], []
+    if plan.get("Relation Name") == "assessment_result" and plan["Node Type"] == "Seq Scan":
+        seq_scans.append(plan["Node Type"])
+    index_name = plan.get("Index Name") or ""
+    if "assessment_result" in index_name:
+        indexes.append(index_name)
+    for child in plan.get("Plans", ()):
+        child_seq, child_indexes = _result_scans(child)
+        seq_scans += child_seq
+        indexes += child_indexes
+    return seq_scans, indexes
+
+
+def _assert_indexed(db, captured):
+    checked = 0
+    for statement, parameters in captured:
+        if "assessment_result" not in statement:
+            continue
+        row = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        plan = (json.loads(row) if isinstance(row, str) else row)[0]["Plan"]
+        seq_scans, indexes = _result_scans(plan)
+        assert not seq_scans, f"seq scan su assessment_result per:\n{statement}"
+        assert indexes and set(indexes) <= RESULT_INDEXES, f"indici {indexes} per:\n{statement}"
+        checked += 1
+    assert checked, "nessuna query su assessment_result catturata"
+
+
+def test_aggregate_refresh_uses_result_indexes(db, capture_sql):
+    """Gli aggregati letti da radar e summary vengono ricalcolati da assessment_result"""
+    session_id = _seed(db)[0]
+    with capture_sql() as captured:
+        refresh_session_aggregates(session_id, db)
+        refresh_session_aggregates(session_id, db, groups={("Processo 1", "Governance")})
+    _assert_indexed(db, captured)
+
+
+def test_applicable_results_query_uses_result_indexes(db, capture_sql):
+    """Risposte applicabili di una sessione (suggerimenti AI, statistiche del PDF)"""
+    session_id = _seed(db)[0]
+    with capture_sql() as captured:
+        db.query(models.AssessmentResult).filter(
+            models.AssessmentResult.session_id == session_id,
+            models.AssessmentResult.is_not_applicable.is_(False),
+        ).all()
+    _assert_indexed(db, captured)
+
+
+def test_radar_debug_query_uses_result_indexes(db, capture_sql):
+    from app.routers.radar import test_radar_debug
+
+    session_id = _seed(db)[0]
+    with capture_sql() as captured:
+        test_radar_debug(session_id, db=db)
+    _assert_indexed(db, captured)
@@ -0,0 +1,89 @@
+"""
+Submit dei risultati con un solo INSERT ... ON CONFLICT: il numero di
+statement non cresce con le risposte e l'esito coincide con quello del
+vecchio aggiornamento riga per riga.
+"""
+from app import models, schemas
+from app.services.results_service import upsert_assessment_results
+from uuid import uuid4
+import pytest
+
+
+CATEGORIES = ("Governance", "Monitoring & Control", "Technology", "Organization")
+
+
+def _answers(n, score_offset=0):
+    return [
+        schemas.AssessmentResultCreate(
+            process=f"Processo {i % 10}",
+            activity=f"Attività {i // 40}",
+            category=CATEGORIES[i % 4],
+            dimension=f"Domanda {i}",
+            score=(i + score_offset) % 6,
+        )
+        for i in range(n)
+    ]
+
+
+def _submit_row_by_row(session_id, results, db):
+    """Implementazione precedente di submit: una SELECT per risposta + ORM"""
+    created = updated = 0
+    for r in results:
+        existing = db.query(models.AssessmentResult).filter(
+            models.AssessmentResult.session_id == session_id,
+            models.AssessmentResult.process == r.process,
+            models.AssessmentResult.activity == r.activity,
+            models.AssessmentResult.category == r.category,
+            models.AssessmentResult.dimension == r.dimension
+        ).first()
+        if existing:
+            existing.score = r.score
+            existing.note = r.note
+            existing.is_not_applicable = r.is_not_applicable
+            updated += 1
+        else:
+            db.add(models.AssessmentResult(session_id=session_id, **r.dict()))
+            created += 1
+    db.flush()
+    return created, updated
+
+
+def _session(db):
+    session = models.AssessmentSession(id=uuid4(), azienda_nome="Azienda submit")
+    db.add(session)
+    db.flush()
+    return session.id
+
+
+def _stored(session_id, db):
+    rows = db.query(models.AssessmentResult).filter(models.AssessmentResult.session_id == session_id)
+    return sorted((r.process, r.activity, r.category, r.dimension, r.score, r.note, r.is_not_applicable) for r in rows)
+
+
+@pytest.mark.parametrize("n", [40, 1000])
+def test_upsert_statements_do_not_grow_with_answers(db, capture_sql, n):
+    session_id = _session(db)
+    with capture_sql() as inserted:
+        assert upsert_assessment_results(session_id, _answers(n), db) == (n, 0)
+    with capture_sql() as updated:
+        assert upsert_assessment_results(session_id, _answers(n, score_offset=1), db) == (0, n)
+
+    baseline = _session(db)
+    with capture_sql() as small:
+        upsert_assessment_results(baseline, _answers(40), db)
+    assert len(inserted) == len(updated) == len(small)
+
+
+def test_upsert_matches_row_by_row(db):
+    legacy, upsert = _session(db), _session(db)
+    for offset in (0, 1):
+        answers = _answers(200, score_offset=offset)
+        assert upsert_assessment_results(upsert, answers, db) == _submit_row_by_row(legacy, answers, db)
+    assert _stored(upsert, db) == _stored(legacy, db)
+
+
+def test_upsert_last_duplicate_wins(db):
+    session_id = _session(db)
+    first, last = _answers(1), _answers(1, score_offset=3)
+    assert upsert_assessment_results(session_id, first + last, db) == (1, 0)
+    assert [row[4] for row in _stored(session_id, db)] == [last[0].score]
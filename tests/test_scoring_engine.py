@@ -0,0 +1,648 @@
+"""
+Golden test del motore vettoriale (SessionScores) contro le implementazioni
+a cicli precedenti, riportate qui come riferimento, su dataset fissi.
+
+Coprono statistiche e radar per processo del PDF, payload di summary e
+detailed-stats (dagli aggregati di sessione), spec dei grafici Pareto,
+statistiche, radar e Pareto di calculation_service e l'analisi
+deterministica delle raccomandazioni AI.
+"""
+from app.ai_recommendations import AIRecommendationEngine
+from app.routers import radar
+from app.services import calculation_service, scoring_engine
+from app.services.pdf_generator import PDFReportGenerator
+from app.services.pdf_report_service import calculate_pdf_stats, calculate_processes_radar
+from app.services.scoring_engine import SessionScores
+from collections import defaultdict
+from types import SimpleNamespace
+from uuid import uuid4
+import math
+import random
+import time
+import pytest
+
+
+DOMAINS = ["Governance", "Monitoring & Control", "Technology", "Organization"]
+DOMAIN_KEYS = {
+    "Governance": "governance",
+    "Monitoring & Control": "monitoring_control",
+    "Technology": "technology",
+    "Organization": "organization",
+}
+
+
+# ===============================
+#  DATASET
+# ===============================
+
+def _generated_dataset(seed: int):
+    """Risposte casuali ma fisse, con N/A, domini extra e celle vuote"""
+    rng = random.Random(seed)
+    processes = [f"Processo {i}" for i in range(6)]
+    domains = DOMAINS + ["Sostenibilità"]
+    results = []
+    for process in processes:
+        for activity in range(rng.randint(2, 5)):
+            for domain in domains:
+                if rng.random() < 0.15:
+                    continue    # cella senza risposte per questa attività
+                for question in range(rng.randint(1, 4)):
+                    results.append({
+                        "process": process,
+                        "activity": f"Attività {activity}",
+                        "category": domain,
+                        "dimension": f"{domain} {question}",
+                        "score": rng.randint(0, 5),
+                        "is_not_applicable": rng.random() < 0.12,
+                    })
+    return results
+
+
+def _edge_dataset():
+    """Processo solo N/A, dominio con una sola risposta, score estremi"""
+    rows = [
+        ("MKTG", "Campagne", "Governance", 0, False),
+        ("MKTG", "Campagne", "Governance", 5, False),
+        ("MKTG", "Campagne", "Technology", 3, False),
+        ("MKTG", "Lead", "Governance", 1, False),
+        ("MKTG", "Lead", "Organization", 4, True),
+        ("PRODUZIONE", "Pianificazione", "Monitoring & Control", 2, False),
+        ("PRODUZIONE", "Pianificazione", "Monitoring & Control", 2, False),
+        ("PRODUZIONE", "Controllo", "Technology", 5, False),
+        ("PRODUZIONE", "Controllo", "Organization", 1, False),
+        ("QUALITÀ", "Audit", "Governance", 3, True),
+        ("QUALITÀ", "Audit", "Technology", 0, True),
+        ("LOGISTICA", "Magazzino", "Governance", 4, False),
+    ]
+    return [
+        {"process": p, "activity": a, "category": c, "dimension": f"{c} {i}",
+         "score": s, "is_not_applicable": na}
+        for i, (p, a, c, s, na) in enumerate(rows)
+    ]
+
+
+DATASETS = {
+    "generato_7": _generated_dataset(7),
+    "generato_42": _generated_dataset(42),
+    "casi_limite": _edge_dataset(),
+}
+
+
+def _aggregate_rows(results):
+    """Righe di session_score_aggregate come le calcola _aggregate_source, ordinate per processo e categoria"""
+    cells = {}
+    for r in results:
+        row = cells.setdefault((r["process"], r["category"]), {
+            "score_sum": 0, "answer_count": 0, "na_count": 0, **{f"score_{n}_count": 0 for n in range(6)},
+        })
+        if r["is_not_applicable"]:
+            row["na_count"] += 1
+        else:
+            row["score_sum"] += r["score"]
+            row["answer_count"] += 1
+            row[f"score_{r['score']}_count"] += 1
+    return [
+        SimpleNamespace(process=process, category=category, **values)
+        for (process, category), values in sorted(cells.items())
+    ]
+
+
+def assert_same(actual, expected, path="payload"):
+    """Confronto ricorsivo con tolleranza sui float"""
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict), path
+        assert set(actual) == set(expected), f"{path}: chiavi {sorted(actual)} != {sorted(expected)}"
+        for key in expected:
+            assert_same(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, (list, tuple)):
+        assert len(actual) == len(expected), f"{path}: {len(actual)} != {len(expected)} elementi"
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_same(a, e, f"{path}[{i}]")
+    elif isinstance(expected, float) or isinstance(actual, float):
+        assert math.isclose(float(actual), float(expected), rel_tol=1e-9, abs_tol=1e-9), f"{path}: {actual} != {expected}"
+    else:
+        assert actual == expected, f"{path}: {actual!r} != {expected!r}"
+
+
+# ===============================
+#  IMPLEMENTAZIONI PRECEDENTI
+# ===============================
+
+def legacy_pdf_stats(results):
+    """calculate_pdf_stats prima del motore: query di conteggio più raggruppamenti in Python"""
+    applicable = [r for r in results if not r["is_not_applicable"]]
+    total_questions = len(results)
+    applicable_questions = len(applicable)
+    overall_average = (
+        sum(r["score"] for r in applicable) / applicable_questions if applicable_questions else 0.0
+    )
+
+    processes_stats = {}
+    processes_dict = {}
+    for r in applicable:
+        processes_dict.setdefault(r["process"], []).append(r)
+    for process_name, process_results in processes_dict.items():
+        scores = [r["score"] for r in process_results]
+        processes_stats[process_name] = {
+            "applicable_count": len(process_results),
+            "average_score": sum(scores) / len(scores),
+            "min_score": min(scores),
+            "max_score": max(scores),
+            "total_score": sum(scores),
+            "score_distribution": {str(n): scores.count(n) for n in range(6)},
+        }
+
+    categories_stats = {}
+    category_groups = {}
+    for r in applicable:
+        category_groups.setdefault(f"{r['process']}::{r['category']}", []).append(r)
+    for key, category_results in category_groups.items():
+        scores = [r["score"] for r in category_results]
+        categories_stats[key] = {
+            "count": len(category_results),
+            "average": sum(scores) / len(scores),
+            "min": min(scores),
+            "max": max(scores),
+        }
+
+    return {
+        "total_questions": total_questions,
+        "applicable_questions": applicable_questions,
+        "not_applicable_questions": total_questions - applicable_questions,
+        "overall_average": round(overall_average, 2),
+        "by_process": processes_stats,
+        "by_category": categories_stats,
+        "completion_rate": (applicable_questions / max(total_questions, 1)) * 100,
+        "session_metadata": {
+            "total_processes": len(processes_stats),
+            "processes_with_data": len([p for p in processes_stats.values() if p["applicable_count"] > 0]),
+        },
+    }
+
+
+def legacy_processes_radar(results):
+    """calculate_processes_radar prima del motore: media delle medie delle righe, per dizionari annidati"""
+    organized = {}
+    for r in results:
+        organized.setdefault(r["category"], {}).setdefault(r["process"], {}).setdefault(r["activity"], {})[
+            r["dimension"]
+        ] = {"score": r["score"], "is_not_applicable": r["is_not_applicable"]}
+
+    def row_average(dimensions):
+        scores = [d["score"] for d in dimensions.values() if not d["is_not_applicable"] and d["score"] is not None]
+        return sum(scores) / len(scores) if scores else None
+
+    all_processes = set()
+    for category_data in organized.values():
+        all_processes.update(category_data)
+
+    processes_data = {
+        proc: {"process": proc, "dimensions": {key: 0.0 for key in DOMAIN_KEYS.values()}, "overall_score": 0.0}
+        for proc in all_processes
+    }
+    for category, dim_key in DOMAIN_KEYS.items():
+        for proc, activities in organized.get(category, {}).items():
+            averages = [avg for avg in map(row_average, activities.values()) if avg is not None]
+            if averages:
+                processes_data[proc]["dimensions"][dim_key] = round(sum(averages) / len(averages), 2)
+
+    for data in processes_data.values():
+        valid = [v for v in data["dimensions"].values() if v > 0]
+        if valid:
+            data["overall_score"] = round(sum(valid) / len(valid), 2)
+    return processes_data
+
+
+def legacy_summary(results, session_id):
+    """Payload di /summary calcolato con le query originali (GROUP BY sulle risposte applicabili)"""
+    applicable = [r for r in results if not r["is_not_applicable"]]
+    avg_score = sum(r["score"] for r in applicable) / len(applicable)
+    distribution = {}
+    by_process = {}
+    for r in applicable:
+        distribution[r["score"]] = distribution.get(r["score"], 0) + 1
+        by_process.setdefault(r["process"], []).append(r["score"])
+    return {
+        "session_id": str(session_id),
+        "total_questions": len(results),
+        "applicable_questions": len(applicable),
+        "not_applicable_questions": len(results) - len(applicable),
+        "overall_score": round(avg_score, 2) if avg_score else 0,
+        "score_distribution": [{"score": s, "count": c} for s, c in sorted(distribution.items())],
+        "process_breakdown": [
+            {
+                "process": p,
+                "avg_score": round(sum(s) / len(s), 2),
+                "applicable_count": len(s),
+                "percentage": round((sum(s) / len(s) / 5) * 100, 1),
+            }
+            for p, s in sorted(by_process.items())
+        ],
+    }
+
+
+def legacy_detailed_stats(results, session_id):
+    """Payload di /detailed-stats calcolato con le query originali (conteggi condizionali per processo)"""
+    applicable = sum(1 for r in results if not r["is_not_applicable"])
+    not_applicable = len(results) - applicable
+    by_process = {}
+    for r in results:
+        stats = by_process.setdefault(r["process"], {"applicable": [], "na": 0})
+        if r["is_not_applicable"]:
+            stats["na"] += 1
+        else:
+            stats["applicable"].append(r["score"])
+    return {
+        "session_id": str(session_id),
+        "totals": {
+            "total_questions": len(results),
+            "applicable_questions": applicable,
+            "not_applicable_questions": not_applicable,
+            "applicable_percentage": round((applicable / len(results)) * 100, 1) if results else 0,
+        },
+        "by_process": [
+            {
+                "process": p,
+                "applicable_count": len(s["applicable"]),
+                "not_applicable_count": s["na"],
+                "avg_score_applicable": round(sum(s["applicable"]) / len(s["applicable"]), 2)
+                if s["applicable"] and sum(s["applicable"]) else 0,
+                "total_questions": len(s["applicable"]) + s["na"],
+            }
+            for p, s in sorted(by_process.items())
+        ],
+    }
+
+
+def legacy_pareto(results):
+    """Dati dei grafici Pareto calcolati come nel vecchio _add_pareto_charts (una scansione per cella)"""
+    valid = [r for r in results if not r["is_not_applicable"] and r["score"] is not None]
+    processes = list({r["process"] for r in valid})
+    domains = list({r["category"] for r in valid})
+    domain_order = ["Governance", "Monitoring & Control", "Technology", "Organization"]
+    ordered_domains = [d for d in domain_order if d in domains] + [d for d in domains if d not in domain_order]
+
+    def view(items, others, divisor, pick):
+        data = {}
+        for item in items:
+            gaps, total = {}, 0
+            for other in others:
+                cell = [r for r in valid if pick(r) == (item, other)]
+                if cell:
+                    gap = (5 - sum(r["score"] for r in cell) / len(cell)) / divisor
+                    gaps[other] = gap
+                    total += gap
+                else:
+                    gaps[other] = 0
+            data[item] = {"gaps": gaps, "total": total}
+        grand_total = sum(d["total"] for d in data.values())
+        for d in data.values():
+            for other in d["gaps"]:
+                if grand_total > 0:
+                    d["gaps"][other] = d["gaps"][other] / grand_total * 100
+            d["total"] = d["total"] / grand_total * 100
+        order = sorted(items, key=lambda i: data[i]["total"], reverse=True)
+        cumulative, running = [], 0
+        for item in order:
+            running += data[item]["total"]
+            cumulative.append(running)
+        return {"order": order, "cumulative": cumulative,
+                "stacks": {other: [data[i]["gaps"][other] for i in order] for other in others}}
+
+    return (
+        view(processes, ordered_domains, len(processes), lambda r: (r["process"], r["category"])),
+        view(ordered_domains, processes, len(ordered_domains), lambda r: (r["category"], r["process"])),
+    )
+
+
+def legacy_session_stats(results, data_source):
+    """calculate_session_stats prima del motore: scansioni delle risposte con defaultdict"""
+    total_questions = len(results)
+    answered = sum(1 for r in results if r["score"] > 0 or not r["is_not_applicable"])
+    na_count = sum(1 for r in results if r["is_not_applicable"])
+    completion_pct = (answered / total_questions * 100) if total_questions > 0 else 0
+
+    def percentage_stats(field):
+        groups = defaultdict(lambda: {"total_score": 0, "max_score": 0, "count": 0, "na_count": 0})
+        for r in results:
+            if r["is_not_applicable"]:
+                groups[r[field]]["na_count"] += 1
+            else:
+                groups[r[field]]["total_score"] += r["score"]
+                groups[r[field]]["max_score"] += 5
+                groups[r[field]]["count"] += 1
+        return {
+            key: {
+                "average_score": round((s["total_score"] / s["max_score"]) * 100 if s["max_score"] > 0 else 0, 2),
+                "total_score": s["total_score"],
+                "max_score": s["max_score"],
+                "count": s["count"],
+                "na_count": s["na_count"],
+            }
+            for key, s in groups.items()
+        }
+
+    total_score = sum(r["score"] for r in results if not r["is_not_applicable"])
+    total_max = sum(5 for r in results if not r["is_not_applicable"])
+    overall_score = (total_score / total_max * 100) if total_max > 0 else 0
+    return {
+        "source": data_source["source"],
+        "total_questions": total_questions,
+        "answered_questions": answered,
+        "na_questions": na_count,
+        "completion_percentage": round(completion_pct, 2),
+        "by_process": percentage_stats("process"),
+        "by_domain": percentage_stats("category"),
+        "overall_score": round(overall_score, 2),
+        "overall_max_score": total_max,
+        "processes": data_source["processes"],
+        "domains": data_source["domains"],
+    }
+
+
+def legacy_radar_data(results, data_source):
+    """calculate_radar_data prima del motore: matrice processo x dominio per dizionari annidati"""
+    matrix = defaultdict(lambda: defaultdict(lambda: {"total": 0, "max": 0}))
+    for r in results:
+        if not r["is_not_applicable"]:
+            matrix[r["process"]][r["category"]]["total"] += r["score"]
+            matrix[r["process"]][r["category"]]["max"] += 5
+
+    def percentage(process, domain):
+        stats = matrix[process][domain]
+        return round((stats["total"] / stats["max"]) * 100 if stats["max"] > 0 else 0, 2)
+
+    return {
+        "processes_vs_domains": [
+            {"process": p, "domains": {d: percentage(p, d) for d in data_source["domains"]}}
+            for p in data_source["processes"]
+        ],
+        "domains_vs_processes": [
+            {"domain": d, "processes": {p: percentage(p, d) for p in data_source["processes"]}}
+            for d in data_source["domains"]
+        ],
+    }
+
+
+def legacy_pareto_analysis(results, data_source):
+    """calculate_pareto_analysis prima del motore: gap normalizzati cella per cella"""
+    cells = defaultdict(lambda: {"total_score": 0, "count": 0})
+    for r in results:
+        if not r["is_not_applicable"]:
+            cells[(r["process"], r["category"])]["total_score"] += r["score"]
+            cells[(r["process"], r["category"])]["count"] += 1
+
+    def ranking(items, others, divisor, cell, label):
+        gaps = {}
+        for item in items:
+            gaps[item] = 0
+            for other in others:
+                stats = cells[cell(item, other)]
+                if stats["count"] > 0:
+                    gaps[item] += (5.0 - stats["total_score"] / stats["count"]) / divisor
+        total = sum(gaps.values())
+        ranked = [
+            {label: item, "gap_totale": round(gap, 4),
+             "percentuale_gap": round((gap / total * 100) if total > 0 else 0, 2)}
+            for item, gap in gaps.items()
+        ]
+        ranked.sort(key=lambda x: x["percentuale_gap"], reverse=True)
+        cumulative = 0
+        for entry in ranked:
+            cumulative += entry["percentuale_gap"]
+            entry["cumulative_percentage"] = round(cumulative, 2)
+            entry["is_critical"] = cumulative <= 80
+        return ranked, total
+
+    processes, domains = data_source["processes"], data_source["domains"]
+    by_process, total_gap = ranking(processes, domains, len(processes), lambda p, d: (p, d), "process")
+    by_domain, _ = ranking(domains, processes, len(domains), lambda d, p: (p, d), "domain")
+    return {
+        "by_process": by_process,
+        "by_domain": by_domain,
+        "total_gap_system": round(total_gap, 4),
+        "critical_processes": [p["process"] for p in by_process if p["is_critical"]],
+        "critical_domains": [d["domain"] for d in by_domain if d["is_critical"]],
+    }
+
+
+def legacy_advanced_analysis(engine, results, company_context):
+    """_perform_advanced_analysis prima del motore: medie da liste di score per processo"""
+    data_by_process = {}
+    all_scores = []
+    critical_areas, weak_areas, strong_areas = [], [], []
+    for result in results:
+        process = result.process
+        if process not in data_by_process:
+            data_by_process[process] = {"categories": {}, "scores": [], "avg_score": 0}
+        data_by_process[process]["categories"][result.category] = {
+            "dimension": result.dimension, "score": result.score, "note": result.note
+        }
+        data_by_process[process]["scores"].append(result.score)
+        all_scores.append(result.score)
+        area_data = {
+            "process": process,
+            "category": result.category,
+            "dimension": result.dimension,
+            "score": result.score,
+            "criticality": engine._get_criticality_level(result.score),
+            "impact_weight": engine._calculate_impact_weight(process, result.category),
+            "note": result.note,
+        }
+        if result.score <= 1.0:
+            critical_areas.append(area_data)
+        elif result.score < 2.0:
+            weak_areas.append(area_data)
+        elif result.score > 3.0:
+            strong_areas.append(area_data)
+
+    for process_data in data_by_process.values():
+        scores = process_data["scores"]
+        process_data["avg_score"] = sum(scores) / len(scores) if scores else 0
+    overall_avg = sum(all_scores) / len(all_scores) if all_scores else 0
+
+    priority_matrix = engine._create_priority_matrix(critical_areas, data_by_process)
+    return {
+        "summary": {
+            "overall_score": round(overall_avg, 2),
+            "total_processes": len(data_by_process),
+            "critical_areas_count": len(critical_areas),
+            "weak_areas_count": len(weak_areas),
+            "strong_areas_count": len(strong_areas),
+            "maturity_level": engine._get_maturity_level(overall_avg),
+            "strongest_process": max(data_by_process.items(), key=lambda x: x[1]["avg_score"])[0] if data_by_process else None,
+            "weakest_process": min(data_by_process.items(), key=lambda x: x[1]["avg_score"])[0] if data_by_process else None,
+        },
+        "priority_matrix": priority_matrix,
+        "roadmap": engine._create_implementation_roadmap(priority_matrix, company_context),
+        "roi_predictions": engine._calculate_roi_predictions(priority_matrix, company_context),
+        "benchmark": engine._create_sector_benchmark(overall_avg, company_context["sector"]),
+        "detailed_data": data_by_process,
+        "weak_areas": weak_areas,
+        "strong_areas": strong_areas,
+    }
+
+
+# ===============================
+#  TEST
+# ===============================
+
+@pytest.fixture(params=sorted(DATASETS))
+def dataset(request):
+    return DATASETS[request.param]
+
+
+def test_pdf_stats_match_legacy_from_results_and_aggregates(dataset):
+    expected = legacy_pdf_stats(dataset)
+    assert_same(calculate_pdf_stats("s", None, SessionScores.from_results(dataset)), expected)
+    assert_same(calculate_pdf_stats("s", None, SessionScores.from_aggregates(_aggregate_rows(dataset))), expected)
+
+
+def test_processes_radar_matches_legacy(dataset):
+    expected = legacy_processes_radar(dataset)
+    actual = calculate_processes_radar("s", None, SessionScores.from_results(dataset))
+    assert_same({p["process"]: p for p in actual}, expected)
+    overall = [p["overall_score"] for p in actual]
+    assert overall == sorted(overall, reverse=True)
+
+
+def test_summary_payload_matches_legacy(dataset, monkeypatch):
+    session_id = uuid4()
+    monkeypatch.setattr(radar, "get_session_aggregates", lambda sid, db: _aggregate_rows(dataset))
+    actual = radar.assessment_summary(session_id, db=None)
+    actual["score_distribution"].sort(key=lambda d: d["score"])
+    actual["process_breakdown"].sort(key=lambda d: d["process"])
+    assert_same(actual, legacy_summary(dataset, session_id))
+
+
+def test_detailed_stats_payload_matches_legacy(dataset, monkeypatch):
+    session_id = uuid4()
+    monkeypatch.setattr(radar, "get_session_aggregates", lambda sid, db: _aggregate_rows(dataset))
+    actual = radar.detailed_stats(session_id, db=None)
+    actual["by_process"].sort(key=lambda d: d["process"])
+    assert_same(actual, legacy_detailed_stats(dataset, session_id))
+
+
+def test_pareto_spec_matches_legacy(dataset):
+    by_process, by_domain = legacy_pareto(dataset)
+    spec = PDFReportGenerator()._pareto_spec(dataset, SessionScores.from_results(dataset))
+    process_panel, domain_panel = spec["panels"]
+
+    for panel, expected in ((process_panel, by_process), (domain_panel, by_domain)):
+        assert panel["categories"] == expected["order"]
+        assert_same(panel["cumulative"], expected["cumulative"])
+        assert_same({s["label"]: s["values"] for s in panel["stacks"]}, expected["stacks"])
+
+
+def test_pareto_spec_without_applicable_answers():
+    only_na = [dict(r, is_not_applicable=True) for r in _edge_dataset()]
+    assert PDFReportGenerator()._pareto_spec(only_na, SessionScores.from_results(only_na)) is None
+
+
+class _SessionDb:
+    """Sessione DB minima per calculation_service: restituisce sempre la sessione cercata"""
+
+    def query(self, model):
+        return self
+
+    def filter_by(self, **kwargs):
+        return self
+
+    def first(self):
+        return SimpleNamespace(id=uuid4(), template_version_id=None)
+
+
+@pytest.fixture
+def data_source(dataset, monkeypatch):
+    """Fonte dati con i domini standard e un processo del modello senza risposte"""
+    source = {
+        "source": "json",
+        "processes": sorted({r["process"] for r in dataset}) + ["Processo senza risposte"],
+        "domains": list(DOMAINS),
+    }
+    monkeypatch.setattr(calculation_service, "get_session_data_source", lambda session, db: source)
+    monkeypatch.setattr(scoring_engine, "get_session_aggregates", lambda sid, db: _aggregate_rows(dataset))
+    return source
+
+
+def test_session_stats_match_legacy(dataset, data_source):
+    actual = calculation_service.calculate_session_stats(uuid4(), _SessionDb())
+    expected = legacy_session_stats(dataset, data_source)
+
+    # answered_questions conta solo le risposte applicabili (prima anche le N/A con
+    # score > 0, contate così due volte insieme a na_questions)
+    applicable = sum(1 for r in dataset if not r["is_not_applicable"])
+    expected["answered_questions"] = applicable
+    expected["completion_percentage"] = round(applicable / len(dataset) * 100, 2)
+    assert_same(actual, expected)
+    assert actual["answered_questions"] + actual["na_questions"] == actual["total_questions"]
+
+
+def test_session_stats_answered_excludes_scored_not_applicable(monkeypatch):
+    results = [
+        {"process": "MKTG", "activity": "Lead", "category": "Governance", "dimension": "Governance 0",
+         "score": 0, "is_not_applicable": False},
+        {"process": "MKTG", "activity": "Lead", "category": "Technology", "dimension": "Technology 0",
+         "score": 3, "is_not_applicable": True},
+    ]
+    monkeypatch.setattr(calculation_service, "get_session_data_source",
+                        lambda session, db: {"source": "json", "processes": ["MKTG"], "domains": list(DOMAINS)})
+    monkeypatch.setattr(scoring_engine, "get_session_aggregates", lambda sid, db: _aggregate_rows(results))
+
+    stats = calculation_service.calculate_session_stats(uuid4(), _SessionDb())
+    assert legacy_session_stats(results, {"source": "json", "processes": [], "domains": []})["answered_questions"] == 2
+    assert (stats["total_questions"], stats["answered_questions"], stats["na_questions"]) == (2, 1, 1)
+    assert stats["completion_percentage"] == 50.0
+
+
+def test_radar_data_matches_legacy(dataset, data_source):
+    actual = calculation_service.calculate_radar_data(uuid4(), _SessionDb())
+    assert_same(actual, legacy_radar_data(dataset, data_source))
+
+
+def test_pareto_analysis_matches_legacy(dataset, data_source):
+    actual = calculation_service.calculate_pareto_analysis(uuid4(), _SessionDb())
+    assert_same(actual, legacy_pareto_analysis(dataset, data_source))
+
+
+def test_advanced_analysis_matches_legacy(dataset):
+    # Le raccomandazioni ricevono solo le risposte applicabili (_session_and_applicable_results)
+    results = [SimpleNamespace(note=None, **r) for r in dataset if not r["is_not_applicable"]]
+    engine = AIRecommendationEngine()
+    company = engine._extract_company_context({"settore": "Manifatturiero", "dimensione": "Media (50-249 dipendenti)"})
+
+    expected = legacy_advanced_analysis(engine, results, company)
+    for process_data in expected["detailed_data"].values():
+        del process_data["scores"]    # lista di lavoro interna, non più conservata
+    assert_same(engine._perform_advanced_analysis(results, company), expected)
+
+
+def test_pareto_matches_cell_scan_on_large_session():
+    """50 processi x 10 domini x 5000 risposte: stessi gap della scansione O(P·D·N), in meno tempo"""
+    rng = random.Random(42)
+    processes = [f"PROCESS {i}" for i in range(50)]
+    domains = [f"DOMAIN {j}" for j in range(10)]
+    results = [
+        {"process": rng.choice(processes), "category": rng.choice(domains),
+         "activity": f"ACTIVITY {rng.randrange(20)}", "score": rng.randint(0, 5),
+         "is_not_applicable": rng.random() < 0.1}
+        for _ in range(5000)
+    ]
+
+    start = time.perf_counter()
+    valid = [r for r in results if not r["is_not_applicable"]]
+    expected = {}
+    for process in processes:
+        expected[process] = 0.0
+        for domain in domains:
+            cell = [r["score"] for r in valid if r["process"] == process and r["category"] == domain]
+            if cell:
+                expected[process] += (5 - sum(cell) / len(cell)) / len(processes)
+    scan_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pareto = SessionScores.from_results(results).pareto(processes, domains)
+    engine_seconds = time.perf_counter() - start
+
+    assert_same(dict(zip(processes, pareto["process_gap"].tolist())), expected)
+    assert engine_seconds < scan_seconds